@@ -3,21 +3,20 @@ import sys
 # Add the app root to PYTHONPATH so that `workspace.src` is accessible
 sys.path.insert(0, "/app")
 
+import hashlib
 import streamlit as st
 import time
-from workspace.src.utils import initialize_client
-from workspace.src.propose_medical_queries import generate_search_propositions
-from workspace.src.generate_follow_up_questions import generate_follow_up_questions
+from typing import Any, Dict, Tuple
+from workspace.src.celery_app import celery
 from workspace.src.tasks import (
     generate_search_summary_task,
     search_articles_task,
     generate_report_task,
     detect_anomalies_task,
+    generate_follow_up_questions_task,
+    generate_search_propositions_task,
 )
 
-# Initialize OpenAI client
-client = initialize_client()
-
 st.set_page_config(layout="wide")
 st.title("Virtual Doctor Consultation")
 
@@ -70,6 +69,43 @@ if "current_search_result" not in st.session_state:
     st.session_state.current_search_result = None
 if "task_id" not in st.session_state:
     st.session_state.task_id = None
+if "analysis_hashes" not in st.session_state:
+    st.session_state.analysis_hashes = {}  # Inputs hash of the last dispatch, by name
+    st.session_state.analysis_tasks = {}  # Pending Celery task IDs by analysis name
+    st.session_state.analysis_results = {}  # Latest completed result by analysis name
+
+
+def refresh_analyses(conversation: str) -> None:
+    """
+    Dispatch each conversation analysis in parallel when its inputs changed, and
+    collect any results that finished since the last rerun without blocking.
+    """
+    search_history = "; ".join(
+        search["query"] for search in st.session_state.search_history
+    )
+    analyses: Dict[str, Tuple[Any, Tuple[str, ...]]] = {
+        "search_propositions": (
+            generate_search_propositions_task,
+            (conversation, search_history),
+        ),
+        "follow_up_questions": (generate_follow_up_questions_task, (conversation,)),
+    }
+    for name, (analysis_task, args) in analyses.items():
+        inputs_hash = hashlib.sha256("\0".join(args).encode("utf-8")).hexdigest()
+        if inputs_hash != st.session_state.analysis_hashes.get(name):
+            st.session_state.analysis_hashes[name] = inputs_hash
+            st.session_state.analysis_tasks[name] = analysis_task.delay(*args).id
+
+    pending: Dict[str, str] = {}
+    for name, task_id in st.session_state.analysis_tasks.items():
+        task = celery.AsyncResult(task_id)
+        if not task.ready():
+            pending[name] = task_id
+        elif task.successful():
+            result: Dict[str, Any] = task.result
+            st.session_state.analysis_results[name] = result
+    st.session_state.analysis_tasks = pending
+
 
 # Create two columns: one for the consultation and one for research/analysis
 col1, col2 = st.columns([2, 1])
@@ -133,9 +169,16 @@ with col2:
             f"{msg['role']}: {msg['content']}" for msg in st.session_state.messages
         )
 
+        # Analyses run in Celery and are only re-dispatched when their inputs change
+        refresh_analyses(full_conversation)
+
         # Relevant Medical Topics (now as clickable buttons)
         st.subheader("Relevant Medical Topics")
-        queries_response = generate_search_propositions(client, full_conversation)
+        if "search_propositions" in st.session_state.analysis_tasks:
+            st.caption("Updating…")
+        queries_response = st.session_state.analysis_results.get(
+            "search_propositions", {}
+        )
         if "search_propositions" in queries_response:
             for query in queries_response["search_propositions"]:
                 if st.button(f"🔍 {query}", key=f"med_topic_{query}"):
@@ -164,7 +207,11 @@ with col2:
 
         # Proposed Follow-up Questions
         st.subheader("Proposed Follow-up Questions")
-        questions_response = generate_follow_up_questions(client, full_conversation)
+        if "follow_up_questions" in st.session_state.analysis_tasks:
+            st.caption("Updating…")
+        questions_response = st.session_state.analysis_results.get(
+            "follow_up_questions", {}
+        )
         if "follow_up_questions" in questions_response:
             for question in questions_response["follow_up_questions"]:
                 st.write("🔍", question)
@@ -326,3 +373,7 @@ if st.session_state.conversation_index < len(CONVERSATION_FLOW):
     st.empty()
     time.sleep(10)
     st.rerun()
+elif st.session_state.analysis_tasks:
+    # Pick up the last analyses once the conversation is over
+    time.sleep(1)
+    st.rerun()
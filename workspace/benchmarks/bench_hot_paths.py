@@ -0,0 +1,428 @@
+"""
+Offline microbenchmarks of the CPU-bound hot paths, with JSON output.
+
+Covers embedding throughput by batch size, `similarity_search` ranking cost by
+corpus size, `generate_prompt` with large article payloads, speech chunking
+throughput, Pydantic validation in `generate_structured_response` and the
+per-visit medical-history synthesis (full vs rolling) by number of prior
+visits, with the prompt size sent to the LLM. MongoDB and the LLM provider are
+replaced by in-memory fakes; the real SentenceTransformer is used only if it is
+already in the local cache.
+
+Usage:
+    python -m workspace.benchmarks.bench_hot_paths --output results.json
+    python -m workspace.benchmarks.bench_hot_paths --baseline results.json
+
+With `--baseline`, the exit status is 1 if any benchmark got slower by more
+than `--tolerance` (relative median time).
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from unittest import mock
+
+import numpy as np
+
+from workspace.benchmarks import synthetic
+
+Result = Dict[str, Any]
+
+
+def measure(fn: Callable[[], Any], repeats: int, number: int = 1) -> Dict[str, float]:
+    """Seconds per call of `fn`, over `repeats` rounds of `number` calls."""
+    fn()  # warm-up
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        timings.append((time.perf_counter() - start) / number)
+    return {
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.fmean(timings),
+        "stdev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+    }
+
+
+def result(
+    name: str,
+    params: Dict[str, Any],
+    seconds: Dict[str, float],
+    items: Optional[int] = None,
+    unit: str = "items",
+    **extra: Any,
+) -> Result:
+    """One report entry; `params` identify it when comparing against a baseline."""
+    entry: Result = {"name": name, "params": params, "seconds": seconds, **extra}
+    if items is not None:
+        entry["throughput"] = {"value": items / seconds["median"], "unit": f"{unit}/s"}
+    return entry
+
+
+@contextlib.contextmanager
+def quiet() -> Iterator[None]:
+    # Several hot paths print; keep that out of the JSON on stdout
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def bench_embedding(repeats: int, quick: bool) -> List[Result]:
+    from workspace.src.embedding_service import EMBEDDING_MODEL_NAME, EmbeddingService
+
+    texts = synthetic.sentences(256 if quick else 1024)
+    results: List[Result] = []
+    try:
+        from sentence_transformers import SentenceTransformer
+
+        model: Any = SentenceTransformer(EMBEDDING_MODEL_NAME, local_files_only=True)
+    except Exception as e:
+        results.append(
+            {"name": "embedding.encode", "skipped": f"model unavailable offline: {e}"}
+        )
+    else:
+        for batch_size in (1, 16, 64, 128):
+            seconds = measure(
+                lambda: model.encode(texts, batch_size=batch_size), repeats
+            )
+            results.append(
+                result(
+                    "embedding.encode",
+                    {"model": EMBEDDING_MODEL_NAME, "batch_size": batch_size},
+                    seconds,
+                    len(texts),
+                    "texts",
+                )
+            )
+
+    # Service overhead (hashing, LRU cache, batching) around a fake model
+    for batch_size in (16, 64):
+
+        def embed_cold() -> None:
+            EmbeddingService(
+                max_batch_size=batch_size, model=synthetic.FakeModel()
+            ).embed_many(texts)
+
+        results.append(
+            result(
+                "embedding.service_embed_many",
+                {"model": "fake", "batch_size": batch_size, "cache": "cold"},
+                measure(embed_cold, repeats),
+                len(texts),
+                "texts",
+            )
+        )
+    warm = EmbeddingService(model=synthetic.FakeModel())
+    warm.embed_many(texts)
+    results.append(
+        result(
+            "embedding.service_embed_many",
+            {"model": "fake", "cache": "warm"},
+            measure(lambda: warm.embed_many(texts), repeats),
+            len(texts),
+            "texts",
+        )
+    )
+    return results
+
+
+def bench_similarity_search(repeats: int, quick: bool) -> List[Result]:
+    from workspace.src import retrieve_historical_points
+    from workspace.src.vector_index import VectorIndex
+
+    results: List[Result] = []
+    query = synthetic.embeddings(1, seed=1)[0].tolist()
+    for size in (1_000, 10_000) if quick else (1_000, 10_000, 100_000):
+        docs = synthetic.consultations(size)
+        with tempfile.TemporaryDirectory() as directory:
+            index = VectorIndex("bench", directory=directory)
+            index.add([doc["_id"] for doc in docs], [doc["embedding"] for doc in docs])
+            table: Any = synthetic.FakeCollection(docs)
+            with (
+                mock.patch.object(retrieve_historical_points, "get_database"),
+                mock.patch.object(
+                    retrieve_historical_points, "get_table", return_value=table
+                ),
+                mock.patch.object(
+                    retrieve_historical_points, "get_vector_index", return_value=index
+                ),
+                mock.patch.object(
+                    retrieve_historical_points,
+                    "generate_embedding",
+                    return_value=query,
+                ),
+            ):
+                index.sync(table)
+                seconds = measure(
+                    lambda: retrieve_historical_points.similarity_search(
+                        "douleur thoracique", top_k=5
+                    ),
+                    repeats,
+                )
+                # One patient's history (20 visits) instead of the whole corpus
+                scoped = measure(
+                    lambda: retrieve_historical_points.similarity_search(
+                        "douleur thoracique", top_k=5, ssn="patient0"
+                    ),
+                    repeats,
+                )
+        results.append(
+            result(
+                "similarity_search", {"corpus": size, "top_k": 5}, seconds, 1, "queries"
+            )
+        )
+        results.append(
+            result(
+                "similarity_search",
+                {"corpus": size, "top_k": 5, "filter": "patient"},
+                scoped,
+                1,
+                "queries",
+            )
+        )
+    return results
+
+
+def bench_generate_prompt(repeats: int, quick: bool) -> List[Result]:
+    from workspace.src.prompts import summarize_search_prompt_template
+    from workspace.src.utils import generate_prompt
+
+    results: List[Result] = []
+    for count in (5, 50) if quick else (5, 50, 200):
+        payload = synthetic.articles(count)
+        condition = synthetic.dialogue(2000)
+        prompt = generate_prompt(
+            summarize_search_prompt_template,
+            patient_condition=condition,
+            medical_articles=payload,
+        )
+        seconds = measure(
+            lambda: generate_prompt(
+                summarize_search_prompt_template,
+                patient_condition=condition,
+                medical_articles=payload,
+            ),
+            repeats,
+            number=10,
+        )
+        results.append(
+            result(
+                "generate_prompt.search_summary",
+                {"articles": count},
+                seconds,
+                len(prompt),
+                "chars",
+                prompt_chars=len(prompt),
+            )
+        )
+    return results
+
+
+def bench_speech_chunking(repeats: int, quick: bool) -> List[Result]:
+    from workspace.src.stt_simulation_module import (
+        ChunkMode,
+        chunk_speech,
+        stream_speech_buffer,
+    )
+
+    text = synthetic.dialogue(50_000 if quick else 500_000)
+    size = len(text.encode("utf-8"))
+    results: List[Result] = []
+    modes: List[ChunkMode] = ["bytes", "word", "sentence"]
+    for mode in modes:
+        results.append(
+            result(
+                "speech.chunk_speech",
+                {"mode": mode, "buffer_size": 512, "bytes": size},
+                measure(lambda: chunk_speech(text, 512, mode), repeats),
+                size,
+                "bytes",
+            )
+        )
+
+    async def drain() -> int:
+        count = 0
+        async for _ in stream_speech_buffer([{"text": text}], delay=0):
+            count += 1
+        return count
+
+    chunks = asyncio.run(drain())
+    results.append(
+        result(
+            "speech.stream_speech_buffer",
+            {"mode": "bytes", "buffer_size": 512, "bytes": size},
+            measure(lambda: asyncio.run(drain()), repeats),
+            chunks,
+            "chunks",
+        )
+    )
+    return results
+
+
+def bench_structured_validation(repeats: int, quick: bool) -> List[Result]:
+    from workspace.src.pydantic_models import ConsultationReport
+    from workspace.src.utils import generate_structured_response
+
+    results: List[Result] = []
+    for items in (5, 100):
+        payload = {
+            "symptoms": synthetic.sentences(items),
+            "pathology": "Angor instable",
+            "treatment": synthetic.sentences(items, seed=1),
+            "keywords": [f"mot-clé {i}" for i in range(items)],
+            "intelligent_summary": synthetic.dialogue(2000),
+        }
+        client: Any = synthetic.FakeChatClient(payload)
+        seconds = measure(
+            lambda: generate_structured_response(
+                client, "system", "user", ConsultationReport, use_cache=False
+            ),
+            repeats,
+            number=20,
+        )
+        results.append(
+            result(
+                "generate_structured_response.validate",
+                {"model": "ConsultationReport", "list_items": items},
+                seconds,
+                1,
+                "responses",
+            )
+        )
+    return results
+
+
+def bench_medical_history(repeats: int, quick: bool) -> List[Result]:
+    from workspace.src import generate_data
+    from workspace.src.llm_cache import set_llm_cache
+    from workspace.src.prompt_builder import estimate_tokens
+
+    set_llm_cache(None)
+    results: List[Result] = []
+    history = synthetic.dialogue(1500)
+    for visits in (10, 100) if quick else (10, 100, 1000):
+        for mode in ("full", "rolling"):
+            db: Any = synthetic.FakePatientDatabase("bench", visits)
+            client = synthetic.FakeCompletionClient(history)
+
+            def visit() -> None:
+                # "full" is the periodic rebuild, now run by a Celery task; on
+                # a visit the previous one is already folded into the history
+                if mode == "full":
+                    generate_data.rebuild_medical_history(db, db.ssn)
+                    return
+                db.patient.update(
+                    medical_history=history,
+                    medical_history_reportID=visits - 1,
+                    medical_history_folds=0,
+                )
+                generate_data.get_medical_history(db, db.ssn)
+
+            with (
+                mock.patch.object(generate_data, "CLIENT", client),
+                mock.patch.object(generate_data, "celery"),
+            ):
+                seconds = measure(visit, repeats)
+            prompt = client.prompts[-1]
+            results.append(
+                result(
+                    "medical_history.visit",
+                    {"mode": mode, "prior_visits": visits},
+                    seconds,
+                    1,
+                    "visits",
+                    prompt_chars=len(prompt),
+                    prompt_tokens=estimate_tokens(prompt),
+                )
+            )
+    return results
+
+
+BENCHMARKS: Dict[str, Callable[[int, bool], List[Result]]] = {
+    "embedding": bench_embedding,
+    "similarity_search": bench_similarity_search,
+    "generate_prompt": bench_generate_prompt,
+    "speech_chunking": bench_speech_chunking,
+    "structured_validation": bench_structured_validation,
+    "medical_history": bench_medical_history,
+}
+
+
+def _key(entry: Result) -> str:
+    return f"{entry['name']}{json.dumps(entry.get('params', {}), sort_keys=True)}"
+
+
+def compare(
+    results: List[Result], baseline: List[Result], tolerance: float
+) -> List[Dict[str, Any]]:
+    """Benchmarks whose median time grew by more than `tolerance` over baseline."""
+    previous = {_key(entry): entry for entry in baseline if "seconds" in entry}
+    regressions = []
+    for entry in results:
+        before = previous.get(_key(entry))
+        if before is None or "seconds" not in entry:
+            continue
+        ratio = entry["seconds"]["median"] / before["seconds"]["median"]
+        if ratio > 1 + tolerance:
+            regressions.append({"benchmark": _key(entry), "slowdown": ratio})
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS))
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--quick", action="store_true", help="Smaller inputs.")
+    parser.add_argument(
+        "--output", help="Write the JSON report here (default: stdout)."
+    )
+    parser.add_argument("--baseline", help="A previous JSON report to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    results: List[Result] = []
+    for name in args.only or BENCHMARKS:
+        print(f"Running {name}...", file=sys.stderr)
+        with quiet():
+            results.extend(BENCHMARKS[name](args.repeats, args.quick))
+
+    report: Dict[str, Any] = {
+        "meta": {
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "numpy": np.__version__,
+            "repeats": args.repeats,
+            "quick": args.quick,
+        },
+        "results": results,
+    }
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            report["regressions"] = compare(
+                results, json.load(file)["results"], args.tolerance
+            )
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output)
+    else:
+        print(output)
+    if report.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Compare the vector index against the previous full-scan similarity search.
+
+The scan baseline reproduces what `similarity_search` used to do once documents
+were loaded: build a NumPy matrix from Python lists, run sklearn
+`cosine_similarity` and a full `argsort`. Mongo transfer time is not included,
+so the real-world gap is larger than reported here.
+
+Usage:
+    python -m workspace.benchmarks.bench_similarity_search --sizes 10000 100000 1000000
+"""
+
+import argparse
+import tempfile
+import time
+from typing import Any, Callable, List
+
+import numpy as np
+
+from workspace.src.vector_index import VectorIndex
+
+DIM = 384  # all-MiniLM-L6-v2
+
+
+def scan_search(query: List[float], embeddings: List[List[float]], top_k: int) -> Any:
+    from sklearn.metrics.pairwise import cosine_similarity
+
+    stored_embeddings = np.array(embeddings)
+    query_embedding = np.array(query).reshape(1, -1)
+    similarity_scores = cosine_similarity(query_embedding, stored_embeddings)[0]
+    return np.argsort(similarity_scores)[-top_k:][::-1]
+
+
+def best_of(fn: Callable[[], Any], repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument(
+        "--scan-limit",
+        type=int,
+        default=200_000,
+        help="Skip the scan baseline above this size (Python lists do not fit in RAM).",
+    )
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    query = rng.standard_normal(DIM).astype(np.float32)
+
+    print(f"{'vectors':>10} {'scan (ms)':>12} {'index (ms)':>12} {'speedup':>9}")
+    for size in args.sizes:
+        vectors = rng.standard_normal((size, DIM)).astype(np.float32)
+        with tempfile.TemporaryDirectory() as directory:
+            index = VectorIndex("bench", directory=directory)
+            index.add([str(i) for i in range(size)], vectors)
+            index_time = best_of(lambda: index.search(query, args.top_k), args.repeats)
+
+            if size <= args.scan_limit:
+                embeddings = vectors.tolist()
+                query_list = query.tolist()
+                scan_time = best_of(
+                    lambda: scan_search(query_list, embeddings, args.top_k),
+                    args.repeats,
+                )
+                del embeddings
+                scan = f"{scan_time * 1000:12.2f}"
+                speedup = f"{scan_time / index_time:8.1f}x"
+            else:
+                scan, speedup = f"{'skipped':>12}", f"{'-':>9}"
+            print(f"{size:>10} {scan} {index_time * 1000:12.2f} {speedup}")
+        del vectors
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+Synthetic corpus and in-memory fakes for the offline benchmarks.
+
+Everything is generated from a fixed seed, so two runs on the same machine
+measure the same work.
+"""
+
+import json
+import zlib
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+SYMPTOMS = [
+    "douleur thoracique",
+    "fièvre persistante",
+    "toux sèche",
+    "céphalées",
+    "vertiges",
+    "nausées",
+    "essoufflement",
+    "fatigue chronique",
+    "palpitations",
+    "douleur abdominale",
+]
+CONTEXT = [
+    "depuis trois jours",
+    "aggravée à l'effort",
+    "sans antécédent cardiaque",
+    "sous metformine",
+    "après un voyage récent",
+    "avec une hypertension connue",
+    "soulagée par le repos",
+    "accompagnée de sueurs nocturnes",
+]
+
+
+def sentences(count: int, seed: int = 0) -> List[str]:
+    """Consultation-like sentences, with accented characters."""
+    rng = np.random.default_rng(seed)
+    return [
+        f"Le patient décrit une {rng.choice(SYMPTOMS)} {rng.choice(CONTEXT)}, "
+        f"et signale une {rng.choice(SYMPTOMS)} {rng.choice(CONTEXT)}."
+        for _ in range(count)
+    ]
+
+
+def dialogue(chars: int, seed: int = 0) -> str:
+    """A doctor-patient dialogue of about `chars` characters."""
+    lines: List[str] = []
+    total = 0
+    for i, sentence in enumerate(sentences(chars // 60 + 1, seed)):
+        line = f"{'Médecin' if i % 2 else 'Patient'}: {sentence}"
+        lines.append(line)
+        total += len(line) + 1
+        if total >= chars:
+            break
+    return "\n".join(lines)
+
+
+def articles(
+    count: int, abstract_chars: int = 1500, seed: int = 0
+) -> List[Dict[str, Any]]:
+    """PubMed-shaped articles with abstracts, as `search_medical_articles` returns."""
+    return [
+        {
+            "pmid": str(30_000_000 + i),
+            "title": sentence,
+            "authors": ["Martin J", "Dubois C", "Bernard L"],
+            "journal": "Rev Med Interne",
+            "pubdate": "2024 Jan",
+            "abstract": dialogue(abstract_chars, seed + i),
+        }
+        for i, sentence in enumerate(sentences(count, seed))
+    ]
+
+
+def embeddings(count: int, dim: int = 384, seed: int = 0) -> np.ndarray[Any, Any]:
+    return np.random.default_rng(seed).standard_normal((count, dim)).astype(np.float32)
+
+
+class FakeModel:
+    """Stands in for SentenceTransformer: deterministic vectors, cost linear in input."""
+
+    def __init__(self, dim: int = 384) -> None:
+        self.dim = dim
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray[Any, Any]:
+        vectors = np.empty((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            rng = np.random.default_rng(zlib.crc32(text.encode("utf-8")))
+            vectors[i] = rng.standard_normal(self.dim)
+        return vectors
+
+
+class FakeCollection:
+    """The subset of a pymongo collection that `similarity_search` uses."""
+
+    def __init__(self, docs: List[Dict[str, Any]]) -> None:
+        self.docs = {doc["_id"]: doc for doc in docs}
+        # Stands in for the (social_security_number, reportID) index
+        self.by_patient: Dict[str, List[Dict[str, Any]]] = {}
+        for doc in docs:
+            if "social_security_number" in doc:
+                self.by_patient.setdefault(doc["social_security_number"], []).append(
+                    doc
+                )
+
+    @staticmethod
+    def _project(
+        doc: Dict[str, Any], projection: Optional[Dict[str, int]]
+    ) -> Dict[str, Any]:
+        if not projection:
+            return dict(doc)
+        return {"_id": doc["_id"], **{k: doc[k] for k in projection if k in doc}}
+
+    def find_one(
+        self, query: Dict[str, Any], projection: Any = None, **kwargs: Any
+    ) -> Optional[Dict[str, Any]]:
+        # Synthetic documents are never timestamped, see `VectorIndex.sync`
+        return None
+
+    def find(
+        self,
+        query: Dict[str, Any],
+        projection: Optional[Dict[str, int]] = None,
+        **kwargs: Any,
+    ) -> "FakeCursor":
+        return FakeCursor(self._matches(query, projection))
+
+    def _matches(
+        self, query: Dict[str, Any], projection: Optional[Dict[str, int]]
+    ) -> Iterator[Dict[str, Any]]:
+        ids = query.get("_id", {}).get("$in")
+        candidates: Iterable[Dict[str, Any]]
+        if ids is not None:
+            candidates = (self.docs[i] for i in ids if i in self.docs)
+        elif "social_security_number" in query:
+            candidates = self.by_patient.get(query["social_security_number"], [])
+        else:
+            candidates = self.docs.values()
+        fields = {
+            k: v
+            for k, v in query.items()
+            if k not in ("_id", "embedding", "embedded_at")
+        }
+        for doc in candidates:
+            if "embedding" in query and "embedding" not in doc:
+                continue
+            if "embedded_at" in query and "embedded_at" not in doc:
+                continue
+            if any(doc.get(k) != v for k, v in fields.items()):
+                continue
+            yield self._project(doc, projection)
+
+
+class FakeCursor:
+    """Iterates lazily like a pymongo cursor; `sort` keeps insertion order."""
+
+    def __init__(self, docs: Iterator[Dict[str, Any]]) -> None:
+        self.docs = docs
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return self.docs
+
+    def sort(self, *args: Any) -> "FakeCursor":
+        return self
+
+
+def consultations(
+    count: int, dim: int = 384, seed: int = 0, visits_per_patient: int = 20
+) -> List[Dict[str, Any]]:
+    vectors = embeddings(count, dim, seed)
+    summaries = sentences(count, seed)
+    return [
+        {
+            "_id": f"doc{i}",
+            "social_security_number": f"patient{i // visits_per_patient}",
+            "reportID": i,
+            "intelligent_summary": summaries[i],
+            "embedding": vectors[i],
+        }
+        for i in range(count)
+    ]
+
+
+class FakeChatClient:
+    """OpenAI client whose structured completions return a fixed JSON payload."""
+
+    def __init__(self, payload: Dict[str, Any]) -> None:
+        content = json.dumps(payload)
+        message = SimpleNamespace(content=content)
+        response = SimpleNamespace(
+            choices=[SimpleNamespace(message=message)], usage=None
+        )
+        completions = SimpleNamespace(parse=lambda **kwargs: response)
+        self.beta = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+
+class FakeCompletionClient:
+    """OpenAI client whose chat completions return a fixed text; records prompts."""
+
+    def __init__(self, content: str) -> None:
+        self.prompts: List[str] = []
+        message = SimpleNamespace(content=content)
+        response = SimpleNamespace(
+            choices=[SimpleNamespace(message=message)], usage=None
+        )
+
+        def create(messages: List[Dict[str, str]], **kwargs: Any) -> Any:
+            self.prompts.append("\n".join(m["content"] for m in messages))
+            return response
+
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=create))
+
+
+class FakePatientDatabase:
+    """
+    Consultation and Patient collections of one patient, with the queries of
+    `generate_data.get_medical_history` and `rebuild_medical_history`.
+    """
+
+    def __init__(self, ssn: str, visits: int, seed: int = 0) -> None:
+        self.ssn = ssn
+        self.summaries = sentences(visits, seed)
+        self.patient: Dict[str, Any] = {"social_security_number": ssn}
+
+    def __getitem__(self, name: str) -> "FakePatientDatabase":
+        return self
+
+    def aggregate(self, pipeline: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        after = pipeline[0]["$match"]["reportID"]["$gt"]
+        summaries = self.summaries[after:]
+        if not summaries:
+            return []
+        return [{"summaries": summaries, "last_reportID": len(self.summaries)}]
+
+    def find_one(self, query: Dict[str, Any], projection: Any = None) -> Any:
+        return dict(self.patient)
+
+    def update_one(
+        self, query: Dict[str, Any], update: Dict[str, Any], upsert: bool = False
+    ) -> Any:
+        self.patient.update(update["$set"])
+        return SimpleNamespace(matched_count=1)
@@ -1,7 +1,29 @@
-from flask import Flask, request, jsonify, Response
-from typing import Union
+import time
+from flask import Flask, g, request, jsonify, Response, stream_with_context
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, generate_latest
+from typing import Any, List, Union
+from celery import Task
+from workspace.src.batches import (
+    BATCH_DEFAULT_CHUNK_SIZE,
+    BATCH_MAX_ITEMS,
+    batch_progress,
+    submit_batch,
+)
 from workspace.src.celery_app import celery
+from workspace.src.metrics import (
+    API_REQUEST_SECONDS,
+    QueueDepthCollector,
+    metrics_registry,
+)
+from workspace.src.task_events import (
+    MAX_WAIT_SECONDS,
+    sse_task_events,
+    task_status,
+    wait_for_task,
+)
+from workspace.src.token_stream import TOKEN_STREAM_MAX_SECONDS, sse_token_events
 from workspace.src.utils import initialize_client
+from workspace.src.workflow import get_workflow_timings, process_consultation
 from workspace.src.tasks import (
     detect_anomalies_task,
     extract_ordonnance_task,
@@ -9,15 +31,55 @@ from workspace.src.tasks import (
     search_articles_task,
     generate_search_summary_task,
     generate_report_task,
+    embedding_stats_task,
+    analyze_consultation_task,
 )
 
 app = Flask(__name__)
 client = initialize_client()
 
+queue_metrics = CollectorRegistry()
+queue_metrics.register(QueueDepthCollector(celery))
+
+
+@app.before_request
+def start_timer() -> None:
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def observe_request(response: Response) -> Response:
+    # Label by route pattern so task IDs do not multiply the series
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    # Unset if a before_request hook answered before start_timer ran
+    started = g.get("request_started")
+    if started is not None:
+        API_REQUEST_SECONDS.labels(
+            request.method, endpoint, response.status_code
+        ).observe(time.perf_counter() - started)
+    return response
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics() -> Response:
+    """Prometheus metrics of the API, plus the depth of every Celery queue."""
+    body = generate_latest(metrics_registry()) + generate_latest(queue_metrics)
+    return Response(body, mimetype=CONTENT_TYPE_LATEST)
+
 
 @app.route("/task/<task_id>", methods=["GET"])
 def get_task_status(task_id: str) -> Union[Response, tuple[Response, int]]:
-    """Get the status of a task by its ID."""
+    """
+    Get the status of a task by its ID.
+
+    With `?wait=<seconds>` the request is held open until the task finishes or
+    the wait expires (long-poll), instead of answering immediately.
+    """
+    wait = min(request.args.get("wait", default=0.0, type=float), MAX_WAIT_SECONDS)
+    if wait > 0:
+        status = task_status(task_id, wait_for_task(task_id, wait))
+        return jsonify(status), 500 if status["status"] == "failed" else 200
+
     task = celery.AsyncResult(task_id)
     if task.ready():
         if task.successful():
@@ -26,6 +88,37 @@ def get_task_status(task_id: str) -> Union[Response, tuple[Response, int]]:
     return jsonify({"status": "processing", "task_id": task_id})
 
 
+@app.route("/task/<task_id>/events", methods=["GET"])
+def stream_task_status(task_id: str) -> Response:
+    """Push the task's state transitions as Server-Sent Events."""
+    timeout = min(
+        request.args.get("timeout", default=MAX_WAIT_SECONDS, type=float),
+        MAX_WAIT_SECONDS,
+    )
+    return Response(
+        stream_with_context(sse_task_events(task_id, timeout)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/task/<task_id>/tokens", methods=["GET"])
+def stream_task_tokens(task_id: str) -> Response:
+    """
+    Push the text of a task started with `"stream": true` as Server-Sent Events,
+    as the model generates it; a final `done` event closes the stream.
+    """
+    timeout = min(
+        request.args.get("timeout", default=TOKEN_STREAM_MAX_SECONDS, type=float),
+        TOKEN_STREAM_MAX_SECONDS,
+    )
+    return Response(
+        stream_with_context(sse_token_events(task_id, timeout)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.route("/hello", methods=["GET"])
 def hello() -> Response:
     return jsonify({"message": "Hello World!"})
@@ -71,10 +164,11 @@ def summarize() -> Union[Response, tuple[Response, int]]:
 def search_articles() -> Union[Response, tuple[Response, int]]:
     query = request.args.get("query")
     retmax = request.args.get("retmax", default=5, type=int)
+    with_abstracts = request.args.get("with_abstracts", "").lower() in ("1", "true")
     if not query:
         return jsonify({"error": "Missing query parameter"}), 400
 
-    task = search_articles_task.delay(query, retmax)
+    task = search_articles_task.delay(query, retmax, with_abstracts)
     return jsonify({"status": "processing", "task_id": task.id}), 202
 
 
@@ -85,7 +179,9 @@ def search_summary() -> Union[Response, tuple[Response, int]]:
         return jsonify({"error": "Missing required fields"}), 400
 
     task = generate_search_summary_task.delay(
-        data["patient_condition"], data["medical_articles"]
+        data["patient_condition"],
+        data["medical_articles"],
+        stream=bool(data.get("stream", False)),
     )
     return jsonify({"status": "processing", "task_id": task.id}), 202
 
@@ -108,9 +204,137 @@ def generate_medical_report() -> Union[Response, tuple[Response, int]]:
         data["patient_information"],
         data["medical_history"],
         data["anomaly_detection"],
+        stream=bool(data.get("stream", False)),
     )
     return jsonify({"status": "processing", "task_id": task.id}), 202
 
 
+@app.route("/analyze-consultation", methods=["POST"])
+def analyze_consultation() -> Union[Response, tuple[Response, int]]:
+    data = request.get_json()
+    required_fields = [
+        "conversation",
+        "patient_information",
+        "medical_history",
+        "doctor_prescription",
+        "patient_medication_history",
+    ]
+
+    if not data or not all(field in data for field in required_fields):
+        return jsonify({"error": "Missing required fields"}), 400
+
+    task = analyze_consultation_task.delay(
+        data["conversation"],
+        data["patient_information"],
+        data["medical_history"],
+        data["doctor_prescription"],
+        data["patient_medication_history"],
+        data.get("search_history", ""),
+    )
+    return jsonify({"status": "processing", "task_id": task.id}), 202
+
+
+@app.route("/consultation/process", methods=["POST"])
+def process_consultation_route() -> Union[Response, tuple[Response, int]]:
+    """Run the whole consultation pipeline; returns one task ID for the run."""
+    data = request.get_json()
+    required_fields = [
+        "conversation",
+        "patient_information",
+        "medical_history",
+        "doctor_prescription",
+        "search_query",
+    ]
+
+    if not data or not all(field in data for field in required_fields):
+        return jsonify({"error": "Missing required fields"}), 400
+
+    result = process_consultation(
+        data["conversation"],
+        data["patient_information"],
+        data["medical_history"],
+        data["doctor_prescription"],
+        data.get("previous_prescriptions", []),
+        data["search_query"],
+        data.get("retmax", 5),
+    )
+    return jsonify({"status": "processing", "task_id": result.id}), 202
+
+
+@app.route("/consultation/<workflow_id>/timings", methods=["GET"])
+def consultation_timings(workflow_id: str) -> Response:
+    """Per-step timings recorded so far for a consultation run."""
+    return jsonify(get_workflow_timings(workflow_id))
+
+
+def _submit_batch(
+    task: Task, fields: List[str]
+) -> Union[Response, tuple[Response, int]]:
+    """Validate a `{"items": [...], "chunk_size": n}` body and submit it as a group."""
+    data = request.get_json()
+    if not data or not isinstance(data.get("items"), list) or not data["items"]:
+        return jsonify({"error": "Missing items"}), 400
+    items: List[Any] = data["items"]
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({"error": f"At most {BATCH_MAX_ITEMS} items per batch"}), 400
+    if not all(
+        isinstance(item, dict) and all(field in item for field in fields)
+        for item in items
+    ):
+        return jsonify({"error": "Missing required fields"}), 400
+    chunk_size = data.get("chunk_size", BATCH_DEFAULT_CHUNK_SIZE)
+    if not isinstance(chunk_size, int) or chunk_size < 1:
+        return jsonify({"error": "chunk_size must be a positive integer"}), 400
+
+    batch_id = submit_batch(
+        task, [[item[field] for field in fields] for item in items], chunk_size
+    )
+    return jsonify(
+        {"status": "processing", "batch_id": batch_id, "total": len(items)}
+    ), 202
+
+
+@app.route("/batch/detect-prescription-anomalies", methods=["POST"])
+def batch_detect_anomalies() -> Union[Response, tuple[Response, int]]:
+    return _submit_batch(
+        detect_anomalies_task, ["doctor_prescription", "patient_medication_history"]
+    )
+
+
+@app.route("/batch/extract-ordonnance", methods=["POST"])
+def batch_extract_ordonnance() -> Union[Response, tuple[Response, int]]:
+    return _submit_batch(extract_ordonnance_task, ["doctor_prescription"])
+
+
+@app.route("/batch/generate-report", methods=["POST"])
+def batch_generate_report() -> Union[Response, tuple[Response, int]]:
+    return _submit_batch(
+        generate_report_task,
+        [
+            "conversation",
+            "patient_information",
+            "medical_history",
+            "anomaly_detection",
+        ],
+    )
+
+
+@app.route("/batch/<batch_id>", methods=["GET"])
+def get_batch_status(batch_id: str) -> Union[Response, tuple[Response, int]]:
+    """Aggregate progress and one page (`offset`, `limit`) of item results."""
+    offset = max(request.args.get("offset", default=0, type=int), 0)
+    limit = min(max(request.args.get("limit", default=100, type=int), 1), 1000)
+    progress = batch_progress(batch_id, offset, limit)
+    if progress is None:
+        return jsonify({"error": "Unknown batch"}), 404
+    return jsonify(progress)
+
+
+@app.route("/embeddings/stats", methods=["GET"])
+def embedding_stats() -> Union[Response, tuple[Response, int]]:
+    task = embedding_stats_task.delay()
+    return jsonify({"status": "processing", "task_id": task.id}), 202
+
+
 if __name__ == "__main__":
     app.run(debug=True, port=5000)
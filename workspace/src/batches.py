@@ -0,0 +1,114 @@
+import json
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+from celery import Task, group, states
+from celery.result import GroupResult
+
+from workspace.src.celery_app import celery
+
+BATCH_MAX_ITEMS: int = int(os.getenv("BATCH_MAX_ITEMS", "10000"))
+BATCH_DEFAULT_CHUNK_SIZE: int = int(os.getenv("BATCH_DEFAULT_CHUNK_SIZE", "1"))
+BATCH_EXPIRES: int = int(os.getenv("BATCH_EXPIRES", str(7 * 24 * 3600)))
+
+
+def _meta_key(batch_id: str) -> str:
+    return f"batch-meta-{batch_id}"
+
+
+def submit_batch(
+    task: Task, items: Sequence[Sequence[Any]], chunk_size: int = 1
+) -> str:
+    """
+    Fan `items` (one argument list per item) out to `task` as a Celery group.
+
+    With `chunk_size` > 1 consecutive items are sent as one `chunks` message and
+    run back to back by a single worker, trading latency for fewer messages.
+
+    Returns:
+        str: The batch ID used to query progress and results.
+    """
+    queue = celery.conf.task_routes.get(task.name, {}).get("queue")
+    if chunk_size > 1:
+        job = task.chunks([tuple(args) for args in items], chunk_size).group()
+    else:
+        job = group(task.s(*args) for args in items)
+    result: GroupResult = job.apply_async(queue=queue)
+    result.save()
+
+    backend: Any = celery.backend
+    backend.client.set(
+        _meta_key(result.id),
+        json.dumps({"task": task.name, "total": len(items), "chunk_size": chunk_size}),
+        ex=BATCH_EXPIRES,
+    )
+    return str(result.id)
+
+
+def _child_states(backend: Any, children: Sequence[Any]) -> List[Dict[str, Any]]:
+    # One MGET for every child instead of one GET per child and per item
+    keys = [backend.get_key_for_task(child.id) for child in children]
+    return [
+        backend.decode_result(raw)
+        if raw is not None
+        else {"status": states.PENDING, "result": None}
+        for raw in (backend.client.mget(keys) if keys else [])
+    ]
+
+
+def _item_status(child: Dict[str, Any], position: int) -> Dict[str, Any]:
+    if child["status"] not in states.READY_STATES:
+        return {"status": "pending"}
+    if child["status"] == states.SUCCESS:
+        result = child["result"][position] if position >= 0 else child["result"]
+        return {"status": "completed", "result": result}
+    return {"status": "failed", "error": str(child["result"])}
+
+
+def batch_progress(
+    batch_id: str, offset: int = 0, limit: int = 100
+) -> Optional[Dict[str, Any]]:
+    """
+    Aggregate progress of a batch plus one page of per-item results, in the
+    order the items were submitted.
+
+    Returns:
+        Optional[Dict[str, Any]]: None if the batch is unknown or has expired.
+    """
+    backend: Any = celery.backend
+    raw_meta = backend.client.get(_meta_key(batch_id))
+    result = GroupResult.restore(batch_id, app=celery)
+    if raw_meta is None or result is None:
+        return None
+    meta = json.loads(raw_meta)
+    total: int = meta["total"]
+    chunk_size: int = meta["chunk_size"]
+    children = _child_states(backend, result.results)
+
+    done = failed = 0
+    for index, child in enumerate(children):
+        size = min(chunk_size, total - index * chunk_size)
+        if child["status"] == states.SUCCESS:
+            done += size
+        elif child["status"] in states.READY_STATES:
+            failed += size
+
+    page: List[Dict[str, Any]] = []
+    for index in range(offset, min(offset + limit, total)):
+        child = children[index // chunk_size]
+        position = index % chunk_size if chunk_size > 1 else -1
+        page.append({"index": index, **_item_status(child, position)})
+
+    next_offset = offset + limit if offset + limit < total else None
+    return {
+        "batch_id": batch_id,
+        "task": meta["task"],
+        "total": total,
+        "done": done,
+        "failed": failed,
+        "pending": total - done - failed,
+        "offset": offset,
+        "limit": limit,
+        "next_offset": next_offset,
+        "results": page,
+    }
@@ -1,25 +1,61 @@
 from celery import Celery
 
+from workspace.src.metrics import connect_celery_metrics
+from workspace.src.result_store import RESULT_EXPIRES, connect_result_expiry
+from workspace.src.serialization import (
+    CELERY_SERIALIZER,
+    MSGPACK_ZSTD,
+    register_msgpack_zstd,
+)
+
+register_msgpack_zstd()
+
 celery = Celery(
     "medical_api",
     broker="redis://redis:6379/0",  # Use service name 'redis' instead of 'localhost'
     backend="redis://redis:6379/1",
-    include=["workspace.src.tasks"],  # Add tasks module to include list
+    include=[
+        "workspace.src.tasks",
+        "workspace.src.workflow",
+    ],  # Add task modules to include list
 )
 
 celery.conf.update(
-    task_serializer="json",
-    accept_content=["json"],
-    result_serializer="json",
+    # CELERY_SERIALIZER=msgpack-zstd opts into compact messages and results.
+    # Task messages of either format are accepted, but results are decoded
+    # with the reader's own result_serializer: every process must switch at
+    # once. msgpack-zstd still reads JSON results stored before the switch;
+    # switching back to JSON leaves stored msgpack results unreadable.
+    task_serializer=CELERY_SERIALIZER,
+    accept_content=["json", MSGPACK_ZSTD],
+    result_serializer=CELERY_SERIALIZER,
+    result_expires=RESULT_EXPIRES,  # per task type in result_store
     timezone="Europe/Paris",
     enable_utc=True,
     task_track_started=True,
-    task_time_limit=3600,  # 1 hour timeout
+    # 1 hour timeout, only enforced by the prefork and gevent pools. The threads
+    # pools of docker-compose.yml cannot kill a task; their provider calls are
+    # bounded by LLM_TIMEOUT, PUBMED_TIMEOUT and WIKIPEDIA_TIMEOUT instead.
+    task_time_limit=3600,
     worker_prefetch_multiplier=1,  # One task per worker at a time
     task_routes={
         "workspace.src.tasks.detect_anomalies_task": {"queue": "llm"},
         "workspace.src.tasks.generate_report_task": {"queue": "llm"},
+        "workspace.src.tasks.extract_ordonnance_task": {"queue": "llm"},
+        "workspace.src.tasks.summarize_ordonnances_task": {"queue": "llm"},
         "workspace.src.tasks.search_articles_task": {"queue": "api"},
         "workspace.src.tasks.generate_search_summary_task": {"queue": "llm"},
+        "workspace.src.tasks.generate_follow_up_questions_task": {"queue": "llm"},
+        "workspace.src.tasks.generate_search_propositions_task": {"queue": "llm"},
+        "workspace.src.tasks.analyze_consultation_task": {"queue": "llm"},
+        "workspace.src.tasks.rebuild_medical_history_task": {"queue": "llm"},
+        "workspace.src.tasks.embed_texts_task": {"queue": "embed"},
+        "workspace.src.workflow.search_articles_step": {"queue": "api"},
+        "workspace.src.workflow.collect_consultation_step": {"queue": "api"},
+        "workspace.src.workflow.*": {"queue": "llm"},
+        "workspace.src.tasks.embedding_stats_task": {"queue": "embed"},
     },
 )
+
+connect_celery_metrics()
+connect_result_expiry()
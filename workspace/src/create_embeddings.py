@@ -1,46 +1,127 @@
-from sentence_transformers import SentenceTransformer
-from typing import List
+from pymongo import UpdateOne
+from pymongo.database import Database
+from typing import Any, Dict, List, Optional
+import argparse
+import time
+from datetime import datetime, timezone
 from workspace.src.db_utils import get_database, get_table
+from workspace.src.embedding_service import generate_embeddings
+from workspace.src.vector_index import get_vector_index
 
+CHECKPOINT_TABLE = "Checkpoint"
 
-# Initialize Sentence Transformer model
-model = SentenceTransformer("all-MiniLM-L6-v2")
 
+def _checkpoint_key(table_name: str) -> str:
+    return f"embeddings:{table_name}"
 
-def generate_embedding(text: str) -> List[float]:
-    """Generate embedding for a given text using Sentence Transformers."""
-    return model.encode(text).tolist()  # Convert numpy array to list for MongoDB
 
+def load_checkpoint(db: Database[Any], table_name: str) -> Optional[Any]:
+    """Return the last `_id` processed by an interrupted backfill, if any."""
+    checkpoint = get_table(db, CHECKPOINT_TABLE).find_one(
+        {"_id": _checkpoint_key(table_name)}
+    )
+    return checkpoint["last_id"] if checkpoint else None
 
-def add_embeddings_to_collection(table_name: str = "Consultation") -> None:
+
+def save_checkpoint(db: Database[Any], table_name: str, last_id: Any) -> None:
+    get_table(db, CHECKPOINT_TABLE).update_one(
+        {"_id": _checkpoint_key(table_name)},
+        {"$set": {"last_id": last_id}},
+        upsert=True,
+    )
+
+
+def clear_checkpoint(db: Database[Any], table_name: str) -> None:
+    get_table(db, CHECKPOINT_TABLE).delete_one({"_id": _checkpoint_key(table_name)})
+
+
+def add_embeddings_to_collection(
+    table_name: str = "Consultation", batch_size: int = 64, resume: bool = True
+) -> int:
     """
-    Iterate through all documents in the collection, generate embeddings for the
-    'intelligent_summary' field, and add the 'embedding' attribute to each document.
+    Generate embeddings for the 'intelligent_summary' field of every document that
+    does not have an 'embedding' yet.
+
+    Documents are read in `_id` order, embedded `batch_size` at a time through the
+    shared embedding service and written back with a single unordered `bulk_write`
+    per batch. The last processed `_id` is checkpointed after each batch, so an
+    interrupted run picks up where it stopped when `resume` is set. The checkpoint is cleared once the run completes.
+
+    Returns:
+        int: The number of documents that received an embedding.
     """
     # Get MongoDB client, database, and collection
     db = get_database()
     table = get_table(db, table_name)
-    # Find all documents in the collection
-    documents = table.find({})
+    index = get_vector_index(table_name)
 
-    for doc in documents:
-        # Check if the document already has an embedding (to avoid reprocessing)
-        if "embedding" not in doc:
-            # Generate embedding for the 'intelligent_summary' field
-            embedding = generate_embedding(doc["intelligent_summary"])
-
-            # Update the document with the new 'embedding' attribute
-            table.update_one(
-                {"_id": doc["_id"]},  # Match the document by its unique ID
-                {"$set": {"embedding": embedding}},  # Add the embedding
+    # Only documents still missing an embedding, after the checkpoint if resuming
+    query: Dict[str, Any] = {"embedding": {"$exists": False}}
+    last_id = load_checkpoint(db, table_name) if resume else None
+    if last_id is not None:
+        query["_id"] = {"$gt": last_id}
+        print(f"Resuming backfill after _id: {last_id}")
+
+    documents = table.find(
+        query, {"intelligent_summary": 1}, batch_size=batch_size
+    ).sort("_id", 1)
+
+    processed = 0
+    started = time.perf_counter()
+    batch: List[Dict[str, Any]] = []
+
+    def flush(chunk: List[Dict[str, Any]]) -> int:
+        to_embed = [doc for doc in chunk if doc.get("intelligent_summary")]
+        if to_embed:
+            embeddings = generate_embeddings(
+                [doc["intelligent_summary"] for doc in to_embed]
+            )
+            # `embedded_at` is what other processes' vector indexes sync from
+            embedded_at = datetime.now(timezone.utc)
+            table.bulk_write(
+                [
+                    UpdateOne(
+                        {"_id": doc["_id"]},
+                        {"$set": {"embedding": embedding, "embedded_at": embedded_at}},
+                    )
+                    for doc, embedding in zip(to_embed, embeddings)
+                ],
+                ordered=False,
             )
-            print(f"Added embedding to document with reportID: {doc['reportID']}")
-        else:
+            index.add([str(doc["_id"]) for doc in to_embed], embeddings)
+        save_checkpoint(db, table_name, chunk[-1]["_id"])
+        return len(to_embed)
+
+    for doc in documents:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            processed += flush(batch)
+            batch = []
+            elapsed = time.perf_counter() - started
             print(
-                f"Document with reportID: {doc['reportID']} already has an embedding."
+                f"Embedded {processed} documents ({processed / elapsed:.1f} docs/sec)"
             )
+    if batch:
+        processed += flush(batch)
+
+    clear_checkpoint(db, table_name)
+    elapsed = time.perf_counter() - started
+    rate = processed / elapsed if elapsed > 0 else 0.0
+    print(
+        f"Backfill done: {processed} documents in {elapsed:.1f}s ({rate:.1f} docs/sec)"
+    )
+    return processed
 
 
 # Example usage
 if __name__ == "__main__":
-    add_embeddings_to_collection()
+    parser = argparse.ArgumentParser(description="Backfill consultation embeddings.")
+    parser.add_argument("--table", default="Consultation")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument(
+        "--restart", action="store_true", help="Ignore any saved checkpoint."
+    )
+    args = parser.parse_args()
+    add_embeddings_to_collection(
+        args.table, batch_size=args.batch_size, resume=not args.restart
+    )
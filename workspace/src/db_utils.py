@@ -1,10 +1,13 @@
 import os
+import threading
 from dotenv import load_dotenv
 from pymongo.database import Database
 from pymongo.collection import Collection
-from pymongo import MongoClient
+from pymongo import MongoClient, ReturnDocument, UpdateOne
+from pymongo.errors import OperationFailure
 import urllib.parse
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List, Optional
+from workspace.src.metrics import MongoCommandMetrics
 
 load_dotenv()
 
@@ -13,9 +16,22 @@ PASSWORD_MONGODB: str = os.getenv("PASSWORD_MONGODB", "")
 INSTANCE_MONGODB: str = os.getenv("INSTANCE_MONGODB", "")
 REGION_MONGODB: str = os.getenv("REGION_MONGODB", "")
 PATH_TLS_CERTIFICATE_MONGODB: str = os.getenv("PATH_TLS_CERTIFICATE_MONGODB", "")
+MONGODB_MAX_POOL_SIZE: int = int(os.getenv("MONGODB_MAX_POOL_SIZE", "50"))
+MONGODB_MIN_POOL_SIZE: int = int(os.getenv("MONGODB_MIN_POOL_SIZE", "0"))
+MONGODB_CONNECT_TIMEOUT_MS: int = int(os.getenv("MONGODB_CONNECT_TIMEOUT_MS", "5000"))
+MONGODB_SERVER_SELECTION_TIMEOUT_MS: int = int(
+    os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "10000")
+)
+MONGODB_SOCKET_TIMEOUT_MS: int = int(os.getenv("MONGODB_SOCKET_TIMEOUT_MS", "30000"))
 
+# One client (and connection pool) per process, re-created after fork()
+_client: Optional[MongoClient[Any]] = None
+_client_pid: Optional[int] = None
+_client_lock = threading.Lock()
 
-def get_mongo_client() -> MongoClient[Any]:
+
+def create_mongo_client() -> MongoClient[Any]:
+    """Build a new client; prefer `get_mongo_client` which shares one per process."""
     username = urllib.parse.quote_plus(USERNAME_MONGODB)
     password = urllib.parse.quote_plus(PASSWORD_MONGODB)  # URL-encode the colon
     instance_id = INSTANCE_MONGODB
@@ -26,24 +42,235 @@ def get_mongo_client() -> MongoClient[Any]:
         f"mongodb+srv://{username}:{password}@{instance_id}.mgdb.{region}.scw.cloud/"
         f"?tls=true&tlsCAFile={tls_certificate}"
     )
-    client: MongoClient[Any] = MongoClient(connection_string)
+    client: MongoClient[Any] = MongoClient(
+        connection_string,
+        maxPoolSize=MONGODB_MAX_POOL_SIZE,
+        minPoolSize=MONGODB_MIN_POOL_SIZE,
+        connectTimeoutMS=MONGODB_CONNECT_TIMEOUT_MS,
+        serverSelectionTimeoutMS=MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        socketTimeoutMS=MONGODB_SOCKET_TIMEOUT_MS,
+        event_listeners=[MongoCommandMetrics()],
+    )
 
     return client
     # flake8: noqa
 
 
+def get_mongo_client() -> MongoClient[Any]:
+    """
+    Return the process-wide MongoClient, creating it on first use.
+
+    PyMongo clients are not fork-safe, so a client inherited from a parent process
+    (e.g. a Celery prefork worker) is discarded and a fresh one is created.
+    """
+    global _client, _client_pid
+    if _client is not None and _client_pid == os.getpid():
+        return _client
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            _client = create_mongo_client()
+            _client_pid = os.getpid()
+        return _client
+
+
+def close_mongo_client() -> None:
+    """Close the shared client of this process, if any."""
+    global _client, _client_pid
+    with _client_lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+        _client_pid = None
+
+
+def _reset_client_after_fork() -> None:
+    # Never close the parent's client from the child: its sockets are shared
+    global _client, _client_pid, _client_lock
+    _client = None
+    _client_pid = None
+    _client_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_client_after_fork)
+
+
 def get_database() -> Database[Any]:
     client = get_mongo_client()
     db = client[USERNAME_MONGODB]
     return db
 
 
+def get_collection(table_name: str) -> Collection[Any]:
+    return get_table(get_database(), table_name)
+
+
 def get_table(db: Database[Any], table_name: str) -> Collection[Any]:
     return db[table_name]
 
 
-def create_index(table: Collection[Any], fields: List[str]) -> None:
-    table.create_index(fields)
+DUPLICATE_KEY = 11000
+
+
+def create_index(
+    table: Collection[Any], fields: List[str], unique: bool = False
+) -> None:
+    table.create_index(fields, unique=unique)
+
+
+def find_duplicates(
+    table: Collection[Any], fields: List[str], limit: int = 5
+) -> List[Dict[str, Any]]:
+    """Up to `limit` values of `fields` held by several documents, with their count."""
+    return list(
+        table.aggregate(
+            [
+                {
+                    "$group": {
+                        "_id": {field: f"${field}" for field in fields},
+                        "count": {"$sum": 1},
+                    }
+                },
+                {"$match": {"count": {"$gt": 1}}},
+                {"$limit": limit},
+            ]
+        )
+    )
+
+
+def create_unique_index(table: Collection[Any], fields: List[str]) -> bool:
+    """
+    Create a unique index on `fields`. If documents already share values, e.g.
+    reportIDs allocated before the counters existed, the index is not created:
+    some of them are logged and False is returned, so the process still starts.
+    """
+    try:
+        create_index(table, fields, unique=True)
+        return True
+    except OperationFailure as e:
+        if e.code != DUPLICATE_KEY:
+            raise
+    duplicates = find_duplicates(table, fields)
+    print(
+        f"WARNING: unique index on {table.name} {fields} not created, these "
+        f"values are held by several documents: {duplicates}. Duplicates are not "
+        "rejected until they are removed or renumbered and the process restarted."
+    )
+    return False
+
+
+COUNTERS_TABLE = "Counters"
+
+
+def next_sequence(
+    db: Database[Any],
+    name: str,
+    start: Optional[Callable[[], int]] = None,
+    count: int = 1,
+) -> int:
+    """
+    Atomically allocate the next `count` values of the counter `name`; return
+    the last one.
+
+    A missing counter is created from `start()` (0 by default), e.g. the
+    largest value already in use; it is only called on the first allocation.
+    """
+    counters = get_table(db, COUNTERS_TABLE)
+    counter = counters.find_one_and_update(
+        {"_id": name},
+        {"$inc": {"value": count}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if counter is None:
+        initial = start() if start is not None else 0
+        # Concurrent first allocations: only one upsert inserts, the other
+        # increments the value it inserted
+        counter = counters.find_one_and_update(
+            {"_id": name},
+            [{"$set": {"value": {"$add": [{"$ifNull": ["$value", initial]}, count]}}}],
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        assert counter is not None
+    return int(counter["value"])
+
+
+def ensure_consultation_indexes(db: Database[Any]) -> bool:
+    """
+    A reportID is unique per patient; the index also serves per-patient reads.
+    Returns False if existing duplicates prevented it, see `create_unique_index`.
+    """
+    return create_unique_index(
+        get_table(db, "Consultation"), ["social_security_number", "reportID"]
+    )
+
+
+def ensure_patient_indexes(db: Database[Any]) -> bool:
+    """One Patient document per social security number; False if not enforced."""
+    return create_unique_index(get_table(db, "Patient"), ["social_security_number"])
+
+
+def _last_report_id(db: Database[Any], ssn: str) -> Callable[[], int]:
+    def last_report_id() -> int:
+        last = get_table(db, "Consultation").find_one(
+            {"social_security_number": ssn},
+            {"reportID": 1},
+            sort=[("reportID", -1)],
+        )
+        return int(last["reportID"]) if last else 0
+
+    return last_report_id
+
+
+def next_report_id(db: Database[Any], ssn: str, count: int = 1) -> int:
+    """
+    Allocate the next reportID of the patient, or a block of `count`
+    consecutive ones and return the first; safe across concurrent workers.
+    """
+    last = next_sequence(db, f"reportID:{ssn}", _last_report_id(db, ssn), count)
+    return last - count + 1
+
+
+def advance_report_ids(db: Database[Any], report_ids: Dict[str, int]) -> None:
+    """
+    Keep each patient's counter past the reportID (by social security number)
+    inserted as given, in three round trips however many patients there are.
+
+    Counters that do not exist yet are created from the largest reportID
+    already stored, as `next_report_id` would.
+    """
+    if not report_ids:
+        return
+    counters = get_table(db, COUNTERS_TABLE)
+    names = {f"reportID:{ssn}": ssn for ssn in report_ids}
+    existing = {
+        counter["_id"]
+        for counter in counters.find({"_id": {"$in": list(names)}}, {"_id": 1})
+    }
+    values = dict(report_ids)
+    missing = [ssn for name, ssn in names.items() if name not in existing]
+    if missing:
+        last_ids = get_table(db, "Consultation").aggregate(
+            [
+                {"$match": {"social_security_number": {"$in": missing}}},
+                {
+                    "$group": {
+                        "_id": "$social_security_number",
+                        "reportID": {"$max": "$reportID"},
+                    }
+                },
+            ]
+        )
+        for last in last_ids:
+            values[last["_id"]] = max(values[last["_id"]], last["reportID"])
+    counters.bulk_write(
+        [
+            UpdateOne(
+                {"_id": f"reportID:{ssn}"}, {"$max": {"value": value}}, upsert=True
+            )
+            for ssn, value in values.items()
+        ],
+        ordered=False,
+    )
 
 
 def insert(table: Collection[Any], document: Dict[str, Any]) -> None:
@@ -1,8 +1,9 @@
 from workspace.src.utils import (
     generate_structured_response,
+    generate_structured_response_async,
 )
 from workspace.src.prompts import detect_medical_prescription_anomaly_system_prompt
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from workspace.src.pydantic_models import PrescriptionAnomalies
 from typing import Any
 
@@ -15,6 +16,16 @@ def detect_prescription_anomalies(client: OpenAI, prompt: str) -> dict[str, Any]
     return response
 
 
+async def detect_prescription_anomalies_async(
+    client: AsyncOpenAI, prompt: str
+) -> dict[str, Any]:
+    system_prompt = detect_medical_prescription_anomaly_system_prompt
+    response: dict[str, Any] = await generate_structured_response_async(
+        client, system_prompt, prompt, PrescriptionAnomalies
+    )
+    return response
+
+
 # # Example usage: ======================================== (will be removed)
 # client = initialize_client()
 # # add a hsitorical data where a patient did not respect the prescription
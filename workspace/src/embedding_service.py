@@ -0,0 +1,230 @@
+import hashlib
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+EMBEDDING_MODEL_NAME: str = os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
+# "local" encodes in this process, "celery" sends requests to the `embed` queue
+EMBEDDING_SERVICE_MODE: str = os.getenv("EMBEDDING_SERVICE_MODE", "local")
+EMBEDDING_MAX_BATCH_SIZE: int = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "64"))
+EMBEDDING_MAX_WAIT_MS: float = float(os.getenv("EMBEDDING_MAX_WAIT_MS", "5"))
+EMBEDDING_CACHE_SIZE: int = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+EMBEDDING_TASK_TIMEOUT: float = float(os.getenv("EMBEDDING_TASK_TIMEOUT", "30"))
+
+Request = Tuple[str, str, "Future[List[float]]"]
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingService:
+    """
+    Owns a single SentenceTransformer and serves embeddings from it.
+
+    Concurrent `embed` calls are queued and collected for up to `max_wait_ms`
+    (or until `max_batch_size` texts are waiting), then encoded in one batch by a
+    background thread. Results are memoized in an LRU cache keyed by the SHA-256
+    of the text, so repeated texts never reach the model.
+    """
+
+    def __init__(
+        self,
+        model_name: str = EMBEDDING_MODEL_NAME,
+        max_batch_size: int = EMBEDDING_MAX_BATCH_SIZE,
+        max_wait_ms: float = EMBEDDING_MAX_WAIT_MS,
+        cache_size: int = EMBEDDING_CACHE_SIZE,
+        model: Optional[Any] = None,
+    ) -> None:
+        self.model_name = model_name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.cache_size = cache_size
+        self._model = model
+        self._model_lock = threading.Lock()
+        self._cache: OrderedDict[str, List[float]] = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._queue: queue.Queue[Request] = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+        self._worker_pid: Optional[int] = None
+        self._stats_lock = threading.Lock()
+        self._requests = 0
+        self._cache_hits = 0
+        self._batches = 0
+        self._encoded = 0
+        self._encode_seconds = 0.0
+
+    @property
+    def model(self) -> Any:
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+
+                    self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    def _cache_get(self, key: str) -> Optional[List[float]]:
+        with self._cache_lock:
+            embedding = self._cache.get(key)
+            if embedding is not None:
+                self._cache.move_to_end(key)
+            return embedding
+
+    def _cache_put(self, key: str, embedding: List[float]) -> None:
+        with self._cache_lock:
+            self._cache[key] = embedding
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        started = time.perf_counter()
+        embeddings: List[List[float]] = self.model.encode(
+            texts, batch_size=self.max_batch_size
+        ).tolist()
+        with self._stats_lock:
+            self._batches += 1
+            self._encoded += len(texts)
+            self._encode_seconds += time.perf_counter() - started
+        return embeddings
+
+    def _ensure_worker(self) -> None:
+        # A thread started before a prefork fork() does not exist in the child
+        if self._worker is not None and self._worker_pid == os.getpid():
+            return
+        with self._worker_lock:
+            if self._worker is not None and self._worker_pid == os.getpid():
+                return
+            self._queue = queue.Queue()
+            self._worker = threading.Thread(
+                target=self._run, name="embedding-batcher", daemon=True
+            )
+            self._worker_pid = os.getpid()
+            self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            # Identical texts queued together are encoded once
+            unique: Dict[str, str] = {key: text for key, text, _ in batch}
+            try:
+                embeddings = dict(
+                    zip(unique, self._encode(list(unique.values())), strict=True)
+                )
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+            for key, embedding in embeddings.items():
+                self._cache_put(key, embedding)
+            for key, _, future in batch:
+                future.set_result(embeddings[key])
+
+    def _count(self, requests: int, hits: int) -> None:
+        with self._stats_lock:
+            self._requests += requests
+            self._cache_hits += hits
+
+    def embed(self, text: str) -> List[float]:
+        """Embed one text, sharing a model batch with concurrent callers."""
+        key = text_hash(text)
+        cached = self._cache_get(key)
+        self._count(1, int(cached is not None))
+        if cached is not None:
+            return cached
+        self._ensure_worker()
+        future: Future[List[float]] = Future()
+        self._queue.put((key, text, future))
+        return future.result()
+
+    def embed_many(self, texts: List[str]) -> List[List[float]]:
+        """Embed many texts at once; cache misses are encoded in a single batch."""
+        keys = [text_hash(text) for text in texts]
+        results: List[Optional[List[float]]] = [self._cache_get(key) for key in keys]
+        missing: Dict[str, str] = {
+            key: text
+            for key, text, result in zip(keys, texts, results)
+            if result is None
+        }
+        self._count(len(texts), len(texts) - sum(r is None for r in results))
+        if missing:
+            encoded = dict(zip(missing, self._encode(list(missing.values()))))
+            for key, embedding in encoded.items():
+                self._cache_put(key, embedding)
+            results = [
+                result if result is not None else encoded[key]
+                for key, result in zip(keys, results)
+            ]
+        return [result for result in results if result is not None]
+
+    def stats(self) -> Dict[str, Any]:
+        """Throughput, batch-size and cache statistics since start-up."""
+        with self._stats_lock:
+            return {
+                "model": self.model_name,
+                "requests": self._requests,
+                "cache_hits": self._cache_hits,
+                "cache_hit_rate": self._cache_hits / self._requests
+                if self._requests
+                else 0.0,
+                "cache_entries": len(self._cache),
+                "batches": self._batches,
+                "texts_encoded": self._encoded,
+                "mean_batch_size": self._encoded / self._batches
+                if self._batches
+                else 0.0,
+                "texts_per_second": self._encoded / self._encode_seconds
+                if self._encode_seconds
+                else 0.0,
+            }
+
+
+_service: Optional[EmbeddingService] = None
+
+
+def get_embedding_service() -> EmbeddingService:
+    """Return the process-wide embedding service; the model loads on first use."""
+    global _service
+    if _service is None:
+        _service = EmbeddingService()
+    return _service
+
+
+def generate_embeddings(texts: List[str]) -> List[List[float]]:
+    """Embed texts locally or through the `embed` Celery queue."""
+    if EMBEDDING_SERVICE_MODE == "celery":
+        from workspace.src.celery_app import celery
+
+        result = celery.send_task(
+            "workspace.src.tasks.embed_texts_task", args=[texts], queue="embed"
+        )
+        embeddings: List[List[float]] = result.get(timeout=EMBEDDING_TASK_TIMEOUT)
+        return embeddings
+    return get_embedding_service().embed_many(texts)
+
+
+def generate_embedding(text: str) -> List[float]:
+    """Embed a single text locally or through the `embed` Celery queue."""
+    if EMBEDDING_SERVICE_MODE == "celery":
+        return generate_embeddings([text])[0]
+    return get_embedding_service().embed(text)
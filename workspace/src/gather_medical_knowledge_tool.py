@@ -1,15 +1,29 @@
+import os
 import requests
-from bs4 import BeautifulSoup
-from typing import TypedDict, Any
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from urllib3.util.retry import Retry
+from typing import Callable, NotRequired, Optional, TypedDict, Any
 from openai import OpenAI
 from workspace.src.prompts import (
     summarize_search_system_prompt,
 )
 from workspace.src.utils import (
     generate_structured_response,
+    generate_structured_response_stream,
 )
+from workspace.src.metrics import instrument_session
+from workspace.src.rate_limit import RateLimitedAdapter
 from workspace.src.pydantic_models import SearchSummary
 
+EUTILS_URL: str = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils"
+PUBMED_TIMEOUT: float = float(os.getenv("PUBMED_TIMEOUT", "10"))
+PUBMED_MAX_RETRIES: int = int(os.getenv("PUBMED_MAX_RETRIES", "3"))
+# Optional NCBI API key, raises the rate limit from 3 to 10 requests/second
+PUBMED_API_KEY: str = os.getenv("PUBMED_API_KEY", "")
+
+_session: Optional[requests.Session] = None
+
 
 # Define TypedDicts for better type checking
 class Article(TypedDict):
@@ -18,6 +32,7 @@ class Article(TypedDict):
     pubdate: str
     source: str
     summary: str
+    abstract: NotRequired[str]
 
 
 class SearchResult(TypedDict):
@@ -26,47 +41,45 @@ class SearchResult(TypedDict):
     articles: list[Article]
 
 
-def search_medical_articles(query: str, retmax: int = 5) -> SearchResult:
+def get_pubmed_session() -> requests.Session:
     """
-    Search for medical articles on PubMed using a research query and return context details.
-
-    Parameters:
-        query (str): The medical research query.
-        retmax (int): The maximum number of articles to retrieve (default is 5).
-
-    Returns:
-        SearchResult: A dictionary containing the original query, number of articles found, and a list of articles.
+    Return the pooled HTTP session used for E-utilities calls. Transient failures
+    (429 and 5xx) are retried with exponential backoff.
     """
-    # Define the base URL for PubMed E-utilities
-    esearch_url: str = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi"
-    esearch_params: dict[str, Any] = {
-        "db": "pubmed",
-        "term": query,
-        "retmax": retmax,
-        "retmode": "json",
-    }
+    global _session
+    if _session is None:
+        retry = Retry(
+            total=PUBMED_MAX_RETRIES,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=("GET", "POST"),
+        )
+        session = requests.Session()
+        session.mount(
+            "https://",
+            RateLimitedAdapter("pubmed", max_retries=retry, pool_maxsize=10),
+        )
+        _session = instrument_session(session, "pubmed")
+    return _session
 
-    # Call ESearch to get a list of PMIDs for the query
-    esearch_response: requests.Response = requests.get(
-        esearch_url, params=esearch_params
-    )
-    if esearch_response.status_code != 200:
-        raise Exception(f"ESearch API error: {esearch_response.status_code}")
-    search_data: dict[str, Any] = esearch_response.json()
-    pmids: list[str] = search_data.get("esearchresult", {}).get("idlist", [])
 
-    if not pmids:
-        return {"query": query, "num_articles_found": 0, "articles": []}
+def _eutils_params(params: dict[str, Any]) -> dict[str, Any]:
+    if PUBMED_API_KEY:
+        return {**params, "api_key": PUBMED_API_KEY}
+    return params
 
+
+def _esummary(pmids: list[str]) -> list[Article]:
     # Use ESummary to get detailed information about the retrieved PMIDs
-    esummary_url: str = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esummary.fcgi"
     esummary_params: dict[str, Any] = {
         "db": "pubmed",
         "id": ",".join(pmids),
         "retmode": "json",
     }
-    esummary_response: requests.Response = requests.get(
-        esummary_url, params=esummary_params
+    esummary_response: requests.Response = get_pubmed_session().get(
+        f"{EUTILS_URL}/esummary.fcgi",
+        params=_eutils_params(esummary_params),
+        timeout=PUBMED_TIMEOUT,
     )
     if esummary_response.status_code != 200:
         raise Exception(f"ESummary API error: {esummary_response.status_code}")
@@ -84,10 +97,108 @@ def search_medical_articles(query: str, retmax: int = 5) -> SearchResult:
             "summary": article_data.get("summary", ""),
         }
         articles.append(article)
+    return articles
+
+
+def search_medical_articles(
+    query: str, retmax: int = 5, with_abstracts: bool = False
+) -> SearchResult:
+    """
+    Search for medical articles on PubMed using a research query and return context details.
+
+    Parameters:
+        query (str): The medical research query.
+        retmax (int): The maximum number of articles to retrieve (default is 5).
+        with_abstracts (bool): Also fetch every abstract, in a single EFetch call
+            issued in parallel with ESummary.
+
+    Returns:
+        SearchResult: A dictionary containing the original query, number of articles found, and a list of articles.
+    """
+    esearch_params: dict[str, Any] = {
+        "db": "pubmed",
+        "term": query,
+        "retmax": retmax,
+        "retmode": "json",
+    }
+
+    # Call ESearch to get a list of PMIDs for the query
+    esearch_response: requests.Response = get_pubmed_session().get(
+        f"{EUTILS_URL}/esearch.fcgi",
+        params=_eutils_params(esearch_params),
+        timeout=PUBMED_TIMEOUT,
+    )
+    if esearch_response.status_code != 200:
+        raise Exception(f"ESearch API error: {esearch_response.status_code}")
+    search_data: dict[str, Any] = esearch_response.json()
+    pmids: list[str] = search_data.get("esearchresult", {}).get("idlist", [])
+
+    if not pmids:
+        return {"query": query, "num_articles_found": 0, "articles": []}
+
+    if not with_abstracts:
+        articles = _esummary(pmids)
+    else:
+        # ESummary and EFetch only depend on the PMIDs, so run them side by side
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            summaries = executor.submit(_esummary, pmids)
+            abstracts = executor.submit(fetch_article_abstracts, pmids)
+            articles = summaries.result()
+            abstract_by_pmid = abstracts.result()
+        for article in articles:
+            article["abstract"] = abstract_by_pmid.get(
+                article["pmid"], "No abstract available."
+            )
 
     return {"query": query, "num_articles_found": len(articles), "articles": articles}
 
 
+def fetch_article_abstracts(pmids: list[str]) -> dict[str, str]:
+    """
+    Fetch the abstracts of many PubMed IDs with a single EFetch request.
+
+    The XML response is parsed incrementally with `iterparse`, and every
+    `PubmedArticle` element is released once read, so memory stays flat however
+    many articles are requested.
+
+    Parameters:
+        pmids (list[str]): The PubMed IDs of the articles.
+
+    Returns:
+        dict[str, str]: Abstract text by PMID. Articles without an abstract map to
+        "No abstract available.".
+
+    Raises:
+        Exception: If the EFetch API returns an error status.
+    """
+    if not pmids:
+        return {}
+    # POST keeps long ID lists out of the URL. The streamed response is closed on
+    # every exit, so its connection goes back to the pool even on errors.
+    abstracts: dict[str, str] = {}
+    with get_pubmed_session().post(
+        f"{EUTILS_URL}/efetch.fcgi",
+        data=_eutils_params({"db": "pubmed", "id": ",".join(pmids), "retmode": "xml"}),
+        timeout=PUBMED_TIMEOUT,
+        stream=True,
+    ) as response:
+        if response.status_code != 200:
+            raise Exception(f"EFetch API error: {response.status_code}")
+
+        response.raw.decode_content = True
+        for _, element in ET.iterparse(response.raw, events=("end",)):
+            if element.tag != "PubmedArticle":
+                continue
+            pmid = element.findtext("MedlineCitation/PMID", default="")
+            # Combine all parts of the abstract if there are multiple tags
+            abstract = " ".join(
+                "".join(tag.itertext()) for tag in element.iter("AbstractText")
+            ).strip()
+            abstracts[pmid] = abstract or "No abstract available."
+            element.clear()
+    return abstracts
+
+
 def fetch_article_abstract(pmid: str) -> str:
     """
     Fetch the abstract text for a given PubMed ID (PMID) using the EFetch API.
@@ -98,25 +209,23 @@ def fetch_article_abstract(pmid: str) -> str:
     Returns:
         str: The abstract text, or a message if not available.
     """
-    efetch_url: str = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi"
-    params: dict[str, Any] = {"db": "pubmed", "id": pmid, "retmode": "xml"}
-    response: requests.Response = requests.get(efetch_url, params=params)
-    if response.status_code != 200:
-        return f"EFetch API error: {response.status_code}"
-
-    # Parse the XML response using BeautifulSoup
-    soup: BeautifulSoup = BeautifulSoup(response.content, "lxml")
-    abstract_tags = soup.find_all("abstracttext")
-    if not abstract_tags:
-        return "No abstract available."
-
-    # Combine all parts of the abstract if there are multiple tags
-    abstract: str = " ".join(tag.get_text() for tag in abstract_tags)
-    return abstract.strip()
+    try:
+        abstracts = fetch_article_abstracts([pmid])
+    except Exception as e:
+        return str(e)
+    return abstracts.get(pmid, "No abstract available.")
 
 
-def generate_search_summary(client: OpenAI, prompt: str) -> dict[str, Any]:
+def generate_search_summary(
+    client: OpenAI,
+    prompt: str,
+    on_delta: Optional[Callable[[str], None]] = None,
+) -> dict[str, Any]:
     system_prompt = summarize_search_system_prompt
+    if on_delta is not None:
+        return generate_structured_response_stream(
+            client, system_prompt, prompt, SearchSummary, on_delta
+        )
     response: dict[str, Any] = generate_structured_response(
         client, system_prompt, prompt, SearchSummary
     )
@@ -9,73 +9,215 @@ from workspace.src.prompts import (
     report_generation_system_prompt,
     system_prompt_synthese,
     prompt_template_synthese,
+    prompt_template_synthese_update,
+)
+from workspace.src.prompt_builder import (
+    MEDICAL_HISTORY_PROMPT_BUDGET,
+    estimate_tokens,
+    serialize,
 )
 from workspace.src.pydantic_models import ConsultationReport
-from pymongo import MongoClient
+from workspace.src.celery_app import celery
+from workspace.src.db_utils import (
+    ensure_consultation_indexes,
+    ensure_patient_indexes,
+    get_database,
+    next_report_id,
+)
 from pymongo.database import Database
-from typing import Any, List, Tuple
+from typing import Any, List, Optional, Tuple
 from openai import OpenAI
-import urllib.parse
-from dotenv import load_dotenv
 import os
 
-load_dotenv()
-USERNAME_MONGODB: str = os.getenv("USERNAME_MONGODB", "")
-PASSWORD_MONGODB: str = os.getenv("PASSWORD_MONGODB", "")
-INSTANCE_MONGODB: str = os.getenv("INSTANCE_MONGODB", "")
-REGION_MONGODB: str = os.getenv("REGION_MONGODB", "")
-PATH_TLS_CERTIFICATE_MONGODB: str = os.getenv("PATH_TLS_CERTIFICATE_MONGODB", "")
 CLIENT = initialize_client()
-
-
-def get_mongo_client() -> MongoClient[Any]:
-    username = urllib.parse.quote_plus(USERNAME_MONGODB)
-    password = urllib.parse.quote_plus(PASSWORD_MONGODB)  # URL-encode the colon
-    instance_id = INSTANCE_MONGODB
-    region = REGION_MONGODB  # the region of your database instance. "fr-par" if Paris
-    tls_certificate = PATH_TLS_CERTIFICATE_MONGODB  # path to your TLS certificate file
-    # Construct the connection string
-    connection_string = (
-        f"mongodb+srv://{username}:{password}@{instance_id}.mgdb.{region}.scw.cloud/"
-        f"?tls=true&tlsCAFile={tls_certificate}"
-    )
-    client: MongoClient[Any] = MongoClient(connection_string)
-
-    return client
-    # flake8: noqa
+# Full rebuild of a patient's medical history, by a Celery task, after this many
+# incremental updates (0 never rebuilds)
+MEDICAL_HISTORY_REBUILD_EVERY: int = int(
+    os.getenv("MEDICAL_HISTORY_REBUILD_EVERY", "10")
+)
+# Token budget of the summaries sent in one prompt; the rest of
+# MEDICAL_HISTORY_PROMPT_BUDGET is left for the record being updated
+MEDICAL_HISTORY_CHUNK_BUDGET: int = int(
+    os.getenv("MEDICAL_HISTORY_CHUNK_BUDGET", str(MEDICAL_HISTORY_PROMPT_BUDGET // 2))
+)
+_indexes_created = False
 
 
 def initialize_db() -> Database[Any]:
-    client = get_mongo_client()
-    db = client[USERNAME_MONGODB]
-    consultations = db["Consultation"]
-    consultations.create_index("keywords")  # Ensure keywords are indexed
+    global _indexes_created
+    db = get_database()
+    if not _indexes_created:
+        consultations = db["Consultation"]
+        consultations.create_index("keywords")  # Ensure keywords are indexed
+        consultations.create_index("date")  # Date-range filters of similarity search
+        consultations.create_index("embedded_at")  # Vector index sync
+        ensure_consultation_indexes(db)
+        ensure_patient_indexes(db)
+        _indexes_created = True
     return db
 
 
-def aggregate_medical_history(summaries: str) -> str:
+def chunk_summaries(
+    summaries: List[str], budget: Optional[int] = None
+) -> List[List[str]]:
+    """
+    Split summaries, keeping their order, into runs of at most `budget` tokens
+    (`MEDICAL_HISTORY_CHUNK_BUDGET` by default). A summary over the budget on
+    its own is a run by itself.
+    """
+    if budget is None:
+        budget = MEDICAL_HISTORY_CHUNK_BUDGET
+    chunks: List[List[str]] = []
+    tokens = 0
+    for summary in summaries:
+        size = estimate_tokens(serialize(summary))
+        if chunks and tokens + size <= budget:
+            chunks[-1].append(summary)
+            tokens += size
+        else:
+            chunks.append([summary])
+            tokens = size
+    return chunks
+
+
+def aggregate_medical_history(summaries: List[str]) -> str:
     """
     Function that generates a medical record based on the provided summaries.
 
+    The record is built from the oldest summaries that fit in one prompt, then
+    the later ones are folded into it chunk by chunk, so no visit is left out
+    however long the history.
+
     Parameters:
-        summaries (List[str]): A list of medical summaries from previous consultations.
-        client (OpenAI): The OpenAI client instance.
+        summaries (List[str]): A list of medical summaries from previous consultations, oldest first.
 
     Returns:
         str: The generated medical record.
     """
-
+    chunks = chunk_summaries(summaries)
+    if not chunks:
+        return ""
     formatted_prompt = generate_prompt(
-        prompt_template=prompt_template_synthese, summaries=summaries
+        prompt_template=prompt_template_synthese,
+        budget=MEDICAL_HISTORY_PROMPT_BUDGET,
+        truncate=["summaries"],
+        summaries=chunks[0],
     )
     response = generate_response(
         client=CLIENT,
         system_prompt=system_prompt_synthese,
         user_prompt=formatted_prompt,
     )
+    for chunk in chunks[1:]:
+        response = fold_medical_history(response, chunk)
     return response
 
 
+def fold_medical_history(medical_history: str, summaries: List[str]) -> str:
+    """
+    Update a synthesized medical record with the summaries of the consultations
+    since it was made, a chunk of summaries per prompt, oldest first; the
+    prompt does not grow with the number of visits.
+    """
+    for chunk in chunk_summaries(summaries):
+        formatted_prompt = generate_prompt(
+            prompt_template=prompt_template_synthese_update,
+            budget=MEDICAL_HISTORY_PROMPT_BUDGET,
+            truncate=["medical_history"],
+            medical_history=medical_history,
+            summaries=chunk,
+        )
+        medical_history = generate_response(
+            client=CLIENT,
+            system_prompt=system_prompt_synthese,
+            user_prompt=formatted_prompt,
+        )
+    return medical_history
+
+
+def get_medical_history(db: Database[Any], ssn: str) -> Tuple[str, int]:
+    """
+    Synthesized medical history of the patient and the last reportID.
+
+    The synthesis is kept on the Patient document with the last reportID it
+    covers. Only newer consultations are read and folded into it, so a visit
+    costs the same however long the record. Every
+    `MEDICAL_HISTORY_REBUILD_EVERY` folds, `rebuild_medical_history` is queued
+    to correct drift and pick up edited consultations. A patient without a
+    Patient document gets one holding just the synthesis.
+    """
+    patient = (
+        db["Patient"].find_one(
+            {"social_security_number": ssn},
+            {
+                "medical_history": 1,
+                "medical_history_reportID": 1,
+                "medical_history_folds": 1,
+            },
+        )
+        or {}
+    )
+    medical_history: str = patient.get("medical_history", "")
+    folds: int = patient.get("medical_history_folds", 0)
+    since: int = patient.get("medical_history_reportID", 0)
+
+    summaries, last_reportID = fetch_related_consultations(db, ssn, since)
+    if not summaries:
+        return medical_history, last_reportID
+    if medical_history:
+        medical_history = fold_medical_history(medical_history, summaries)
+        folds += 1
+    else:
+        medical_history = aggregate_medical_history(summaries)
+        folds = 0
+
+    db["Patient"].update_one(
+        {"social_security_number": ssn},
+        {
+            "$set": {
+                "medical_history": medical_history,
+                "medical_history_reportID": last_reportID,
+                "medical_history_folds": folds,
+            }
+        },
+        upsert=True,
+    )
+    # Queued again every REBUILD_EVERY folds until a rebuild succeeds
+    if (
+        folds
+        and MEDICAL_HISTORY_REBUILD_EVERY
+        and (folds % MEDICAL_HISTORY_REBUILD_EVERY == 0)
+    ):
+        celery.send_task("workspace.src.tasks.rebuild_medical_history_task", args=[ssn])
+    return medical_history, last_reportID
+
+
+def rebuild_medical_history(db: Database[Any], ssn: str) -> bool:
+    """
+    Rebuild the patient's stored synthesis from all their summaries and swap it
+    in, unless a visit updated it in the meantime (the next rebuild will).
+
+    Returns:
+        bool: Whether the rebuilt synthesis was stored.
+    """
+    summaries, last_reportID = fetch_related_consultations(db, ssn)
+    if not summaries:
+        return False
+    result = db["Patient"].update_one(
+        {"social_security_number": ssn, "medical_history_reportID": last_reportID},
+        {
+            "$set": {
+                "medical_history": aggregate_medical_history(summaries),
+                "medical_history_folds": 0,
+            }
+        },
+    )
+    if not result.matched_count:
+        print("A medical history was updated during its rebuild, kept as is")
+        return False
+    return True
+
+
 def generate_report(client: OpenAI, prompt: str) -> dict[str, Any]:
     system_prompt = report_generation_system_prompt
     response: dict[str, Any] = generate_structured_response(
@@ -84,15 +226,36 @@ def generate_report(client: OpenAI, prompt: str) -> dict[str, Any]:
     return response
 
 
-def fetch_related_consultations(db: Database[Any], ssn: str) -> Tuple[List[str], int]:
-    consultations = db["Consultation"]
-    # get all consultations with the same patient ID
-    related = consultations.find({"social_security_number": ssn})
-    summaries = [consultation["intelligent_summary"] for consultation in related]
-    # get reportID max for the patient
-    related = consultations.find({"social_security_number": ssn})
-    last_reportID = max([consultation["reportID"] for consultation in related])
-    return summaries, last_reportID
+def fetch_related_consultations(
+    db: Database[Any], ssn: str, after_reportID: int = 0
+) -> Tuple[List[str], int]:
+    """
+    Summaries of the patient's consultations after `after_reportID`, in visit
+    order, and the last reportID (`after_reportID` if there are none), in one
+    query on the (social_security_number, reportID) index.
+    """
+    related = db["Consultation"].aggregate(
+        [
+            {
+                "$match": {
+                    "social_security_number": ssn,
+                    "reportID": {"$gt": after_reportID},
+                }
+            },
+            {"$sort": {"reportID": 1}},
+            {"$project": {"_id": 0, "intelligent_summary": 1, "reportID": 1}},
+            {
+                "$group": {
+                    "_id": None,
+                    "summaries": {"$push": "$intelligent_summary"},
+                    "last_reportID": {"$last": "$reportID"},
+                }
+            },
+        ]
+    )
+    for history in related:
+        return history["summaries"], history["last_reportID"]
+    return [], after_reportID
 
 
 def generate_and_insert_fake_data(
@@ -102,9 +265,7 @@ def generate_and_insert_fake_data(
     db = initialize_db()
 
     # Fetch related consultations and aggregate medical history
-    related_summaries, last_reported_id = fetch_related_consultations(db, ssn)
-    formatted_summaries = ", ".join(related_summaries)
-    medical_history = aggregate_medical_history(formatted_summaries)
+    medical_history, _ = get_medical_history(db, ssn)
 
     # Format the template with updated medical history
     formatted_template = generate_prompt(
@@ -118,7 +279,7 @@ def generate_and_insert_fake_data(
     # Generate the report using OpenAI
     new_report = generate_report(CLIENT, formatted_template)
 
-    reportId = int(last_reported_id) + 1
+    reportId = next_report_id(db, ssn)
 
     # Insert the new consultation into the database
     consultation_data = {
@@ -148,8 +309,11 @@ def add_new_patient(
     # Initialize MongoDB
     db = initialize_db()
 
-    # Check whether the patient already exists
-    patient = db["Patient"].find_one({"social_security_number": ssn})
+    # Check whether the patient already exists; a document holding only the
+    # synthesized medical history of their consultations does not count
+    patient = db["Patient"].find_one(
+        {"social_security_number": ssn, "full_name": {"$exists": True}}
+    )
     if patient:
         print("Patient already exists in the database.")
         return False
@@ -165,7 +329,9 @@ def add_new_patient(
         "allergies": allergies,
     }
 
-    db["Patient"].insert_one(patient_data)
+    db["Patient"].update_one(
+        {"social_security_number": ssn}, {"$set": patient_data}, upsert=True
+    )
     print("New patient added successfully.")
 
     return True
@@ -0,0 +1,235 @@
+"""
+Bulk import of patients and consultations from NDJSON or CSV files.
+
+Rows are streamed, validated against `PatientRecord` / `ConsultationRecord` and
+written with unordered `insert_many` in batches. Duplicates are rejected by the
+unique indexes rather than looked up row by row. Consultations without a
+reportID get one from the patient's counter, a block per patient and batch.
+
+In CSV files, list fields (symptoms, allergies, ...) are either JSON arrays or
+`;`-separated values.
+
+Usage:
+    python -m workspace.src.import_records patients patients.ndjson
+    python -m workspace.src.import_records consultations history.csv \
+        --batch-size 2000 --rejects rejects.ndjson
+"""
+
+import argparse
+import csv
+import json
+import time
+from collections import defaultdict
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+from pymongo.database import Database
+from pymongo.errors import BulkWriteError
+
+from workspace.src.db_utils import (
+    DUPLICATE_KEY,
+    advance_report_ids,
+    ensure_consultation_indexes,
+    ensure_patient_indexes,
+    get_database,
+    get_table,
+    next_report_id,
+)
+from workspace.src.pydantic_models import ConsultationRecord, PatientRecord
+
+MODELS: Dict[str, Type[BaseModel]] = {
+    "patients": PatientRecord,
+    "consultations": ConsultationRecord,
+}
+TABLES = {"patients": "Patient", "consultations": "Consultation"}
+
+
+def read_rows(file: IO[str], file_format: str) -> Iterator[Tuple[int, Any]]:
+    """Yield (line number, raw row) from an NDJSON or CSV stream."""
+    if file_format == "csv":
+        reader = csv.DictReader(file)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for number, line in enumerate(file, 1):
+        if line.strip():
+            yield number, line
+
+
+def _list_fields(model: Type[BaseModel]) -> List[str]:
+    return [
+        name
+        for name, field in model.model_fields.items()
+        if getattr(field.annotation, "__origin__", None) is list
+    ]
+
+
+def parse_row(raw: Any, model: Type[BaseModel], file_format: str) -> BaseModel:
+    """Validate one raw row; raises ValueError (or ValidationError) if invalid."""
+    if file_format != "csv":
+        return model.model_validate_json(raw)
+    row: Dict[str, Any] = {}
+    lists = _list_fields(model)
+    for key, value in raw.items():
+        if key in lists and isinstance(value, str):
+            row[key] = (
+                json.loads(value)
+                if value.startswith("[")
+                else [item.strip() for item in value.split(";") if item.strip()]
+            )
+        elif value not in (None, ""):
+            row[key] = value
+    return model.model_validate(row)
+
+
+def _rejection(line: int, reason: str, row: Any) -> Dict[str, Any]:
+    return {"line": line, "reason": reason, "row": row}
+
+
+def write_batch(
+    db: Database[Any], kind: str, batch: List[Tuple[int, Dict[str, Any]]]
+) -> Tuple[int, List[Dict[str, Any]]]:
+    """
+    Insert one batch with an unordered `insert_many`; return the number of
+    documents inserted and the rows the database rejected.
+    """
+    if kind == "consultations":
+        _assign_report_ids(db, [doc for _, doc in batch])
+    documents = [doc for _, doc in batch]
+    try:
+        result = get_table(db, TABLES[kind]).insert_many(documents, ordered=False)
+        return len(result.inserted_ids), []
+    except BulkWriteError as e:
+        rejected = []
+        for error in e.details["writeErrors"]:
+            line, document = batch[error["index"]]
+            document.pop("_id", None)
+            reason = "duplicate" if error["code"] == DUPLICATE_KEY else error["errmsg"]
+            rejected.append(_rejection(line, reason, document))
+        return e.details["nInserted"], rejected
+
+
+def _assign_report_ids(db: Database[Any], documents: List[Dict[str, Any]]) -> None:
+    missing: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    given: Dict[str, int] = {}
+    for document in documents:
+        ssn = document["social_security_number"]
+        if document.get("reportID") is None:
+            missing[ssn].append(document)
+        else:
+            given[ssn] = max(given.get(ssn, 0), document["reportID"])
+    # IDs given in the file must never be handed out again by the counter
+    advance_report_ids(db, given)
+    for ssn, group in missing.items():
+        first = next_report_id(db, ssn, len(group))
+        for offset, document in enumerate(group):
+            document["reportID"] = first + offset
+
+
+def import_records(
+    db: Database[Any],
+    kind: str,
+    file: IO[str],
+    file_format: str = "ndjson",
+    batch_size: int = 1000,
+    rejects: Optional[IO[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Import `kind` ("patients" or "consultations") rows from `file`.
+
+    Rejected rows, invalid or refused by the database, are written to `rejects`
+    as NDJSON with their line number and reason.
+
+    Returns:
+        Dict[str, Any]: Rows read, inserted and rejected, elapsed seconds and rows/sec.
+    """
+    model = MODELS[kind]
+    ensure_indexes = (
+        ensure_consultation_indexes
+        if kind == "consultations"
+        else ensure_patient_indexes
+    )
+    # Duplicates are only rejected by the unique index
+    if not ensure_indexes(db):
+        raise RuntimeError(
+            f"Resolve the duplicate {kind} already stored before importing more."
+        )
+
+    stats = {"rows": 0, "inserted": 0, "rejected": 0}
+    started = time.perf_counter()
+    batch: List[Tuple[int, Dict[str, Any]]] = []
+
+    def reject(rows: List[Dict[str, Any]]) -> None:
+        stats["rejected"] += len(rows)
+        if rejects is not None:
+            for row in rows:
+                rejects.write(json.dumps(row, default=str) + "\n")
+
+    def flush() -> None:
+        inserted, rejected = write_batch(db, kind, batch)
+        stats["inserted"] += inserted
+        reject(rejected)
+        batch.clear()
+        elapsed = time.perf_counter() - started
+        print(
+            f"Imported {stats['inserted']} {kind}, rejected {stats['rejected']} "
+            f"({stats['rows'] / elapsed:.1f} rows/sec)"
+        )
+
+    for line, raw in read_rows(file, file_format):
+        stats["rows"] += 1
+        try:
+            record = parse_row(raw, model, file_format)
+        except (ValidationError, ValueError) as e:
+            reason = str(e).replace("\n", " ")
+            reject([_rejection(line, reason, raw)])
+            continue
+        batch.append((line, record.model_dump(exclude_none=True)))
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    elapsed = time.perf_counter() - started
+    return {
+        **stats,
+        "seconds": elapsed,
+        "rows_per_second": stats["rows"] / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Bulk import patients or consultations."
+    )
+    parser.add_argument("kind", choices=sorted(MODELS))
+    parser.add_argument("path")
+    parser.add_argument(
+        "--format",
+        choices=["ndjson", "csv"],
+        help="Default: from the file extension.",
+    )
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--rejects", help="Write rejected rows here as NDJSON.")
+    args = parser.parse_args()
+
+    file_format = args.format or ("csv" if args.path.endswith(".csv") else "ndjson")
+    with open(args.path, encoding="utf-8", newline="") as file:
+        rejects = open(args.rejects, "w", encoding="utf-8") if args.rejects else None
+        try:
+            stats = import_records(
+                get_database(),
+                args.kind,
+                file,
+                file_format,
+                batch_size=args.batch_size,
+                rejects=rejects,
+            )
+        finally:
+            if rejects is not None:
+                rejects.close()
+    print(
+        f"Done: {stats['inserted']} of {stats['rows']} rows imported, "
+        f"{stats['rejected']} rejected, in {stats['seconds']:.1f}s "
+        f"({stats['rows_per_second']:.1f} rows/sec)"
+    )
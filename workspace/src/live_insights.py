@@ -0,0 +1,191 @@
+import asyncio
+import os
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+from numpy.typing import NDArray
+from openai import AsyncOpenAI
+
+from workspace.src.embedding_service import generate_embeddings
+from workspace.src.prompts import (
+    live_insights_prompt_template,
+    live_insights_system_prompt,
+)
+from workspace.src.pydantic_models import LiveInsights
+from workspace.src.utils import generate_prompt, generate_structured_response_async
+
+load_dotenv()
+
+# New transcript needed before the LLM is asked again, in characters
+LIVE_INSIGHTS_MIN_NEW_CHARS: int = int(os.getenv("LIVE_INSIGHTS_MIN_NEW_CHARS", "400"))
+# Earlier transcript re-sent with each update for continuity, in characters
+LIVE_INSIGHTS_CONTEXT_CHARS: int = int(os.getenv("LIVE_INSIGHTS_CONTEXT_CHARS", "600"))
+# Items of each kind listed in the state summary sent to the LLM
+LIVE_INSIGHTS_STATE_ITEMS: int = int(os.getenv("LIVE_INSIGHTS_STATE_ITEMS", "12"))
+# Cosine similarity above which a new point repeats an earlier one
+LIVE_INSIGHTS_DEDUPE_THRESHOLD: float = float(
+    os.getenv("LIVE_INSIGHTS_DEDUPE_THRESHOLD", "0.85")
+)
+
+Embedder = Callable[[List[str]], List[List[float]]]
+
+
+def _bullets(items: List[str]) -> str:
+    return "\n".join(f"- {item}" for item in items) if items else "- None"
+
+
+class _DedupedList:
+    """Items kept in order, with a new item dropped if it is too close to one kept."""
+
+    def __init__(self, threshold: float) -> None:
+        self.threshold = threshold
+        self.items: List[str] = []
+        self._vectors: Optional[NDArray[np.float32]] = None
+
+    def add(self, items: List[str], vectors: List[List[float]]) -> List[str]:
+        added: List[str] = []
+        for item, vector in zip(items, vectors):
+            v = np.asarray(vector, dtype=np.float32)
+            v /= np.linalg.norm(v) or 1.0
+            if (
+                self._vectors is not None
+                and (self._vectors @ v).max() >= self.threshold
+            ):
+                continue
+            self._vectors = (
+                v[None, :] if self._vectors is None else np.vstack([self._vectors, v])
+            )
+            self.items.append(item)
+            added.append(item)
+        return added
+
+
+class LiveInsightEngine:
+    """
+    Follows one consultation as it is transcribed and keeps its insights current.
+
+    Each update sends the LLM only the transcript received since the previous
+    update, the tail of the earlier transcript, and a bounded summary of the
+    points and search propositions noted so far. The prompt therefore stays the
+    same size however long the consultation runs. Points and search propositions
+    that repeat earlier ones, by embedding similarity, are dropped.
+    """
+
+    def __init__(
+        self,
+        client: AsyncOpenAI,
+        previous_medical_history: str = "Not Provided",
+        min_new_chars: int = LIVE_INSIGHTS_MIN_NEW_CHARS,
+        context_chars: int = LIVE_INSIGHTS_CONTEXT_CHARS,
+        state_items: int = LIVE_INSIGHTS_STATE_ITEMS,
+        dedupe_threshold: float = LIVE_INSIGHTS_DEDUPE_THRESHOLD,
+        embed: Embedder = generate_embeddings,
+    ) -> None:
+        self.client = client
+        self.previous_medical_history = previous_medical_history
+        self.min_new_chars = min_new_chars
+        self.context_chars = context_chars
+        self.state_items = state_items
+        self.embed = embed
+        self.points = _DedupedList(dedupe_threshold)
+        self.search_propositions = _DedupedList(dedupe_threshold)
+        self.follow_up_questions: List[str] = []
+        self.updates = 0
+        self._context = ""
+        self._pending = ""
+
+    def state(self) -> Dict[str, Any]:
+        """Everything noted so far."""
+        return {
+            "pertinent_medical_points": list(self.points.items),
+            "follow_up_questions": list(self.follow_up_questions),
+            "search_propositions": list(self.search_propositions.items),
+            "updates": self.updates,
+        }
+
+    def build_prompt(self) -> str:
+        """The prompt for the next update: the new window plus a compact state."""
+        state_summary = (
+            "Pertinent medical points:\n"
+            f"{_bullets(self.points.items[-self.state_items :])}\n"
+            "Follow-up questions already proposed:\n"
+            f"{_bullets(self.follow_up_questions)}\n"
+            "Searches already proposed:\n"
+            f"{_bullets(self.search_propositions.items[-self.state_items :])}"
+        )
+        return generate_prompt(
+            live_insights_prompt_template,
+            previous_medical_history=self.previous_medical_history,
+            state_summary=state_summary,
+            recent_context=self._context or "None",
+            new_transcript=self._pending,
+        )
+
+    async def feed(self, text: str) -> Optional[Dict[str, Any]]:
+        """
+        Add transcribed text; once enough has accumulated, run an update.
+
+        Returns:
+            Optional[Dict[str, Any]]: What the update added, or None if no
+            update ran.
+        """
+        self._pending += text
+        if len(self._pending) < self.min_new_chars:
+            return None
+        return await self.flush()
+
+    async def flush(self) -> Optional[Dict[str, Any]]:
+        """Run an update on whatever text is pending, however short."""
+        if not self._pending.strip():
+            return None
+        response = await generate_structured_response_async(
+            self.client,
+            live_insights_system_prompt,
+            self.build_prompt(),
+            LiveInsights,
+        )
+        if "error" in response:
+            # Keep the text so the next update covers it
+            return None
+
+        points = response["pertinent_medical_points"]
+        searches = response["search_propositions"]
+        vectors = (
+            await asyncio.to_thread(self.embed, points + searches)
+            if points or searches
+            else []
+        )
+        new_points = self.points.add(points, vectors[: len(points)])
+        new_searches = self.search_propositions.add(searches, vectors[len(points) :])
+        self.follow_up_questions = response["follow_up_questions"]
+
+        self._context = (self._context + self._pending)[-self.context_chars :]
+        self._pending = ""
+        self.updates += 1
+        return {
+            "new_pertinent_medical_points": new_points,
+            "follow_up_questions": self.follow_up_questions,
+            "new_search_propositions": new_searches,
+        }
+
+    async def run(
+        self, chunks: AsyncIterator[Dict[str, Any]]
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Consume `stt_simulation_module.stream_speech_buffer` chunks and yield
+        each update as it is produced, including a final one for the tail.
+        """
+        speech = None
+        async for chunk in chunks:
+            # Chunks of one speech concatenate back to it; speeches get a line each
+            text = chunk["content"]
+            if speech is not None and chunk["speech_number"] != speech:
+                text = "\n" + text
+            speech = chunk["speech_number"]
+            update = await self.feed(text)
+            if update is not None:
+                yield update
+        update = await self.flush()
+        if update is not None:
+            yield update
@@ -0,0 +1,163 @@
+import copy
+import hashlib
+from abc import ABC, abstractmethod
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple, Type
+
+from dotenv import load_dotenv
+from pydantic import BaseModel
+
+load_dotenv()
+
+# "memory", "redis" or "none"
+LLM_CACHE_BACKEND: str = os.getenv("LLM_CACHE_BACKEND", "memory")
+LLM_CACHE_TTL: int = int(os.getenv("LLM_CACHE_TTL", "900"))
+LLM_CACHE_MAX_ENTRIES: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+LLM_CACHE_REDIS_URL: str = os.getenv("LLM_CACHE_REDIS_URL", "redis://redis:6379/2")
+
+
+def cache_key(
+    model: str,
+    system_prompt: str,
+    user_prompt: str,
+    response_model: Optional[Type[BaseModel]] = None,
+) -> str:
+    """Hash of everything that determines an LLM answer."""
+    schema = response_model.model_json_schema() if response_model else None
+    payload = json.dumps(
+        [model, system_prompt, user_prompt, schema], sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache(ABC):
+    """Base class for LLM response caches; counts hits and misses."""
+
+    def __init__(self, ttl: int = LLM_CACHE_TTL) -> None:
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    @abstractmethod
+    def _get(self, key: str) -> Optional[Any]:
+        """The stored value of `key`, or None if missing or expired."""
+
+    @abstractmethod
+    def _set(self, key: str, value: Any) -> None:
+        """Store `value` under `key` for `ttl` seconds."""
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self._get(key)
+        with self._stats_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self._set(key, value)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "backend": type(self).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+class InMemoryLLMCache(LLMCache):
+    """Per-process cache with TTL expiry and LRU eviction."""
+
+    def __init__(
+        self, ttl: int = LLM_CACHE_TTL, max_entries: int = LLM_CACHE_MAX_ENTRIES
+    ) -> None:
+        super().__init__(ttl)
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, Tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            # Callers get their own copy, as they would from Redis
+            return copy.deepcopy(value)
+
+    def _set(self, key: str, value: Any) -> None:
+        # Later changes to the caller's object must not reach the cached entry
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class RedisLLMCache(LLMCache):
+    """
+    Cache shared by every process through Redis.
+
+    Entries expire after `ttl`; LRU eviction is delegated to the Redis
+    `maxmemory-policy` (e.g. `allkeys-lru`) of the cache database.
+    """
+
+    def __init__(
+        self, url: str = LLM_CACHE_REDIS_URL, ttl: int = LLM_CACHE_TTL
+    ) -> None:
+        super().__init__(ttl)
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self._errors = (redis.RedisError,)
+
+    def _get(self, key: str) -> Optional[Any]:
+        # An unavailable cache must never fail the LLM call itself
+        try:
+            raw = self._redis.get(f"llm:{key}")
+        except self._errors as e:
+            print(f"LLM cache read failed: {e}")
+            return None
+        return json.loads(raw) if raw is not None else None
+
+    def _set(self, key: str, value: Any) -> None:
+        try:
+            self._redis.set(f"llm:{key}", json.dumps(value), ex=self.ttl)
+        except self._errors as e:
+            print(f"LLM cache write failed: {e}")
+
+
+_cache: Optional[LLMCache] = None
+_cache_initialized = False
+
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """Return the configured process-wide cache, or None when caching is off."""
+    global _cache, _cache_initialized
+    if not _cache_initialized:
+        if LLM_CACHE_BACKEND == "redis":
+            _cache = RedisLLMCache()
+        elif LLM_CACHE_BACKEND == "memory":
+            _cache = InMemoryLLMCache()
+        _cache_initialized = True
+    return _cache
+
+
+def set_llm_cache(cache: Optional[LLMCache]) -> None:
+    """Replace the process-wide cache (None disables caching)."""
+    global _cache, _cache_initialized
+    _cache = cache
+    _cache_initialized = True
@@ -0,0 +1,245 @@
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import requests
+from dotenv import load_dotenv
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    start_http_server,
+)
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import REGISTRY, Collector
+from pymongo import monitoring
+
+load_dotenv()
+
+# Set in every process of a multi-process server (Celery prefork, gunicorn) so
+# the exporter aggregates the values recorded by all of them
+PROMETHEUS_MULTIPROC_DIR: Optional[str] = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+# Port of the worker-side exporter; 0 disables it
+WORKER_METRICS_PORT: int = int(os.getenv("WORKER_METRICS_PORT", "9808"))
+
+if PROMETHEUS_MULTIPROC_DIR:
+    os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+
+SHORT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LONG_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+
+API_REQUEST_SECONDS = Histogram(
+    "api_request_seconds",
+    "Flask request latency",
+    ["method", "endpoint", "status"],
+    buckets=SHORT_BUCKETS,
+)
+TASK_QUEUE_WAIT_SECONDS = Histogram(
+    "celery_task_queue_wait_seconds",
+    "Time between a task being published and a worker starting it",
+    ["task", "queue"],
+    buckets=LONG_BUCKETS,
+)
+TASK_EXECUTION_SECONDS = Histogram(
+    "celery_task_execution_seconds",
+    "Time a worker spent running a task",
+    ["task", "state"],
+    buckets=LONG_BUCKETS,
+)
+LLM_REQUEST_SECONDS = Histogram(
+    "llm_request_seconds",
+    "Latency of LLM calls, up to the last token for streamed calls",
+    ["operation", "model", "outcome"],
+    buckets=LONG_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "llm_tokens",
+    "Tokens reported by the LLM provider",
+    ["model", "kind"],
+)
+MONGODB_COMMAND_SECONDS = Histogram(
+    "mongodb_command_seconds",
+    "MongoDB command latency",
+    ["command", "outcome"],
+    buckets=SHORT_BUCKETS,
+)
+EXTERNAL_API_SECONDS = Histogram(
+    "external_api_seconds",
+    "Latency of calls to external HTTP APIs",
+    ["service", "status"],
+    buckets=SHORT_BUCKETS,
+)
+
+
+@contextmanager
+def track_llm_call(operation: str, model: str) -> Iterator[None]:
+    """Time one LLM call; the outcome is "error" if the block raises."""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        LLM_REQUEST_SECONDS.labels(operation, model, outcome).observe(
+            time.perf_counter() - started
+        )
+
+
+def record_llm_usage(model: str, response: Any) -> None:
+    """Count the prompt and completion tokens of a response or chunk, if reported."""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    LLM_TOKENS.labels(model, "prompt").inc(usage.prompt_tokens or 0)
+    LLM_TOKENS.labels(model, "completion").inc(usage.completion_tokens or 0)
+
+
+def instrument_session(session: requests.Session, service: str) -> requests.Session:
+    """Time every response received through `session` under `service`."""
+
+    def observe(response: requests.Response, *args: Any, **kwargs: Any) -> None:
+        EXTERNAL_API_SECONDS.labels(service, str(response.status_code)).observe(
+            response.elapsed.total_seconds()
+        )
+
+    session.hooks["response"].append(observe)
+    return session
+
+
+@contextmanager
+def track_external_call(service: str) -> Iterator[None]:
+    """Time an external call made without an instrumented session."""
+    started = time.perf_counter()
+    status = "error"
+    try:
+        yield
+        status = "ok"
+    finally:
+        EXTERNAL_API_SECONDS.labels(service, status).observe(
+            time.perf_counter() - started
+        )
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """pymongo command listener feeding `mongodb_command_seconds`."""
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        pass
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        MONGODB_COMMAND_SECONDS.labels(event.command_name, "ok").observe(
+            event.duration_micros / 1e6
+        )
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        MONGODB_COMMAND_SECONDS.labels(event.command_name, "error").observe(
+            event.duration_micros / 1e6
+        )
+
+
+class QueueDepthCollector(Collector):
+    """Reports the number of messages waiting in each Celery queue at scrape time."""
+
+    def __init__(self, celery: Any) -> None:
+        self.celery = celery
+
+    def queues(self) -> List[str]:
+        routes: Dict[str, Dict[str, str]] = self.celery.conf.task_routes or {}
+        names = {route["queue"] for route in routes.values() if "queue" in route}
+        return sorted(names | {self.celery.conf.task_default_queue})
+
+    def collect(self) -> Iterable[GaugeMetricFamily]:
+        gauge = GaugeMetricFamily(
+            "celery_queue_depth", "Messages waiting in a Celery queue", labels=["queue"]
+        )
+        try:
+            with self.celery.connection_for_read() as connection:
+                client = connection.default_channel.client
+                for queue in self.queues():
+                    gauge.add_metric([queue], client.llen(queue))
+        except Exception as e:
+            print(f"Could not read Celery queue depths: {e}")
+        yield gauge
+
+
+def metrics_registry() -> CollectorRegistry:
+    """
+    The registry to expose: the values recorded by every process when
+    `PROMETHEUS_MULTIPROC_DIR` is set, else those of this process.
+    """
+    if PROMETHEUS_MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        collector: Any = multiprocess.MultiProcessCollector
+        collector(registry)
+        return registry
+    return REGISTRY
+
+
+def clear_multiprocess_dir() -> None:
+    """Remove values left by a previous run; call before worker processes start."""
+    if not PROMETHEUS_MULTIPROC_DIR:
+        return
+    for name in os.listdir(PROMETHEUS_MULTIPROC_DIR):
+        if name.endswith(".db"):
+            os.remove(os.path.join(PROMETHEUS_MULTIPROC_DIR, name))
+
+
+def mark_process_dead(pid: int) -> None:
+    """Drop the live-gauge values of a worker process that exited."""
+    if PROMETHEUS_MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+
+        mark_dead: Any = multiprocess.mark_process_dead
+        mark_dead(pid)
+
+
+def start_worker_exporter(port: int = WORKER_METRICS_PORT) -> None:
+    """Serve the worker's metrics over HTTP on `port`."""
+    if port:
+        start_http_server(port, registry=metrics_registry())
+
+
+_task_started: Dict[str, float] = {}
+
+
+def connect_celery_metrics() -> None:
+    """Record queue wait and execution time of every task through Celery signals."""
+    from celery import signals
+
+    @signals.before_task_publish.connect(weak=False)
+    def stamp_published_at(headers: Dict[str, Any], **kwargs: Any) -> None:
+        headers.setdefault("published_at", time.time())
+
+    @signals.task_prerun.connect(weak=False)
+    def observe_queue_wait(task_id: str, task: Any, **kwargs: Any) -> None:
+        _task_started[task_id] = time.perf_counter()
+        published_at = getattr(task.request, "published_at", None)
+        if published_at is None:
+            published_at = (task.request.headers or {}).get("published_at")
+        if published_at is not None:
+            queue = (task.request.delivery_info or {}).get("routing_key", "unknown")
+            TASK_QUEUE_WAIT_SECONDS.labels(task.name, queue).observe(
+                max(time.time() - float(published_at), 0.0)
+            )
+
+    @signals.task_postrun.connect(weak=False)
+    def observe_execution(
+        task_id: str, task: Any, state: Optional[str] = None, **kwargs: Any
+    ) -> None:
+        started = _task_started.pop(task_id, None)
+        if started is not None:
+            TASK_EXECUTION_SECONDS.labels(task.name, state or "UNKNOWN").observe(
+                time.perf_counter() - started
+            )
+
+    @signals.worker_init.connect(weak=False)
+    def start_exporter(**kwargs: Any) -> None:
+        clear_multiprocess_dir()
+        start_worker_exporter()
+
+    @signals.worker_process_shutdown.connect(weak=False)
+    def forget_process(pid: Optional[int] = None, **kwargs: Any) -> None:
+        mark_process_dead(pid or os.getpid())
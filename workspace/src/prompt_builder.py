@@ -0,0 +1,190 @@
+import math
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Rough characters per token of the LLM tokenizer, for mixed French/English text
+PROMPT_CHARS_PER_TOKEN: float = float(os.getenv("PROMPT_CHARS_PER_TOKEN", "3.5"))
+# Per-task prompt budgets, in estimated tokens
+SEARCH_SUMMARY_PROMPT_BUDGET: int = int(
+    os.getenv("SEARCH_SUMMARY_PROMPT_BUDGET", "6000")
+)
+REPORT_PROMPT_BUDGET: int = int(os.getenv("REPORT_PROMPT_BUDGET", "8000"))
+MEDICAL_HISTORY_PROMPT_BUDGET: int = int(
+    os.getenv("MEDICAL_HISTORY_PROMPT_BUDGET", "6000")
+)
+# Below this many characters an item is dropped rather than cut further
+PROMPT_MIN_ITEM_CHARS: int = int(os.getenv("PROMPT_MIN_ITEM_CHARS", "400"))
+# Part of the room left by the fixed fields that is split evenly between the
+# truncated fields, so that a long one cannot starve the others
+PROMPT_MIN_FIELD_SHARE: float = float(os.getenv("PROMPT_MIN_FIELD_SHARE", "0.5"))
+
+CUT_MARKER = " […]"
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of `text`."""
+    return math.ceil(len(text) / PROMPT_CHARS_PER_TOKEN)
+
+
+def _is_empty(value: Any) -> bool:
+    return value is None or value == "" or value == [] or value == {}
+
+
+def serialize(value: Any) -> str:
+    """
+    Render a prompt input compactly: strings as they are, mappings as
+    `key: value` lines without empty fields, lists as one entry per line (or a
+    blank-line separated block per mapping).
+    """
+    if isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        return "\n".join(
+            f"{key}: {_inline(item)}"
+            for key, item in value.items()
+            if not _is_empty(item)
+        )
+    if isinstance(value, (list, tuple)):
+        items, separator = _render_items(value)
+        return separator.join(items)
+    return str(value)
+
+
+def _render_items(values: Sequence[Any]) -> Tuple[List[str], str]:
+    if any(isinstance(item, dict) for item in values):
+        return [serialize(item) for item in values if not _is_empty(item)], "\n\n"
+    return [f"- {_inline(item)}" for item in values if not _is_empty(item)], "\n"
+
+
+def _inline(value: Any) -> str:
+    if isinstance(value, (list, tuple)):
+        return ", ".join(_inline(item) for item in value if not _is_empty(item))
+    if isinstance(value, dict):
+        return "; ".join(
+            f"{key}: {_inline(item)}"
+            for key, item in value.items()
+            if not _is_empty(item)
+        )
+    return str(value)
+
+
+def _cut_middle(text: str, max_chars: int) -> str:
+    # Keeps both the opening and the latest exchanges of a conversation
+    if len(text) <= max_chars:
+        return text
+    if max_chars <= len(CUT_MARKER):
+        return ""
+    keep = max_chars - len(CUT_MARKER)
+    head = keep // 3
+    return text[:head] + CUT_MARKER + text[len(text) - (keep - head) :]
+
+
+def _cut_end(text: str, max_chars: int) -> str:
+    if len(text) <= max_chars:
+        return text
+    if max_chars <= len(CUT_MARKER):
+        return ""
+    return text[: max_chars - len(CUT_MARKER)] + CUT_MARKER
+
+
+def _fit_items(items: Sequence[Any], max_chars: int) -> str:
+    """
+    Fit a list into `max_chars`. Items are shortened evenly (short ones are kept
+    whole and their unused share goes to the others); if the shares would get
+    too small, the last items are dropped, as lists are ordered by relevance.
+    """
+    rendered, separator = _render_items(items)
+    if not rendered:
+        return ""
+
+    def available() -> int:
+        return max_chars - len(separator) * (len(rendered) - 1)
+
+    while (
+        len(rendered) > 1
+        and sum(len(text) for text in rendered) > available()
+        and available() // len(rendered) < PROMPT_MIN_ITEM_CHARS
+    ):
+        rendered.pop()
+
+    shares: Dict[int, int] = {}
+    remaining = available()
+    order = sorted(range(len(rendered)), key=lambda i: len(rendered[i]))
+    for position, index in enumerate(order):
+        share = remaining // (len(order) - position)
+        shares[index] = min(len(rendered[index]), share)
+        remaining -= shares[index]
+    return separator.join(_cut_end(text, shares[i]) for i, text in enumerate(rendered))
+
+
+def _field_shares(lengths: Dict[str, int], available: int) -> Dict[str, int]:
+    """
+    Split `available` characters between fields: each first gets an even
+    minimum share (or its whole length if shorter), then the rest goes to the
+    fields still too long, in proportion to what they lack.
+    """
+    floor = int(available * PROMPT_MIN_FIELD_SHARE) // max(len(lengths), 1)
+    shares = {key: min(length, floor) for key, length in lengths.items()}
+    remaining = available - sum(shares.values())
+    missing = {key: lengths[key] - shares[key] for key in lengths}
+    total_missing = sum(missing.values())
+    if total_missing <= remaining:
+        return dict(lengths)
+    for key in lengths:
+        shares[key] += missing[key] * remaining // total_missing
+    return shares
+
+
+def build_prompt(
+    prompt_template: str,
+    budget: Optional[int] = None,
+    truncate: Sequence[str] = (),
+    **kwargs: Any,
+) -> str:
+    """
+    Fill `prompt_template` with compactly serialized `kwargs`.
+
+    With a token `budget`, the fields named in `truncate` share the room left
+    by the other fields: each gets a minimum share, and the rest is split in
+    proportion to their size. Lists lose the tail of each item and then their
+    last items, strings lose their middle. The amount cut is logged, as are
+    other fields that alone exceed the budget.
+    """
+    fields = {key: serialize(value) for key, value in kwargs.items()}
+    prompt = prompt_template.format(**fields)
+    if budget is None or estimate_tokens(prompt) <= budget:
+        return prompt
+
+    fixed = prompt_template.format(
+        **{key: "" if key in truncate else text for key, text in fields.items()}
+    )
+    available = int(budget * PROMPT_CHARS_PER_TOKEN) - len(fixed)
+    if available < 0 or not truncate:
+        print(
+            f"WARNING: prompt fields other than {', '.join(truncate) or 'none'} "
+            f"take {estimate_tokens(fixed)} tokens, over the {budget} token budget"
+        )
+    if not truncate:
+        return prompt
+
+    shares = _field_shares(
+        {key: len(fields[key]) for key in truncate}, max(available, 0)
+    )
+    for key in truncate:
+        value = kwargs[key]
+        if isinstance(value, (list, tuple)) and len(fields[key]) > shares[key]:
+            fields[key] = _fit_items(value, shares[key])
+        else:
+            fields[key] = _cut_middle(fields[key], shares[key])
+
+    fitted = prompt_template.format(**fields)
+    print(
+        f"Prompt over budget ({estimate_tokens(prompt)} > {budget} tokens): cut "
+        f"{estimate_tokens(prompt) - estimate_tokens(fitted)} tokens from "
+        f"{', '.join(truncate)}"
+    )
+    return fitted
@@ -128,7 +128,7 @@ system_prompt_synthese = (
 )
 prompt_template_synthese = """
 Generate a medical record based on the following information:
-- Summaries of previous consultations: {summaries}
+- Summaries of previous consultations, oldest first: {summaries}
 
 ** The Output should be a string precise and concise of the medical record. ** 
 
@@ -145,4 +145,35 @@ Patient exhibits flu symptoms and is advised rest and medication. Patient has a
 
 <Input>
     """
+
+prompt_template_synthese_update = """
+Update the medical record of a patient with the summaries of their latest consultations:
+- Current medical record: {medical_history}
+- Summaries of the latest consultations, oldest first: {summaries}
+
+Keep everything from the current record that is still relevant, add what is new, and when the new summaries contradict the record, follow the most recent consultation.
+
+** The Output should be a string precise and concise of the updated medical record. **
+"""
+
+live_insights_system_prompt = "You are a Medical AI Assistant following a consultation between a doctor and a patient as it happens. You receive only the newest part of the conversation together with what has already been noted, and you update the notes."
+
+live_insights_prompt_template = """A new part of the conversation between the doctor and the patient has been transcribed. Using it, and what has already been noted, provide:
+- pertinent_medical_points: only NEW pertinent medical points found in the new part. Do not repeat points already noted.
+- follow_up_questions: the 4 most pertinent follow-up questions the doctor should ask now.
+- search_propositions: up to 4 niche medical search queries, different from those already proposed.
+---
+#### Patient Previous Medical History
+{previous_medical_history}
+---
+#### Already Noted
+{state_summary}
+---
+#### End of the Earlier Conversation (for context)
+{recent_context}
+---
+#### New Part of the Conversation
+{new_transcript}
+---
+#### Updated Notes"""
 # flake8: noqa
@@ -1,18 +1,31 @@
 from workspace.src.utils import (
     generate_structured_response,
+    generate_structured_response_async,
 )
 from workspace.src.prompts import (
     search_proposition_system_prompt,
 )
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from workspace.src.pydantic_models import SearchPropositions
 from typing import Any
 
 
-def generate_search_propositions(client: OpenAI, prompt: str) -> dict[str, Any]:
+def generate_search_propositions(
+    client: OpenAI, prompt: str, use_cache: bool = True
+) -> dict[str, Any]:
     system_prompt = search_proposition_system_prompt
     response: dict[str, Any] = generate_structured_response(
-        client, system_prompt, prompt, SearchPropositions
+        client, system_prompt, prompt, SearchPropositions, use_cache=use_cache
+    )
+    return response
+
+
+async def generate_search_propositions_async(
+    client: AsyncOpenAI, prompt: str, use_cache: bool = True
+) -> dict[str, Any]:
+    system_prompt = search_proposition_system_prompt
+    response: dict[str, Any] = await generate_structured_response_async(
+        client, system_prompt, prompt, SearchPropositions, use_cache=use_cache
     )
     return response
 
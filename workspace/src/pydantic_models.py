@@ -1,4 +1,7 @@
-from pydantic import BaseModel
+import datetime
+from typing import Optional
+
+from pydantic import BaseModel, field_serializer
 
 
 class Patient(BaseModel):
@@ -17,6 +20,29 @@ class ConsultationReport(BaseModel):
     intelligent_summary: str
 
 
+class PatientRecord(Patient):
+    """A Patient document as stored and imported."""
+
+    social_security_number: str
+    full_name: str
+
+
+class ConsultationRecord(ConsultationReport):
+    """
+    A Consultation document as stored and imported; reportID is allocated if
+    missing. The date must be ISO (YYYY-MM-DD) and is stored as such, since
+    date-range filters compare it as a string.
+    """
+
+    social_security_number: str
+    date: datetime.date
+    reportID: Optional[int] = None
+
+    @field_serializer("date")
+    def _iso_date(self, value: datetime.date) -> str:
+        return value.isoformat()
+
+
 class SearchPropositions(BaseModel):
     search_propositions: list[str]
 
@@ -36,3 +62,9 @@ class PertinentMedicalPoints(BaseModel):
 
 class PrescriptionAnomalies(BaseModel):
     prescription_anomalies: list[str]
+
+
+class LiveInsights(BaseModel):
+    pertinent_medical_points: list[str]
+    follow_up_questions: list[str]
+    search_propositions: list[str]
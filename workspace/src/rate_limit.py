@@ -0,0 +1,191 @@
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+from requests import PreparedRequest, Response
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+load_dotenv()
+
+# "redis" shares each provider's allowance between every worker and container,
+# "memory" enforces it per process
+RATE_LIMIT_BACKEND: str = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_REDIS_URL: str = os.getenv("RATE_LIMIT_REDIS_URL", "redis://redis:6379/3")
+
+# Requests per second allowed by each provider; 0 disables the limit. NCBI allows
+# 3 requests per second without an API key and 10 with one.
+DEFAULT_RATES: Dict[str, float] = {
+    "llm": 0.0,
+    "pubmed": 10.0 if os.getenv("PUBMED_API_KEY") else 3.0,
+    "wikipedia": 0.0,
+}
+
+# Reserve a token and return how long the caller must wait for it. The bucket may
+# go negative, so concurrent callers queue up in order instead of retrying.
+_TOKEN_BUCKET = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + (now - ts) * rate) - 1
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil((burst - tokens) / rate) + 1)
+if tokens >= 0 then return '0' end
+return tostring(-tokens / rate)
+"""
+
+
+def _rate_from_env(provider: str) -> tuple[float, float]:
+    name = provider.upper()
+    rate = float(os.getenv(f"RATE_LIMIT_{name}", str(DEFAULT_RATES.get(provider, 0))))
+    burst = float(os.getenv(f"RATE_LIMIT_{name}_BURST", str(max(rate, 1.0))))
+    return rate, burst
+
+
+class RateLimiter:
+    """
+    Token bucket of `rate` requests per second with room for `burst`, kept in
+    process memory.
+    """
+
+    def __init__(self, provider: str, rate: float, burst: float) -> None:
+        self.provider = provider
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take one token; return the seconds to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= 1
+            return max(-self._tokens / self.rate, 0.0)
+
+    def acquire(self) -> None:
+        """Block until a request to the provider is allowed."""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self) -> None:
+        """Wait, without blocking the event loop, until a request is allowed."""
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class RedisRateLimiter(RateLimiter):
+    """Token bucket shared by every process through Redis."""
+
+    def __init__(
+        self,
+        provider: str,
+        rate: float,
+        burst: float,
+        url: str = RATE_LIMIT_REDIS_URL,
+    ) -> None:
+        super().__init__(provider, rate, burst)
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self._script = self._redis.register_script(_TOKEN_BUCKET)
+        self._errors = (redis.RedisError,)
+
+    def reserve(self) -> float:
+        # An unavailable Redis falls back to this process's own bucket
+        try:
+            wait = self._script(
+                keys=[f"rate-limit:{self.provider}"], args=[self.rate, self.burst]
+            )
+        except self._errors as e:
+            print(f"Rate limiter unavailable, limiting per process: {e}")
+            return super().reserve()
+        return float(wait)
+
+
+_limiters: Dict[str, Optional[RateLimiter]] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str) -> Optional[RateLimiter]:
+    """
+    Return the limiter for `provider` ("llm", "pubmed", "wikipedia", ...), or
+    None when it is unlimited. Rates come from `RATE_LIMIT_<PROVIDER>` and
+    `RATE_LIMIT_<PROVIDER>_BURST`.
+    """
+    if provider not in _limiters:
+        with _limiters_lock:
+            if provider not in _limiters:
+                rate, burst = _rate_from_env(provider)
+                limiter: Optional[RateLimiter] = None
+                if rate > 0 and RATE_LIMIT_BACKEND == "redis":
+                    limiter = RedisRateLimiter(provider, rate, burst)
+                elif rate > 0:
+                    limiter = RateLimiter(provider, rate, burst)
+                _limiters[provider] = limiter
+    return _limiters[provider]
+
+
+def set_rate_limiter(provider: str, limiter: Optional[RateLimiter]) -> None:
+    """Replace the limiter of `provider` (None removes the limit)."""
+    _limiters[provider] = limiter
+
+
+def acquire(provider: str) -> None:
+    """Block until a request to `provider` is allowed by its rate limit."""
+    limiter = get_rate_limiter(provider)
+    if limiter is not None:
+        limiter.acquire()
+
+
+async def acquire_async(provider: str) -> None:
+    """Async `acquire`."""
+    limiter = get_rate_limiter(provider)
+    if limiter is not None:
+        await limiter.acquire_async()
+
+
+class RateLimitedRetry(Retry):
+    """urllib3 `Retry` that waits for `provider`'s rate limit before each retry."""
+
+    provider: str = ""
+
+    def new(self, **kw: Any) -> "RateLimitedRetry":
+        retry = super().new(**kw)
+        retry.provider = self.provider
+        return retry
+
+    def sleep(self, response: Any = None) -> None:
+        super().sleep(response)
+        acquire(self.provider)
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """
+    requests transport adapter that waits for `provider`'s rate limit first.
+    Retries made by urllib3 inside the adapter wait for it too.
+    """
+
+    def __init__(self, provider: str, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.provider = provider
+        retries = RateLimitedRetry(**vars(self.max_retries))
+        retries.provider = provider
+        self.max_retries = retries
+
+    def send(self, request: PreparedRequest, *args: Any, **kwargs: Any) -> Response:
+        acquire(self.provider)
+        return super().send(request, *args, **kwargs)
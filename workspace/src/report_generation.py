@@ -2,24 +2,42 @@ from workspace.src.utils import (
     initialize_client,
     generate_prompt,
     generate_structured_response,
+    generate_structured_response_async,
+    generate_structured_response_stream,
 )
 from workspace.src.prompts import (
     report_generation_template,
     report_generation_system_prompt,
 )
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from workspace.src.pydantic_models import ConsultationReport
-from typing import Any
+from typing import Any, Callable, Optional
 
 
-def generate_report(client: OpenAI, prompt: str) -> dict[str, Any]:
+def generate_report(
+    client: OpenAI,
+    prompt: str,
+    on_delta: Optional[Callable[[str], None]] = None,
+) -> dict[str, Any]:
     system_prompt = report_generation_system_prompt
+    if on_delta is not None:
+        return generate_structured_response_stream(
+            client, system_prompt, prompt, ConsultationReport, on_delta
+        )
     response: dict[str, Any] = generate_structured_response(
         client, system_prompt, prompt, ConsultationReport
     )
     return response
 
 
+async def generate_report_async(client: AsyncOpenAI, prompt: str) -> dict[str, Any]:
+    system_prompt = report_generation_system_prompt
+    response: dict[str, Any] = await generate_structured_response_async(
+        client, system_prompt, prompt, ConsultationReport
+    )
+    return response
+
+
 # =======================================================
 if __name__ == "__main__":
     # Example usage: ========================================
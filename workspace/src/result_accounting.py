@@ -0,0 +1,102 @@
+"""
+Report the memory used by the Redis result backend, by task name.
+
+Results are attributed through the per-task index that `result_store` keeps.
+
+Usage:
+    python -m workspace.src.result_accounting [--json]
+"""
+
+import argparse
+import json
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from workspace.src.result_store import INDEX_PREFIX
+
+UNKNOWN_TASK = "<unknown>"
+GROUP_RESULTS = "<group results>"
+
+
+def _scan(client: Any, pattern: str) -> Iterator[bytes]:
+    key: bytes
+    for key in client.scan_iter(match=pattern, count=1000):
+        yield key
+
+
+def _memory_usage(client: Any, keys: List[bytes]) -> List[Optional[int]]:
+    pipe = client.pipeline(transaction=False)
+    for key in keys:
+        pipe.memory_usage(key)
+    sizes: List[Optional[int]] = pipe.execute()
+    return sizes
+
+
+def result_memory_by_task(backend: Any, batch_size: int = 500) -> Dict[str, Any]:
+    """
+    Bytes and number of stored results per task name, as reported by Redis
+    `MEMORY USAGE`. Results stored without an index entry (before it existed,
+    or by clients that do not record it) are counted under "<unknown>", group
+    results under "<group results>".
+    """
+    client = backend.client
+    owner: Dict[bytes, str] = {}
+    now = time.time()
+    for index in _scan(client, f"{INDEX_PREFIX}*"):
+        name = index.decode("utf-8")[len(INDEX_PREFIX) :]
+        for task_id in client.zrangebyscore(index, now, "+inf"):
+            owner[backend.get_key_for_task(task_id.decode("utf-8"))] = name
+
+    report: Dict[str, Dict[str, int]] = {}
+
+    def account(keys: List[bytes], default: str) -> None:
+        for key, size in zip(keys, _memory_usage(client, keys)):
+            if size is None:  # expired since the scan
+                continue
+            entry = report.setdefault(
+                owner.get(key, default), {"results": 0, "bytes": 0}
+            )
+            entry["results"] += 1
+            entry["bytes"] += size
+
+    for prefix, default in (
+        (backend.task_keyprefix, UNKNOWN_TASK),
+        (backend.group_keyprefix, GROUP_RESULTS),
+    ):
+        keys: List[bytes] = []
+        for key in _scan(client, f"{prefix.decode('utf-8')}*"):
+            keys.append(key)
+            if len(keys) >= batch_size:
+                account(keys, default)
+                keys = []
+        account(keys, default)
+
+    return {
+        "total_bytes": sum(entry["bytes"] for entry in report.values()),
+        "tasks": dict(
+            sorted(report.items(), key=lambda item: item[1]["bytes"], reverse=True)
+        ),
+    }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    lines = [f"{'task':<60} {'results':>8} {'bytes':>12} {'avg':>9}"]
+    for name, entry in report["tasks"].items():
+        average = entry["bytes"] // max(entry["results"], 1)
+        lines.append(
+            f"{name:<60} {entry['results']:>8} {entry['bytes']:>12} {average:>9}"
+        )
+    lines.append(f"{'total':<60} {'':>8} {report['total_bytes']:>12}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    from workspace.src.celery_app import celery
+
+    parser = argparse.ArgumentParser(
+        description="Report result-backend memory by task name."
+    )
+    parser.add_argument("--json", action="store_true", help="Print JSON.")
+    args = parser.parse_args()
+    report = result_memory_by_task(celery.backend)
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
@@ -0,0 +1,71 @@
+import fnmatch
+import json
+import os
+import time
+from typing import Any, Dict
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Seconds a task result is kept, unless overridden for its task below
+RESULT_EXPIRES: int = int(os.getenv("CELERY_RESULT_EXPIRES", str(24 * 3600)))
+
+# Task name (or pattern, tried after exact names) -> seconds its result is kept
+DEFAULT_RESULT_EXPIRES_BY_TASK: Dict[str, int] = {
+    # Read back by the caller right away
+    "workspace.src.tasks.embed_texts_task": 600,
+    "workspace.src.tasks.embedding_stats_task": 600,
+    # Handle the client polls for a whole workflow
+    "workspace.src.workflow.collect_consultation_step": RESULT_EXPIRES,
+    # Intermediate steps are only read by the next step
+    "workspace.src.workflow.*": 3600,
+}
+# JSON object merged over the defaults, e.g. '{"workspace.src.tasks.*": 7200}'
+RESULT_EXPIRES_BY_TASK: Dict[str, int] = {
+    **DEFAULT_RESULT_EXPIRES_BY_TASK,
+    **json.loads(os.getenv("CELERY_RESULT_EXPIRES_BY_TASK", "{}")),
+}
+
+# Sorted set per task name of its stored result IDs, scored by expiry time
+INDEX_PREFIX = "result-index:"
+
+
+def result_expires_for(task_name: str) -> int:
+    """Seconds the result of `task_name` is kept in the backend."""
+    if task_name in RESULT_EXPIRES_BY_TASK:
+        return RESULT_EXPIRES_BY_TASK[task_name]
+    for pattern, expires in RESULT_EXPIRES_BY_TASK.items():
+        if fnmatch.fnmatchcase(task_name, pattern):
+            return expires
+    return RESULT_EXPIRES
+
+
+def record_result(backend: Any, task_id: str, task_name: str) -> None:
+    """
+    Apply the task's expiry to its stored result and index it under the task
+    name for `result_accounting`. Entries of expired results are pruned.
+    """
+    expires = result_expires_for(task_name)
+    now = time.time()
+    index = f"{INDEX_PREFIX}{task_name}"
+    pipe = backend.client.pipeline(transaction=False)
+    pipe.expire(backend.get_key_for_task(task_id), expires)
+    pipe.zadd(index, {task_id: now + expires})
+    pipe.zremrangebyscore(index, "-inf", now)
+    pipe.expire(index, expires)
+    pipe.execute()
+
+
+def connect_result_expiry() -> None:
+    """Call `record_result` once a task's final state has been stored."""
+    from celery import signals
+
+    @signals.task_postrun.connect(weak=False)
+    def expire_result(task_id: str, task: Any, **kwargs: Any) -> None:
+        if task.ignore_result:
+            return
+        try:
+            record_result(task.backend, task_id, task.name)
+        except Exception as e:
+            print(f"Could not set the expiry of task {task_id}: {e}")
@@ -1,65 +1,94 @@
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
-import numpy as np
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from workspace.src.db_utils import get_database, get_table
+from workspace.src.embedding_service import generate_embedding
+from workspace.src.vector_index import get_vector_index, to_object_ids
 
-# Initialize Sentence Transformer model
-model = SentenceTransformer("all-MiniLM-L6-v2")
 
-
-def generate_embedding(text: str) -> List[float]:
-    """Generate embedding for a given text using Sentence Transformers."""
-    return model.encode(text).tolist()
+def metadata_filter(
+    ssn: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    keywords: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Mongo query restricting consultations to one patient, an inclusive date
+    range ("YYYY-MM-DD", as stored) and/or any of `keywords`.
+    """
+    query: Dict[str, Any] = {}
+    if ssn is not None:
+        query["social_security_number"] = ssn
+    if date_from is not None or date_to is not None:
+        query["date"] = {}
+        if date_from is not None:
+            query["date"]["$gte"] = date_from
+        if date_to is not None:
+            query["date"]["$lte"] = date_to
+    if keywords:
+        query["keywords"] = {"$in": keywords}
+    return query
 
 
 def similarity_search(
-    query: str, table_name: str = "Consultation", top_k: int = 3
+    query: str,
+    table_name: str = "Consultation",
+    top_k: int = 3,
+    ssn: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    keywords: Optional[List[str]] = None,
 ) -> List[Dict[str, Any]]:
     """
     Perform similarity search using stored embeddings.
     Returns top_k most similar documents with scores.
+
+    Embeddings are ranked against the process-resident vector index, so only the
+    top_k matching documents are read back from the collection. With metadata
+    filters (see `metadata_filter`), the matching `_id`s are first read from the
+    collection's indexes and only their vectors are scored.
     """
     # Get database connection
     db = get_database()
     table = get_table(db, table_name)
 
-    # Generate query embedding and ensure proper shape
-    query_embedding = np.array(generate_embedding(query)).reshape(1, -1)
-
-    # Retrieve documents with embeddings
-    documents_with_embeddings = list(
-        table.find(
-            {"embedding": {"$exists": True}},
-            {"embedding": 1, "intelligent_summary": 1, "reportID": 1, "_id": 0},
-        )
-    )
+    # Bring the index up to date with embeddings written by other processes
+    index = get_vector_index(table_name)
+    index.sync(table)
 
     # Handle empty collection case
-    if not documents_with_embeddings:
+    if len(index) == 0:
         print("No documents with embeddings found in the collection.")
         return []
 
-    # Prepare embeddings matrix
-    stored_embeddings = np.array(
-        [doc["embedding"] for doc in documents_with_embeddings]
-    )
-
-    # Calculate cosine similarities
-    similarity_scores = cosine_similarity(query_embedding, stored_embeddings)[0]
-
-    # Get top_k indices
-    top_indices = np.argsort(similarity_scores)[-top_k:][::-1]
+    candidates: Optional[List[str]] = None
+    filters = metadata_filter(ssn, date_from, date_to, keywords)
+    if filters:
+        candidates = [str(doc["_id"]) for doc in table.find(filters, {"_id": 1})]
+        if not candidates:
+            return []
+
+    # Rank stored embeddings against the query embedding
+    hits = index.search(generate_embedding(query), top_k, keys=candidates)
+
+    # Fetch only the matching documents
+    documents = {
+        str(doc["_id"]): doc
+        for doc in table.find(
+            {"_id": {"$in": to_object_ids([key for key, _ in hits])}},
+            {"intelligent_summary": 1, "reportID": 1},
+        )
+    }
 
     # Prepare results
     results = []
-    for idx in top_indices:
-        doc = documents_with_embeddings[idx]
+    for key, score in hits:
+        doc = documents.get(key)
+        if doc is None:
+            continue
         results.append(
             {
                 "reportID": doc["reportID"],
                 "intelligent_summary": doc["intelligent_summary"],
-                "similarity_score": float(similarity_scores[idx]),
+                "similarity_score": score,
             }
         )
 
@@ -2,6 +2,8 @@
 from typing import Any, Dict, List
 import requests
 
+from workspace.src.metrics import track_external_call
+
 
 def search_clinical_conditions(
     query: str, count: int = 5, offset: int = 0
@@ -40,8 +42,9 @@ def search_clinical_conditions(
     }
 
     try:
-        response = requests.get(base_url, params=params)
-        response.raise_for_status()
+        with track_external_call("clinical_tables"):
+            response = requests.get(base_url, params=params)
+            response.raise_for_status()
         data: List[Any] = response.json()
     except requests.RequestException as e:
         raise RuntimeError(
@@ -1,7 +1,63 @@
 #!/usr/bin/env python3
-from typing import Any, Dict, List
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
 import requests
 
+from workspace.src.metrics import instrument_session
+from workspace.src.rate_limit import RateLimitedAdapter
+
+BASE_URL: str = "https://en.wikipedia.org/w/api.php"
+WIKIPEDIA_TIMEOUT: float = float(os.getenv("WIKIPEDIA_TIMEOUT", "10"))
+# Number of full extracts kept in memory, keyed by (pageid, revision); 0 disables it
+WIKIPEDIA_CACHE_SIZE: int = int(os.getenv("WIKIPEDIA_CACHE_SIZE", "256"))
+
+_session: Optional[requests.Session] = None
+_extract_cache: "OrderedDict[Tuple[int, int], str]" = OrderedDict()
+# Worker threads of the `threads` pool share the cache
+_extract_cache_lock = threading.Lock()
+
+
+def get_wikipedia_session() -> requests.Session:
+    """Return the pooled HTTP session used for MediaWiki API calls."""
+    global _session
+    if _session is None:
+        session = requests.Session()
+        session.mount("https://", RateLimitedAdapter("wikipedia"))
+        _session = instrument_session(session, "wikipedia")
+    return _session
+
+
+def _cached_extract(pageid: int, revid: int) -> Optional[str]:
+    with _extract_cache_lock:
+        extract = _extract_cache.get((pageid, revid))
+        if extract is not None:
+            _extract_cache.move_to_end((pageid, revid))
+        return extract
+
+
+def _cache_extract(pageid: int, revid: int, extract: str) -> None:
+    if WIKIPEDIA_CACHE_SIZE <= 0 or revid <= 0:
+        return
+    with _extract_cache_lock:
+        _extract_cache[(pageid, revid)] = extract
+        _extract_cache.move_to_end((pageid, revid))
+        while len(_extract_cache) > WIKIPEDIA_CACHE_SIZE:
+            _extract_cache.popitem(last=False)
+
+
+def _query(params: Dict[str, Any], error_message: str) -> Dict[str, Any]:
+    try:
+        response = get_wikipedia_session().get(
+            BASE_URL, params=params, timeout=WIKIPEDIA_TIMEOUT
+        )
+        response.raise_for_status()
+        data: Dict[str, Any] = response.json()
+    except requests.RequestException as e:
+        raise RuntimeError(f"{error_message}: {e}") from e
+    return data
+
 
 def fetch_wikipedia_extract(pageid: int) -> str:
     """
@@ -16,73 +72,80 @@ def fetch_wikipedia_extract(pageid: int) -> str:
     Raises:
         RuntimeError: If the API request fails.
     """
-    base_url: str = "https://en.wikipedia.org/w/api.php"
     params: Dict[str, Any] = {
         "action": "query",
-        "prop": "extracts",
+        "prop": "extracts|info",
         "pageids": str(pageid),
         "explaintext": 1,
         "format": "json",
     }
-    try:
-        response = requests.get(base_url, params=params)
-        response.raise_for_status()
-        data: Dict[str, Any] = response.json()
-    except requests.RequestException as e:
-        raise RuntimeError(f"Error fetching Wikipedia extract: {e}") from e
+    data = _query(params, "Error fetching Wikipedia extract")
 
     pages: Dict[str, Any] = data.get("query", {}).get("pages", {})
     page: Dict[str, Any] = pages.get(str(pageid), {})
     extract: str = page.get("extract", "Not Provided")
+    _cache_extract(pageid, page.get("lastrevid", 0), extract)
     return extract
 
 
-def search_wikipedia(query: str, limit: int = 5) -> List[Dict[str, Any]]:
+def search_wikipedia(
+    query: str, limit: int = 5, full_extracts: bool = False
+) -> List[Dict[str, Any]]:
     """
     Search Wikipedia for articles related to the research query and retrieve detailed text.
 
-    This function performs two steps:
-      1. Uses the MediaWiki API to search for articles matching the query.
-      2. For each result, fetches the full extract text using the page ID.
+    A single MediaWiki request combines `list=search` (ranking and snippets) with
+    `generator=search` + `prop=extracts|info` (extract text and current revision
+    of the same pages), so a search costs one round trip.
+
+    The extracts API only returns the whole article for one page per request, so
+    the batched request carries the lead section of each article. With
+    `full_extracts`, full texts are then fetched per page, except for pages whose
+    current revision is already in the local extract cache.
 
     Args:
         query: The research query string (e.g., "Chest pain without shortness of breath or dizziness").
         limit: Maximum number of search results to retrieve (default is 5).
+        full_extracts: Return whole-article extracts instead of the lead section.
 
     Returns:
         A list of dictionaries, each containing:
           - pageid: The Wikipedia page ID.
           - title: The title of the article.
           - snippet: A short snippet from the search result.
-          - extract: The full extract text of the article.
+          - extract: The extract text of the article.
 
     Raises:
         RuntimeError: If an API request fails.
     """
-    base_url: str = "https://en.wikipedia.org/w/api.php"
     params: Dict[str, Any] = {
         "action": "query",
         "list": "search",
         "srsearch": query,
         "srlimit": limit,
+        "generator": "search",
+        "gsrsearch": query,
+        "gsrlimit": limit,
+        "prop": "extracts|info",
+        "exintro": 1,
+        "explaintext": 1,
+        "exlimit": "max",
         "format": "json",
     }
-    try:
-        response = requests.get(base_url, params=params)
-        response.raise_for_status()
-        data: Dict[str, Any] = response.json()
-    except requests.RequestException as e:
-        raise RuntimeError(f"Error searching Wikipedia: {e}") from e
+    data = _query(params, "Error searching Wikipedia")
 
     search_results: List[Dict[str, Any]] = data.get("query", {}).get("search", [])
+    pages: Dict[str, Any] = data.get("query", {}).get("pages", {})
     results: List[Dict[str, Any]] = []
     for item in search_results:
         pageid: int = item.get("pageid", -1)
         title: str = item.get("title", "Not Provided")
         snippet: str = item.get("snippet", "Not Provided")
-        extract: str = (
-            fetch_wikipedia_extract(pageid) if pageid != -1 else "Not Provided"
-        )
+        page: Dict[str, Any] = pages.get(str(pageid), {})
+        revid: int = page.get("lastrevid", 0)
+        extract: str = page.get("extract") or "Not Provided"
+        if full_extracts and pageid != -1:
+            extract = _cached_extract(pageid, revid) or fetch_wikipedia_extract(pageid)
         results.append(
             {
                 "pageid": pageid,
@@ -97,7 +160,7 @@ def search_wikipedia(query: str, limit: int = 5) -> List[Dict[str, Any]]:
 def main() -> None:
     query: str = "Chest pain without shortness of breath or dizziness"
     print("Wikipedia Research Query:", query)
-    results: List[Dict[str, Any]] = search_wikipedia(query, limit=3)
+    results: List[Dict[str, Any]] = search_wikipedia(query, limit=3, full_extracts=True)
     for i, res in enumerate(results, start=1):
         print(f"Result {i}:")
         print(f"  Page ID: {res['pageid']}")
@@ -0,0 +1,96 @@
+import datetime
+import decimal
+import json
+import os
+import threading
+import uuid
+from typing import Any, Tuple
+
+from dotenv import load_dotenv
+from kombu.serialization import register
+
+load_dotenv()
+
+MSGPACK_ZSTD = "msgpack-zstd"
+MSGPACK_ZSTD_CONTENT_TYPE = "application/x-msgpack-zstd"
+
+# Serializer of task messages and results: "json" (default) or "msgpack-zstd",
+# which needs the `compact` extra (msgpack and zstandard)
+CELERY_SERIALIZER: str = os.getenv("CELERY_SERIALIZER", "json")
+# msgpack payloads of at least this many bytes are zstd-compressed
+SERIALIZER_COMPRESS_MIN_BYTES: int = int(
+    os.getenv("SERIALIZER_COMPRESS_MIN_BYTES", "1024")
+)
+SERIALIZER_ZSTD_LEVEL: int = int(os.getenv("SERIALIZER_ZSTD_LEVEL", "3"))
+
+# First byte of every payload, so small ones skip decompression
+_PLAIN = b"\x00"
+_ZSTD = b"\x01"
+
+# zstandard compressor and decompressor objects must not be shared by threads
+_local = threading.local()
+
+
+def _codecs() -> Tuple[Any, Any]:
+    import msgpack
+    import zstandard
+
+    if not hasattr(_local, "compressor"):
+        _local.compressor = zstandard.ZstdCompressor(level=SERIALIZER_ZSTD_LEVEL)
+        _local.decompressor = zstandard.ZstdDecompressor()
+    return msgpack, zstandard
+
+
+def _default(value: Any) -> Any:
+    # The same extra types kombu's JSON serializer accepts
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (uuid.UUID, decimal.Decimal)):
+        return str(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def dumps(value: Any) -> bytes:
+    """msgpack `value`, zstd-compressed if it is at least the size threshold."""
+    msgpack, _ = _codecs()
+    packed: bytes = msgpack.packb(value, use_bin_type=True, default=_default)
+    if len(packed) < SERIALIZER_COMPRESS_MIN_BYTES:
+        return _PLAIN + packed
+    compressed: bytes = _local.compressor.compress(packed)
+    return _ZSTD + compressed
+
+
+def loads(data: bytes | str) -> Any:
+    """
+    Inverse of `dumps`. JSON payloads are read too, so results stored before
+    switching to msgpack-zstd remain readable (the JSON serializer cannot read
+    msgpack back).
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    marker, body = data[:1], data[1:]
+    if marker not in (_PLAIN, _ZSTD):
+        return json.loads(data)
+    msgpack, _ = _codecs()
+    if marker == _ZSTD:
+        body = _local.decompressor.decompress(body)
+    return msgpack.unpackb(body, raw=False)
+
+
+def register_msgpack_zstd() -> None:
+    """
+    Register the `msgpack-zstd` serializer with kombu. The codecs are imported on
+    first use, so the name can be accepted without the extra installed; opting
+    in with `CELERY_SERIALIZER` checks they are available.
+    """
+    register(
+        MSGPACK_ZSTD,
+        dumps,
+        loads,
+        content_type=MSGPACK_ZSTD_CONTENT_TYPE,
+        content_encoding="binary",
+    )
+    if CELERY_SERIALIZER == MSGPACK_ZSTD:
+        _codecs()
@@ -1,47 +1,132 @@
-from typing import List, Generator, Dict, Any
-import time
+from typing import Any, AsyncIterator, Dict, List, Literal, Union
+import asyncio
+import codecs
 import json
+import re
+
+
+SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+# A word with the whitespace around it, so the units add up to the text
+WORD = re.compile(r"\s*\S+\s*")
+
+ChunkMode = Literal["bytes", "word", "sentence"]
+
+
+def _sentences(text: str) -> List[str]:
+    ends = [match.end() for match in SENTENCE_END.finditer(text)]
+    bounds = [0, *ends, len(text)]
+    return [text[a:b] for a, b in zip(bounds, bounds[1:]) if a < b]
+
+
+def _pack(units: List[str], buffer_size: int) -> List[str]:
+    """Group whole units into chunks of at most `buffer_size` bytes each."""
+    chunks: List[str] = []
+    current: List[str] = []
+    current_size = 0
+    for unit in units:
+        size = len(unit.encode("utf-8"))
+        if current and current_size + size > buffer_size:
+            chunks.append("".join(current))
+            current, current_size = [], 0
+        current_size += size
+        current.append(unit)
+    if current:
+        chunks.append("".join(current))
+    return chunks
+
+
+def chunk_speech(
+    text: str, buffer_size: int = 512, mode: ChunkMode = "bytes"
+) -> List[str]:
+    """
+    Split a speech into chunks of about `buffer_size` UTF-8 bytes. In every
+    mode the chunks concatenate back to `text`, whitespace included.
+
+    In "bytes" mode the text is cut at fixed byte offsets and decoded
+    incrementally, so a multi-byte character split across a boundary is carried
+    over to the next chunk instead of being dropped. "word" and "sentence" modes
+    only cut after the whitespace that follows a word or sentence; a single
+    unit longer than `buffer_size` becomes its own chunk.
+    """
+    if mode == "word":
+        return _pack(WORD.findall(text), buffer_size)
+    if mode == "sentence":
+        return _pack(_sentences(text), buffer_size)
+
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    data = text.encode("utf-8")
+    chunks: List[str] = []
+    for i in range(0, len(data), buffer_size):
+        final = i + buffer_size >= len(data)
+        chunk = decoder.decode(data[i : i + buffer_size], final=final)
+        if chunk:
+            chunks.append(chunk)
+    return chunks
+
+
+async def _produce(
+    speeches: List[Dict[str, Any]],
+    buffer_size: int,
+    delay: float,
+    mode: ChunkMode,
+    queue: "asyncio.Queue[Union[Dict[str, Any], Exception, None]]",
+) -> None:
+    try:
+        for speech_idx, speech in enumerate(speeches, 1):
+            speech_text = speech.get("text", "")
+            if not speech_text:
+                print(f"Warning: Speech {speech_idx} has no content.")
+                continue
+
+            chunks = chunk_speech(speech_text, buffer_size, mode)
+            for chunk_idx, chunk_text in enumerate(chunks, 1):
+                await asyncio.sleep(delay)
+                # Blocks while the consumer is `max_pending` chunks behind
+                await queue.put(
+                    {
+                        "speech_number": speech_idx,
+                        "chunk_number": chunk_idx,
+                        "total_chunks": len(chunks),
+                        "chunk_size": len(chunk_text.encode("utf-8")),
+                        "content": chunk_text,
+                    }
+                )
+        await queue.put(None)
+    except Exception as e:
+        await queue.put(e)
+
+
+async def stream_speech_buffer(
+    speeches: List[Dict[str, Any]],
+    buffer_size: int = 512,
+    delay: float = 0.1,
+    mode: ChunkMode = "bytes",
+    max_pending: int = 8,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streams speeches in chunks, one every `delay` seconds, without blocking the
+    event loop.
+
+    Chunks are produced by a background task into a queue bounded by
+    `max_pending`, so a slow consumer pauses the producer instead of letting
+    chunks pile up. Many consultations can be streamed concurrently from one
+    loop.
+    """
+    queue: asyncio.Queue[Union[Dict[str, Any], Exception, None]] = asyncio.Queue(
+        maxsize=max_pending
+    )
+    producer = asyncio.create_task(_produce(speeches, buffer_size, delay, mode, queue))
+    try:
+        while (item := await queue.get()) is not None:
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        producer.cancel()
 
 
-def stream_speech_buffer(
-    speeches: List[Dict[str, Any]], buffer_size: int = 512, delay: float = 0.1
-) -> Generator[Dict[str, Any], None, None]:
-    """Streams speeches in chunks with a buffer."""
-    for speech_idx, speech in enumerate(speeches, 1):
-        speech_text = speech.get("text", "")  # Change "content" to "text"
-
-        # Debug: Print the speech content to check if it's empty or malformed
-        print(f"Speech {speech_idx} content: {repr(speech_text)}")
-
-        if not speech_text:  # If content is empty or None
-            print(f"Warning: Speech {speech_idx} has no content.")
-            continue  # Skip this speech and move to the next
-
-        speech_bytes = speech_text.encode("utf-8")
-        num_chunks = (len(speech_bytes) + buffer_size - 1) // buffer_size
-
-        print(f"\nProcessing Speech {speech_idx}/{len(speeches)}")
-        print(f"Total bytes: {len(speech_bytes)}")
-        print(f"Number of chunks: {num_chunks}")
-
-        for i in range(0, len(speech_bytes), buffer_size):
-            chunk = speech_bytes[i : i + buffer_size]
-            chunk_text = chunk.decode("utf-8", errors="ignore")
-            time.sleep(delay)
-
-            yield {
-                "speech_number": speech_idx,
-                "chunk_number": (i // buffer_size) + 1,
-                "total_chunks": num_chunks,
-                "chunk_size": len(chunk),
-                "content": chunk_text,
-            }
-
-
-def test_speech_streaming() -> None:
-    """..."""
-    speeches = read_speeches_from_json("doctor-patient-dialogues.json")
-    for chunk_data in stream_speech_buffer(speeches):
+async def _print_speech_stream(speeches: List[Dict[str, Any]]) -> None:
+    async for chunk_data in stream_speech_buffer(speeches):
         print("\nChunk Information:")
         print(f"Speech: {chunk_data['speech_number']}/{len(speeches)}")
         print(f"Chunk: {chunk_data['chunk_number']}/{chunk_data['total_chunks']}")
@@ -49,6 +134,12 @@ def test_speech_streaming() -> None:
         print(f"Content: {chunk_data['content']}")
 
 
+def test_speech_streaming() -> None:
+    """..."""
+    speeches = read_speeches_from_json("doctor-patient-dialogues.json")
+    asyncio.run(_print_speech_stream(speeches))
+
+
 def read_speeches_from_json(file_path: str) -> List[Dict[str, Any]]:
     """Reads speeches from a JSON file."""
     try:
@@ -0,0 +1,74 @@
+import json
+import time
+from typing import Any, Dict, Iterator
+
+from celery import states
+
+from workspace.src.celery_app import celery
+
+# Upper bound for a single long-poll or SSE connection, in seconds
+MAX_WAIT_SECONDS: float = 60.0
+
+
+def task_status(task_id: str, meta: Dict[str, Any]) -> Dict[str, Any]:
+    """Format a task state the way `GET /task/<task_id>` reports it."""
+    state = meta.get("status", states.PENDING)
+    if state == states.SUCCESS:
+        return {"status": "completed", "state": state, "result": meta.get("result")}
+    if state in states.PROPAGATE_STATES:
+        return {"status": "failed", "state": state, "error": str(meta.get("result"))}
+    return {"status": "processing", "state": state, "task_id": task_id}
+
+
+def _current_meta(task_id: str) -> Dict[str, Any]:
+    task = celery.AsyncResult(task_id)
+    return {"status": task.state, "result": task.result}
+
+
+def task_events(
+    task_id: str, timeout: float = MAX_WAIT_SECONDS
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the task's state now and then every transition Celery records, until a
+    final state is reached or `timeout` seconds have passed.
+
+    The Redis result backend PUBLISHes every stored state on the task's result
+    key, so this subscribes to that channel instead of polling. The subscription
+    is opened before reading the current state so no transition is missed.
+    """
+    backend: Any = celery.backend
+    channel = backend.get_key_for_task(task_id)
+    pubsub = backend.client.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(channel)
+    try:
+        meta = _current_meta(task_id)
+        yield meta
+        if meta["status"] in states.READY_STATES:
+            return
+
+        deadline = time.monotonic() + min(timeout, MAX_WAIT_SECONDS)
+        while (remaining := deadline - time.monotonic()) > 0:
+            message = pubsub.get_message(timeout=remaining)
+            if message is None:
+                continue
+            meta = backend.decode_result(message["data"])
+            yield meta
+            if meta["status"] in states.READY_STATES:
+                return
+    finally:
+        pubsub.close()
+
+
+def wait_for_task(task_id: str, timeout: float) -> Dict[str, Any]:
+    """Block until the task finishes or `timeout` expires; return its last state."""
+    meta: Dict[str, Any] = {"status": states.PENDING}
+    for meta in task_events(task_id, timeout):
+        pass
+    return meta
+
+
+def sse_task_events(task_id: str, timeout: float = MAX_WAIT_SECONDS) -> Iterator[str]:
+    """Render `task_events` as a Server-Sent Events stream."""
+    for meta in task_events(task_id, timeout):
+        status = task_status(task_id, meta)
+        yield f"event: {status['state']}\ndata: {json.dumps(status, default=str)}\n\n"
@@ -1,7 +1,12 @@
+import asyncio
 from typing import Any, Dict, List, Optional
 
 from workspace.src.celery_app import celery
-from workspace.src.detect_prescription_anomalies import detect_prescription_anomalies
+from workspace.src.embedding_service import get_embedding_service
+from workspace.src.detect_prescription_anomalies import (
+    detect_prescription_anomalies,
+    detect_prescription_anomalies_async,
+)
 from workspace.src.extract_ordonnance_data import (
     extract_ordonnance_data,
     summarize_ordonnances,
@@ -10,14 +15,35 @@ from workspace.src.gather_medical_knowledge_tool import (
     search_medical_articles,
     generate_search_summary,
 )
-from workspace.src.report_generation import generate_report
-from workspace.src.utils import initialize_client, generate_prompt
+from workspace.src.db_utils import get_database
+from workspace.src.generate_data import rebuild_medical_history
+from workspace.src.generate_follow_up_questions import (
+    generate_follow_up_questions,
+    generate_follow_up_questions_async,
+)
+from workspace.src.propose_medical_queries import (
+    generate_search_propositions,
+    generate_search_propositions_async,
+)
+from workspace.src.report_generation import generate_report, generate_report_async
+from workspace.src.token_stream import token_publisher
+from workspace.src.utils import (
+    initialize_async_client,
+    initialize_client,
+    generate_prompt,
+)
+from workspace.src.prompt_builder import (
+    REPORT_PROMPT_BUDGET,
+    SEARCH_SUMMARY_PROMPT_BUDGET,
+)
 from workspace.src.prompts import (
     detect_medical_prescription_anomaly_prompt_template,
     extract_ordonnance_data_prompt_template,
     summarize_ordonnances_prompt_template,
     report_generation_template,
     summarize_search_prompt_template,
+    follow_up_questions_prompt_template,
+    search_proposition_prompt_template,
 )
 
 client = initialize_client()
@@ -60,22 +86,30 @@ def summarize_ordonnances_task(
 
 @celery.task(bind=True, name="workspace.src.tasks.search_articles_task")
 def search_articles_task(
-    self: Any, query: str, retmax: Optional[int] = 5
+    self: Any, query: str, retmax: Optional[int] = 5, with_abstracts: bool = False
 ) -> Dict[str, Any]:
     """Celery task for searching medical articles."""
-    return {"results": search_medical_articles(query, retmax or 5)}
+    return {"results": search_medical_articles(query, retmax or 5, with_abstracts)}
 
 
 @celery.task(bind=True, name="workspace.src.tasks.generate_search_summary_task")
 def generate_search_summary_task(
-    self: Any, patient_condition: str, medical_articles: List[Dict[str, Any]]
+    self: Any,
+    patient_condition: str,
+    medical_articles: List[Dict[str, Any]],
+    stream: bool = False,
 ) -> Dict[str, Any]:
     """Celery task for generating search summaries."""
     prompt = generate_prompt(
         summarize_search_prompt_template,
+        budget=SEARCH_SUMMARY_PROMPT_BUDGET,
+        truncate=["medical_articles"],
         patient_condition=patient_condition,
         medical_articles=medical_articles,
     )
+    if stream:
+        with token_publisher(self.request.id) as on_delta:
+            return generate_search_summary(client, prompt, on_delta)
     return generate_search_summary(client, prompt)
 
 
@@ -86,13 +120,144 @@ def generate_report_task(
     patient_information: Dict[str, Any],
     medical_history: str,
     anomaly_detection: str,
+    stream: bool = False,
 ) -> Dict[str, Any]:
     """Celery task for generating medical reports."""
     prompt = generate_prompt(
         report_generation_template,
+        budget=REPORT_PROMPT_BUDGET,
+        truncate=["conversation", "medical_history"],
         conversation=conversation,
         patient_information=patient_information,
         medical_history=medical_history,
         anomaly_detection=anomaly_detection,
     )
+    if stream:
+        with token_publisher(self.request.id) as on_delta:
+            return generate_report(client, prompt, on_delta)
     return generate_report(client, prompt)
+
+
+@celery.task(bind=True, name="workspace.src.tasks.generate_follow_up_questions_task")
+def generate_follow_up_questions_task(self: Any, conversation: str) -> Dict[str, Any]:
+    """Celery task for proposing follow-up questions."""
+    prompt = generate_prompt(
+        follow_up_questions_prompt_template,
+        conversation=conversation,
+    )
+    return generate_follow_up_questions(client, prompt)
+
+
+@celery.task(bind=True, name="workspace.src.tasks.generate_search_propositions_task")
+def generate_search_propositions_task(
+    self: Any, conversation: str, search_history: str = ""
+) -> Dict[str, Any]:
+    """Celery task for proposing medical search queries."""
+    prompt = generate_prompt(
+        search_proposition_prompt_template,
+        conversation=conversation,
+        search_history=search_history,
+    )
+    return generate_search_propositions(client, prompt)
+
+
+async def _analyze_consultation(
+    conversation: str,
+    patient_information: Dict[str, Any],
+    medical_history: str,
+    doctor_prescription: str,
+    patient_medication_history: str,
+    search_history: str,
+) -> Dict[str, Any]:
+    # One client per event loop so all four calls share its connection pool
+    async_client = initialize_async_client()
+    try:
+        report, anomalies, questions, propositions = await asyncio.gather(
+            generate_report_async(
+                async_client,
+                generate_prompt(
+                    report_generation_template,
+                    budget=REPORT_PROMPT_BUDGET,
+                    truncate=["conversation", "medical_history"],
+                    conversation=conversation,
+                    patient_information=patient_information,
+                    medical_history=medical_history,
+                    anomaly_detection="",
+                ),
+            ),
+            detect_prescription_anomalies_async(
+                async_client,
+                generate_prompt(
+                    detect_medical_prescription_anomaly_prompt_template,
+                    doctor_prescription=doctor_prescription,
+                    patient_medication_history=patient_medication_history,
+                ),
+            ),
+            generate_follow_up_questions_async(
+                async_client,
+                generate_prompt(
+                    follow_up_questions_prompt_template, conversation=conversation
+                ),
+            ),
+            generate_search_propositions_async(
+                async_client,
+                generate_prompt(
+                    search_proposition_prompt_template,
+                    conversation=conversation,
+                    search_history=search_history,
+                ),
+            ),
+        )
+    finally:
+        await async_client.close()
+    return {
+        "report": report,
+        "anomalies": anomalies,
+        "follow_up_questions": questions,
+        "search_propositions": propositions,
+    }
+
+
+@celery.task(bind=True, name="workspace.src.tasks.analyze_consultation_task")
+def analyze_consultation_task(
+    self: Any,
+    conversation: str,
+    patient_information: Dict[str, Any],
+    medical_history: str,
+    doctor_prescription: str,
+    patient_medication_history: str,
+    search_history: str = "",
+) -> Dict[str, Any]:
+    """Celery task running all LLM analyses of a consultation concurrently."""
+    return asyncio.run(
+        _analyze_consultation(
+            conversation,
+            patient_information,
+            medical_history,
+            doctor_prescription,
+            patient_medication_history,
+            search_history,
+        )
+    )
+
+
+@celery.task(bind=True, name="workspace.src.tasks.rebuild_medical_history_task")
+def rebuild_medical_history_task(self: Any, ssn: str) -> bool:
+    """Celery task rebuilding a patient's stored medical history from scratch."""
+    return rebuild_medical_history(get_database(), ssn)
+
+
+@celery.task(bind=True, name="workspace.src.tasks.embed_texts_task")
+def embed_texts_task(self: Any, texts: List[str]) -> List[List[float]]:
+    """Celery task for embedding texts with the worker's shared model."""
+    service = get_embedding_service()
+    if len(texts) == 1:
+        # Single texts from concurrent tasks are micro-batched by the service
+        return [service.embed(texts[0])]
+    return service.embed_many(texts)
+
+
+@celery.task(bind=True, name="workspace.src.tasks.embedding_stats_task")
+def embedding_stats_task(self: Any) -> Dict[str, Any]:
+    """Celery task reporting the embedding worker's throughput and cache stats."""
+    return get_embedding_service().stats()
@@ -0,0 +1,115 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator
+
+from workspace.src.celery_app import celery
+
+# Streamed text stays replayable for late subscribers this long, in seconds
+TOKEN_STREAM_EXPIRES: int = int(os.getenv("TOKEN_STREAM_EXPIRES", "3600"))
+# Upper bound for a single token-stream SSE connection, in seconds
+TOKEN_STREAM_MAX_SECONDS: float = float(os.getenv("TOKEN_STREAM_MAX_SECONDS", "300"))
+
+
+def _channel(task_id: str) -> str:
+    return f"task-tokens:{task_id}"
+
+
+def _buffer_key(task_id: str) -> str:
+    return f"task-tokens-buffer:{task_id}"
+
+
+def _done_key(task_id: str) -> str:
+    return f"task-tokens-done:{task_id}"
+
+
+@contextmanager
+def token_publisher(task_id: str) -> Iterator[Callable[[str], None]]:
+    """
+    Yield an `on_delta` callback that publishes text deltas for `task_id`.
+
+    Every delta is appended to a buffer key (so a client that connects late can
+    catch up) and PUBLISHed with its character offset. The end of the stream is
+    always signalled, even if generation raises.
+    """
+    backend: Any = celery.backend
+    buffer_key = _buffer_key(task_id)
+    offset = 0
+
+    def on_delta(delta: str) -> None:
+        nonlocal offset
+        with backend.client.pipeline() as pipe:
+            pipe.append(buffer_key, delta.encode("utf-8"))
+            pipe.expire(buffer_key, TOKEN_STREAM_EXPIRES)
+            pipe.publish(
+                _channel(task_id), json.dumps({"offset": offset, "delta": delta})
+            )
+            pipe.execute()
+        offset += len(delta)
+
+    try:
+        yield on_delta
+    finally:
+        with backend.client.pipeline() as pipe:
+            pipe.set(_done_key(task_id), offset, ex=TOKEN_STREAM_EXPIRES)
+            pipe.publish(
+                _channel(task_id), json.dumps({"offset": offset, "done": True})
+            )
+            pipe.execute()
+
+
+def token_events(
+    task_id: str, timeout: float = TOKEN_STREAM_MAX_SECONDS
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield `{"offset", "delta"}` events for a task's streamed output, then a
+    final `{"done": True}`, or stop once `timeout` seconds have passed.
+
+    The channel is subscribed before the buffer is read; deltas already covered
+    by the buffer are dropped using their offsets, so nothing is lost or sent
+    twice.
+    """
+    backend: Any = celery.backend
+    pubsub = backend.client.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(_channel(task_id))
+    try:
+        with backend.client.pipeline() as pipe:
+            pipe.get(_buffer_key(task_id))
+            pipe.get(_done_key(task_id))
+            buffered, done = pipe.execute()
+        sent = 0
+        if buffered:
+            text = buffered.decode("utf-8")
+            yield {"offset": 0, "delta": text}
+            sent = len(text)
+        if done is not None:
+            yield {"offset": sent, "done": True}
+            return
+
+        deadline = time.monotonic() + min(timeout, TOKEN_STREAM_MAX_SECONDS)
+        while (remaining := deadline - time.monotonic()) > 0:
+            message = pubsub.get_message(timeout=remaining)
+            if message is None:
+                continue
+            event = json.loads(message["data"])
+            if event.get("done"):
+                yield event
+                return
+            end = event["offset"] + len(event["delta"])
+            if end <= sent:
+                continue
+            delta = event["delta"][max(sent - event["offset"], 0) :]
+            yield {"offset": sent, "delta": delta}
+            sent = end
+    finally:
+        pubsub.close()
+
+
+def sse_token_events(
+    task_id: str, timeout: float = TOKEN_STREAM_MAX_SECONDS
+) -> Iterator[str]:
+    """Render `token_events` as a Server-Sent Events stream."""
+    for event in token_events(task_id, timeout):
+        name = "done" if event.get("done") else "token"
+        yield f"event: {name}\ndata: {json.dumps(event)}\n\n"
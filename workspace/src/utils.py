@@ -1,39 +1,125 @@
 import os
 import json
-from openai import OpenAI, OpenAIError
+import asyncio
+import weakref
+import httpx
+from openai import AsyncOpenAI, OpenAI, OpenAIError
 from dotenv import load_dotenv
-from typing import Any, Type
+from typing import Any, Callable, Type
 from pydantic import BaseModel
+from workspace.src.llm_cache import LLMCache, cache_key, get_llm_cache
+from workspace.src.metrics import record_llm_usage, track_llm_call
+from workspace.src.prompt_builder import build_prompt
+from workspace.src.rate_limit import acquire, acquire_async
 
 ResponseType = Type[BaseModel]
+DeltaCallback = Callable[[str], None]
 
 load_dotenv()
 
 
 api_key = os.getenv("API_KEY")
 url = os.getenv("PROVIDER_URL")
+MODEL_NAME = os.getenv("MODEL_NAME", "ministral-3b-latest")
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "64"))
+# Seconds an LLM request may wait for the provider (per read when streaming).
+# The threads worker pool does not enforce Celery's time limits, so this is what
+# stops a hung call from holding a worker slot.
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+# OpenAI only reports the usage of a stream when asked with `stream_options`,
+# which providers that already report it (Mistral) may reject as unknown
+LLM_STREAM_USAGE = os.getenv("LLM_STREAM_USAGE", "false").lower() == "true"
+_STREAM_OPTIONS: dict[str, Any] = (
+    {"stream_options": {"include_usage": True}} if LLM_STREAM_USAGE else {}
+)
+
+# asyncio semaphores are bound to the event loop they are first used in
+_semaphores: weakref.WeakKeyDictionary[Any, asyncio.Semaphore] = (
+    weakref.WeakKeyDictionary()
+)
 
 
 def initialize_client(api_key: str = api_key or "", url: str = url or "") -> OpenAI:
-    client = OpenAI(api_key=api_key, base_url=url)
+    client = OpenAI(
+        api_key=api_key,
+        base_url=url,
+        timeout=httpx.Timeout(LLM_TIMEOUT, connect=5.0),
+        max_retries=LLM_MAX_RETRIES,
+    )
     return client
 
 
+def initialize_async_client(
+    api_key: str = api_key or "",
+    url: str = url or "",
+    max_connections: int = LLM_MAX_CONNECTIONS,
+) -> AsyncOpenAI:
+    """
+    Create an async client whose connection pool is shared by every request made
+    through it. Create it inside the event loop that will use it.
+    """
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+        ),
+        timeout=httpx.Timeout(LLM_TIMEOUT, connect=5.0),
+    )
+    return AsyncOpenAI(
+        api_key=api_key,
+        base_url=url,
+        http_client=http_client,
+        timeout=httpx.Timeout(LLM_TIMEOUT, connect=5.0),
+        max_retries=LLM_MAX_RETRIES,
+    )
+
+
+def llm_semaphore() -> asyncio.Semaphore:
+    """Return the semaphore bounding in-flight LLM calls in the running loop."""
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+        _semaphores[loop] = semaphore
+    return semaphore
+
+
 def generate_prompt(prompt_template: str, **kwargs: Any) -> str:
-    return prompt_template.format(**kwargs)
+    """
+    Fill a prompt template; structured values are serialized compactly. Pass
+    `budget` (tokens) and `truncate` (field names) to fit a token budget, see
+    `prompt_builder.build_prompt`.
+    """
+    return build_prompt(prompt_template, **kwargs)
 
 
-def generate_response(client: OpenAI, system_prompt: str, user_prompt: str) -> str:
+def generate_response(
+    client: OpenAI, system_prompt: str, user_prompt: str, use_cache: bool = True
+) -> str:
+    cache = get_llm_cache() if use_cache else None
+    key = cache_key(MODEL_NAME, system_prompt, user_prompt)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return str(cached)
     try:
-        response = client.chat.completions.create(
-            model="ministral-3b-latest",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-        )
+        acquire("llm")
+        with track_llm_call("chat", MODEL_NAME):
+            response = client.chat.completions.create(
+                model=MODEL_NAME,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt},
+                ],
+            )
+        record_llm_usage(MODEL_NAME, response)
         if response.choices[0].message.content is not None:
-            return response.choices[0].message.content
+            content = response.choices[0].message.content
+            if cache is not None:
+                cache.set(key, content)
+            return content
         else:
             return "No content in response."
     except OpenAIError as e:
@@ -42,32 +128,235 @@ def generate_response(client: OpenAI, system_prompt: str, user_prompt: str) -> s
 
 
 def generate_structured_response(
-    client: OpenAI, system_prompt: str, user_prompt: str, model: ResponseType
+    client: OpenAI,
+    system_prompt: str,
+    user_prompt: str,
+    model: ResponseType,
+    use_cache: bool = True,
+) -> dict[str, Any]:
+    cache = get_llm_cache() if use_cache else None
+    key = cache_key(MODEL_NAME, system_prompt, user_prompt, model)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return dict(cached)
+    try:
+        acquire("llm")
+        with track_llm_call("structured", MODEL_NAME):
+            response = client.beta.chat.completions.parse(
+                model=MODEL_NAME,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt},
+                ],
+                response_format=model,
+            )
+        record_llm_usage(MODEL_NAME, response)
+        return _parse_structured_content(
+            response.choices[0].message.content, model, cache, key
+        )
+    except OpenAIError as e:
+        print(f"An error occurred: {e}")
+    return {"error": "An error occurred while generating the response."}
+
+
+def _parse_structured_content(
+    response_content: str | None,
+    model: ResponseType,
+    cache: LLMCache | None,
+    key: str,
+) -> dict[str, Any]:
+    print(response_content)
+    # Attempt to parse the content as JSON
+    try:
+        if response_content is not None:
+            data = json.loads(response_content)
+        else:
+            print("Response content is None.")
+            return {"error": "Response content is None."}
+    except json.JSONDecodeError as json_err:
+        print(f"JSON parsing error: {json_err}")
+        return {"error": "Response is not valid JSON."}
+    # Validate using Pydantic
+    response_object = model.model_validate(data)
+    result = response_object.model_dump()
+    # Only validated answers are cached, never error payloads
+    if cache is not None:
+        cache.set(key, result)
+    return result
+
+
+async def generate_response_async(
+    client: AsyncOpenAI, system_prompt: str, user_prompt: str, use_cache: bool = True
+) -> str:
+    """
+    Async `generate_response`; concurrency is bounded by `llm_semaphore`. The
+    cache is read and written in a thread, since the Redis backend blocks.
+    """
+    cache = get_llm_cache() if use_cache else None
+    key = cache_key(MODEL_NAME, system_prompt, user_prompt)
+    if cache is not None:
+        cached = await asyncio.to_thread(cache.get, key)
+        if cached is not None:
+            return str(cached)
+    try:
+        async with llm_semaphore():
+            await acquire_async("llm")
+            with track_llm_call("chat_async", MODEL_NAME):
+                response = await client.chat.completions.create(
+                    model=MODEL_NAME,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_prompt},
+                    ],
+                )
+            record_llm_usage(MODEL_NAME, response)
+        if response.choices[0].message.content is not None:
+            content = response.choices[0].message.content
+            if cache is not None:
+                await asyncio.to_thread(cache.set, key, content)
+            return content
+        else:
+            return "No content in response."
+    except OpenAIError as e:
+        print(f"An error occured:{e}")
+    return "An error occurred while generating the response."
+
+
+async def generate_structured_response_async(
+    client: AsyncOpenAI,
+    system_prompt: str,
+    user_prompt: str,
+    model: ResponseType,
+    use_cache: bool = True,
+) -> dict[str, Any]:
+    """
+    Async `generate_structured_response`; bounded by `llm_semaphore`, with the
+    cache accessed in a thread as in `generate_response_async`.
+    """
+    cache = get_llm_cache() if use_cache else None
+    key = cache_key(MODEL_NAME, system_prompt, user_prompt, model)
+    if cache is not None:
+        cached = await asyncio.to_thread(cache.get, key)
+        if cached is not None:
+            return dict(cached)
+    try:
+        async with llm_semaphore():
+            await acquire_async("llm")
+            with track_llm_call("structured_async", MODEL_NAME):
+                response = await client.beta.chat.completions.parse(
+                    model=MODEL_NAME,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_prompt},
+                    ],
+                    response_format=model,
+                )
+            record_llm_usage(MODEL_NAME, response)
+        result = _parse_structured_content(
+            response.choices[0].message.content, model, None, key
+        )
+        # Only validated answers are cached, never error payloads
+        if cache is not None and "error" not in result:
+            await asyncio.to_thread(cache.set, key, result)
+        return result
+    except OpenAIError as e:
+        print(f"An error occurred: {e}")
+    return {"error": "An error occurred while generating the response."}
+
+
+def generate_response_stream(
+    client: OpenAI,
+    system_prompt: str,
+    user_prompt: str,
+    on_delta: DeltaCallback,
+    use_cache: bool = True,
+) -> str:
+    """
+    Streaming `generate_response`: `on_delta` receives each text delta as the
+    provider produces it, and the full text is returned at the end. A cached
+    answer is delivered as a single delta.
+    """
+    cache = get_llm_cache() if use_cache else None
+    key = cache_key(MODEL_NAME, system_prompt, user_prompt)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            on_delta(str(cached))
+            return str(cached)
+    try:
+        parts: list[str] = []
+        acquire("llm")
+        with track_llm_call("chat_stream", MODEL_NAME):
+            stream = client.chat.completions.create(
+                model=MODEL_NAME,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt},
+                ],
+                stream=True,
+                **_STREAM_OPTIONS,
+            )
+            for chunk in stream:
+                # Any chunk may carry the usage, usually the last one
+                record_llm_usage(MODEL_NAME, chunk)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    on_delta(chunk.choices[0].delta.content)
+        if not parts:
+            return "No content in response."
+        content = "".join(parts)
+        if cache is not None:
+            cache.set(key, content)
+        return content
+    except OpenAIError as e:
+        print(f"An error occured:{e}")
+    return "An error occurred while generating the response."
+
+
+def generate_structured_response_stream(
+    client: OpenAI,
+    system_prompt: str,
+    user_prompt: str,
+    model: ResponseType,
+    on_delta: DeltaCallback,
+    use_cache: bool = True,
 ) -> dict[str, Any]:
+    """
+    Streaming `generate_structured_response`: `on_delta` receives the raw JSON
+    text as it is generated; the validated object is returned at the end.
+    """
+    cache = get_llm_cache() if use_cache else None
+    key = cache_key(MODEL_NAME, system_prompt, user_prompt, model)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            on_delta(json.dumps(cached))
+            return dict(cached)
     try:
-        response = client.beta.chat.completions.parse(
-            model="ministral-3b-latest",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-            response_format=model,
+        parts: list[str] = []
+        acquire("llm")
+        with (
+            track_llm_call("structured_stream", MODEL_NAME),
+            client.beta.chat.completions.stream(
+                model=MODEL_NAME,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt},
+                ],
+                response_format=model,
+                **_STREAM_OPTIONS,
+            ) as stream,
+        ):
+            for event in stream:
+                if event.type == "content.delta":
+                    parts.append(event.delta)
+                    on_delta(event.delta)
+                elif event.type == "chunk":
+                    record_llm_usage(MODEL_NAME, event.chunk)
+        return _parse_structured_content(
+            "".join(parts) if parts else None, model, cache, key
         )
-        response_content = response.choices[0].message.content
-        print(response_content)
-        # Attempt to parse the content as JSON
-        try:
-            if response_content is not None:
-                data = json.loads(response_content)
-            else:
-                print("Response content is None.")
-                return {"error": "Response content is None."}
-        except json.JSONDecodeError as json_err:
-            print(f"JSON parsing error: {json_err}")
-            return {"error": "Response is not valid JSON."}
-        # Validate using Pydantic
-        response_object = model.model_validate(data)
-        return response_object.model_dump()
     except OpenAIError as e:
         print(f"An error occurred: {e}")
     return {"error": "An error occurred while generating the response."}
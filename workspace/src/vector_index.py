@@ -0,0 +1,325 @@
+import fcntl
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from bson import ObjectId
+from dotenv import load_dotenv
+from pymongo.collection import Collection
+
+load_dotenv()
+
+VECTOR_INDEX_DIR: str = os.getenv("VECTOR_INDEX_DIR", ".vector_index")
+VECTOR_INDEX_SYNC_INTERVAL: float = float(os.getenv("VECTOR_INDEX_SYNC_INTERVAL", "60"))
+
+_INITIAL_CAPACITY = 1024
+_SYNC_BATCH_SIZE = 1000
+
+
+class VectorIndex:
+    """
+    Process-resident cosine-similarity index over document embeddings.
+
+    Vectors are L2-normalized once on insertion and stored as a float32 matrix in
+    a memory-mapped file, so a query is a single matrix-vector product followed by
+    an `argpartition` top-k. Document keys (the string form of the Mongo `_id`)
+    are kept in an append-only file next to the matrix; the number of keys is the
+    number of valid rows, which keeps a half-written append invisible.
+
+    Writers set an `embedded_at` timestamp next to each `embedding`; the latest
+    one pulled by `sync` is kept in the metadata file as a high-water mark.
+    """
+
+    def __init__(self, name: str, directory: str = VECTOR_INDEX_DIR) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self.name = name
+        self.matrix_path = os.path.join(directory, f"{name}.f32")
+        self.keys_path = os.path.join(directory, f"{name}.keys")
+        self.meta_path = os.path.join(directory, f"{name}.meta.json")
+        self.lock_path = os.path.join(directory, f"{name}.lock")
+        self.dim: Optional[int] = None
+        self.keys: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._keys_size = 0
+        self._matrix: Optional[np.memmap[Any, np.dtype[np.float32]]] = None
+        self.synced_to: Optional[datetime] = None
+        self._last_sync: Optional[float] = None
+        self.reload()
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._rows
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _capacity(self) -> int:
+        if self.dim is None or not os.path.exists(self.matrix_path):
+            return 0
+        return os.path.getsize(self.matrix_path) // (self.dim * 4)
+
+    def _map(self) -> None:
+        capacity = self._capacity()
+        if self.dim is None or capacity == 0:
+            self._matrix = None
+            return
+        self._matrix = np.memmap(
+            self.matrix_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim)
+        )
+
+    def reload(self) -> None:
+        """Re-read keys and re-map the matrix if another process appended to them."""
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as file:
+                meta = json.load(file)
+            self.dim = int(meta["dim"])
+            if meta.get("synced_to"):
+                self.synced_to = datetime.fromisoformat(meta["synced_to"])
+        if not os.path.exists(self.keys_path):
+            return
+        size = os.path.getsize(self.keys_path)
+        if size == self._keys_size and self._matrix is not None:
+            return
+        with open(self.keys_path, "r", encoding="utf-8") as file:
+            file.seek(self._keys_size)
+            new_keys = file.read().splitlines()
+        self._append_keys(new_keys)
+        self._keys_size = size
+        self._map()
+
+    def _write_meta(self) -> None:
+        with open(self.meta_path, "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "dim": self.dim,
+                    "synced_to": self.synced_to.isoformat() if self.synced_to else None,
+                },
+                file,
+            )
+
+    def _append_keys(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            self._rows[key] = len(self.keys)
+            self.keys.append(key)
+
+    def _reserve(self, rows: int) -> None:
+        assert self.dim is not None
+        capacity = self._capacity()
+        if rows <= capacity:
+            if self._matrix is None or self._matrix.shape[0] != capacity:
+                self._map()
+            return
+        new_capacity = max(capacity, _INITIAL_CAPACITY)
+        while new_capacity < rows:
+            new_capacity *= 2
+        self._matrix = None
+        with open(self.matrix_path, "ab") as file:
+            file.truncate(new_capacity * self.dim * 4)
+        self._map()
+
+    def add(self, keys: Sequence[str], vectors: Any, replace: bool = False) -> int:
+        """
+        Normalize and append vectors to the index. Keys already present are
+        skipped, or have their row overwritten in place with `replace`.
+
+        Returns:
+            int: The number of vectors actually added or replaced.
+        """
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if matrix.ndim == 1:
+            matrix = matrix.reshape(1, -1)
+        if len(keys) != matrix.shape[0]:
+            raise ValueError("keys and vectors must have the same length")
+
+        with self._locked():
+            self.reload()
+            if self.dim is None:
+                self.dim = int(matrix.shape[1])
+                self._write_meta()
+            elif matrix.shape[1] != self.dim:
+                raise ValueError(
+                    f"Expected vectors of dimension {self.dim}, got {matrix.shape[1]}"
+                )
+
+            fresh: Dict[str, int] = {}
+            known: Dict[str, int] = {}
+            for row, key in enumerate(keys):
+                if key in self._rows:
+                    known[key] = row
+                elif key not in fresh:
+                    fresh[key] = row
+
+            if replace and known and self._matrix is not None:
+                self._matrix[[self._rows[key] for key in known]] = _normalize(
+                    matrix[list(known.values())]
+                )
+                self._matrix.flush()
+            replaced = len(known) if replace else 0
+            if not fresh:
+                return replaced
+
+            rows = _normalize(matrix[list(fresh.values())])
+            start = len(self.keys)
+            self._reserve(start + rows.shape[0])
+            assert self._matrix is not None
+            self._matrix[start : start + rows.shape[0]] = rows
+            self._matrix.flush()
+
+            with open(self.keys_path, "a", encoding="utf-8") as file:
+                file.write("".join(f"{key}\n" for key in fresh))
+            self._append_keys(fresh)
+            self._keys_size = os.path.getsize(self.keys_path)
+        return len(fresh) + replaced
+
+    def search(
+        self,
+        query_vector: Any,
+        top_k: int = 3,
+        keys: Optional[Iterable[str]] = None,
+    ) -> List[Tuple[str, float]]:
+        """
+        Return the `top_k` (key, cosine similarity) pairs, best first. With
+        `keys`, only those documents are scored (keys not in the index are
+        ignored).
+        """
+        count = len(self.keys)
+        if count == 0 or self._matrix is None or top_k <= 0:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+
+        if keys is None:
+            rows = np.arange(count)
+            scores = self._matrix[:count] @ query
+        else:
+            rows = np.fromiter(
+                (self._rows[key] for key in keys if key in self._rows), dtype=np.intp
+            )
+            if rows.size == 0:
+                return []
+            scores = self._matrix[rows] @ query
+        k = min(top_k, rows.size)
+        if k < rows.size:
+            candidates = np.argpartition(scores, -k)[-k:]
+        else:
+            candidates = np.arange(rows.size)
+        ordered = candidates[np.argsort(scores[candidates])[::-1]]
+        return [(self.keys[rows[idx]], float(scores[idx])) for idx in ordered]
+
+    def sync(self, table: Collection[Any], force: bool = False) -> int:
+        """
+        Pull embeddings written to `table` since the last sync, by any process.
+
+        Only documents whose `embedded_at` is past the high-water mark are read,
+        so a sync costs one indexed query when nothing changed; documents whose
+        embedding was recomputed have their row overwritten. Runs at most once
+        every `VECTOR_INDEX_SYNC_INTERVAL` seconds unless `force` is set, since
+        new embeddings are normally pushed through `add`.
+        """
+        now = time.monotonic()
+        if (
+            not force
+            and self._last_sync is not None
+            and now - self._last_sync < VECTOR_INDEX_SYNC_INTERVAL
+        ):
+            self.reload()
+            return 0
+        self._last_sync = now
+        self.reload()
+
+        if self.synced_to is None:
+            return self._initial_sync(table)
+
+        pulled = 0
+        docs = table.find(
+            {"embedded_at": {"$gt": self.synced_to}},
+            {"embedding": 1, "embedded_at": 1},
+            batch_size=_SYNC_BATCH_SIZE,
+        ).sort("embedded_at", 1)
+        batch: List[Dict[str, Any]] = []
+        for doc in docs:
+            batch.append(doc)
+            if len(batch) >= _SYNC_BATCH_SIZE:
+                pulled += self._pull(batch)
+                batch = []
+        if batch:
+            pulled += self._pull(batch)
+        return pulled
+
+    def _pull(self, docs: List[Dict[str, Any]]) -> int:
+        pulled = self.add(
+            [str(doc["_id"]) for doc in docs],
+            [doc["embedding"] for doc in docs],
+            replace=True,
+        )
+        self._advance(max(doc["embedded_at"] for doc in docs))
+        return pulled
+
+    def _advance(self, mark: datetime) -> None:
+        with self._locked():
+            self.reload()
+            if self.synced_to is not None and mark <= self.synced_to:
+                return
+            self.synced_to = mark
+            # Without a vector yet there is no metadata file to keep it in
+            if self.dim is not None:
+                self._write_meta()
+
+    def _initial_sync(self, table: Collection[Any]) -> int:
+        # Embeddings written before they were timestamped: one scan of `_id`s
+        # pulls those missing from the index, then the high-water mark takes over
+        latest = table.find_one(
+            {"embedded_at": {"$exists": True}},
+            {"embedded_at": 1},
+            sort=[("embedded_at", -1)],
+        )
+        missing = [
+            doc["_id"]
+            for doc in table.find({"embedding": {"$exists": True}}, {"_id": 1})
+            if str(doc["_id"]) not in self._rows
+        ]
+        added = 0
+        for start in range(0, len(missing), _SYNC_BATCH_SIZE):
+            batch = missing[start : start + _SYNC_BATCH_SIZE]
+            docs = list(table.find({"_id": {"$in": batch}}, {"embedding": 1}))
+            if docs:
+                added += self.add(
+                    [str(doc["_id"]) for doc in docs],
+                    [doc["embedding"] for doc in docs],
+                )
+        self._advance(latest["embedded_at"] if latest else datetime(1970, 1, 1))
+        return added
+
+
+def _normalize(matrix: Any) -> Any:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+_indexes: Dict[str, VectorIndex] = {}
+
+
+def get_vector_index(table_name: str = "Consultation") -> VectorIndex:
+    """Return the process-wide index for `table_name`, creating it on first use."""
+    if table_name not in _indexes:
+        _indexes[table_name] = VectorIndex(table_name)
+    return _indexes[table_name]
+
+
+def to_object_ids(keys: Sequence[str]) -> List[Any]:
+    """Map index keys back to Mongo `_id` values."""
+    return [ObjectId(key) if ObjectId.is_valid(key) else key for key in keys]
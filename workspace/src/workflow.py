@@ -0,0 +1,268 @@
+import json
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from celery import chain, chord, group
+from celery.result import AsyncResult
+
+from workspace.src.celery_app import celery
+from workspace.src.detect_prescription_anomalies import detect_prescription_anomalies
+from workspace.src.extract_ordonnance_data import (
+    extract_ordonnance_data,
+    summarize_ordonnances,
+)
+from workspace.src.gather_medical_knowledge_tool import (
+    generate_search_summary,
+    search_medical_articles,
+)
+from workspace.src.prompt_builder import (
+    REPORT_PROMPT_BUDGET,
+    SEARCH_SUMMARY_PROMPT_BUDGET,
+)
+from workspace.src.prompts import (
+    detect_medical_prescription_anomaly_prompt_template,
+    extract_ordonnance_data_prompt_template,
+    report_generation_template,
+    summarize_ordonnances_prompt_template,
+    summarize_search_prompt_template,
+)
+from workspace.src.report_generation import generate_report
+from workspace.src.utils import generate_prompt, initialize_client
+
+client = initialize_client()
+
+# Per-step timings of a consultation run are kept this long, in seconds
+WORKFLOW_TIMINGS_EXPIRES = 24 * 3600
+
+
+def _timings_key(workflow_id: str) -> str:
+    return f"workflow-timings-{workflow_id}"
+
+
+def _record(workflow_id: str, step: str, timing: Dict[str, Any]) -> None:
+    backend: Any = celery.backend
+    key = _timings_key(workflow_id)
+    with backend.client.pipeline() as pipe:
+        pipe.hset(key, step, json.dumps(timing))
+        pipe.expire(key, WORKFLOW_TIMINGS_EXPIRES)
+        pipe.execute()
+
+
+@contextmanager
+def _timed(workflow_id: str, step: str) -> Iterator[None]:
+    started = time.time()
+    try:
+        yield
+    finally:
+        finished = time.time()
+        _record(
+            workflow_id,
+            step,
+            {"started": started, "finished": finished, "duration": finished - started},
+        )
+
+
+def get_workflow_timings(workflow_id: str) -> Dict[str, Any]:
+    """Timings recorded so far for a consultation run, by step name."""
+    backend: Any = celery.backend
+    raw: Dict[bytes, bytes] = backend.client.hgetall(_timings_key(workflow_id))
+    return {step.decode(): json.loads(timing) for step, timing in raw.items()}
+
+
+@celery.task(bind=True, name="workspace.src.workflow.extract_ordonnance_step")
+def extract_ordonnance_step(
+    self: Any, doctor_prescription: str, workflow_id: str
+) -> str:
+    """Extract the medication data of one previous prescription."""
+    with _timed(workflow_id, f"extract_ordonnance:{self.request.id}"):
+        prompt = generate_prompt(
+            extract_ordonnance_data_prompt_template,
+            doctor_prescription=doctor_prescription,
+        )
+        return extract_ordonnance_data(client, prompt)
+
+
+@celery.task(bind=True, name="workspace.src.workflow.summarize_ordonnances_step")
+def summarize_ordonnances_step(
+    self: Any, extracted_prescriptions: List[str], workflow_id: str
+) -> str:
+    """Summarize the extracted prescriptions into a medication history."""
+    with _timed(workflow_id, "summarize_ordonnances"):
+        prompt = generate_prompt(
+            summarize_ordonnances_prompt_template,
+            doctor_prescriptions=extracted_prescriptions,
+        )
+        return summarize_ordonnances(client, prompt)
+
+
+@celery.task(bind=True, name="workspace.src.workflow.detect_anomalies_step")
+def detect_anomalies_step(
+    self: Any, medication_history: str, doctor_prescription: str, workflow_id: str
+) -> Dict[str, Any]:
+    """Check the new prescription against the summarized medication history."""
+    with _timed(workflow_id, "detect_anomalies"):
+        prompt = generate_prompt(
+            detect_medical_prescription_anomaly_prompt_template,
+            doctor_prescription=doctor_prescription,
+            patient_medication_history=medication_history,
+        )
+        return {
+            "medication_history": medication_history,
+            "anomalies": detect_prescription_anomalies(client, prompt),
+        }
+
+
+@celery.task(bind=True, name="workspace.src.workflow.generate_report_step")
+def generate_report_step(
+    self: Any,
+    state: Dict[str, Any],
+    conversation: str,
+    patient_information: Dict[str, Any],
+    medical_history: str,
+    workflow_id: str,
+) -> Dict[str, Any]:
+    """Generate the report once the anomaly detection it cites is available."""
+    with _timed(workflow_id, "generate_report"):
+        prompt = generate_prompt(
+            report_generation_template,
+            budget=REPORT_PROMPT_BUDGET,
+            truncate=["conversation", "medical_history"],
+            conversation=conversation,
+            patient_information=patient_information,
+            medical_history=medical_history,
+            anomaly_detection=state["anomalies"],
+        )
+        return {**state, "report": generate_report(client, prompt)}
+
+
+@celery.task(bind=True, name="workspace.src.workflow.search_articles_step")
+def search_articles_step(
+    self: Any, query: str, retmax: int, workflow_id: str
+) -> Dict[str, Any]:
+    """Search PubMed for the consultation's condition."""
+    with _timed(workflow_id, "search_articles"):
+        return dict(search_medical_articles(query, retmax, with_abstracts=True))
+
+
+@celery.task(bind=True, name="workspace.src.workflow.generate_search_summary_step")
+def generate_search_summary_step(
+    self: Any, search_result: Dict[str, Any], patient_condition: str, workflow_id: str
+) -> Dict[str, Any]:
+    """Summarize the retrieved articles for the patient's condition."""
+    with _timed(workflow_id, "generate_search_summary"):
+        prompt = generate_prompt(
+            summarize_search_prompt_template,
+            budget=SEARCH_SUMMARY_PROMPT_BUDGET,
+            truncate=["medical_articles"],
+            patient_condition=patient_condition,
+            medical_articles=search_result["articles"],
+        )
+        return {
+            "articles": search_result["articles"],
+            "search_summary": generate_search_summary(client, prompt),
+        }
+
+
+@celery.task(bind=True, name="workspace.src.workflow.collect_consultation_step")
+def collect_consultation_step(
+    self: Any, branches: List[Dict[str, Any]], workflow_id: str
+) -> Dict[str, Any]:
+    """Merge the branch results and attach the per-step timings."""
+    merged: Dict[str, Any] = {"workflow_id": workflow_id}
+    for branch in branches:
+        merged.update(branch)
+    merged["timings"] = get_workflow_timings(workflow_id)
+    return merged
+
+
+def build_consultation_workflow(
+    workflow_id: str,
+    conversation: str,
+    patient_information: Dict[str, Any],
+    medical_history: str,
+    doctor_prescription: str,
+    previous_prescriptions: List[str],
+    search_query: str,
+    retmax: int = 5,
+) -> Any:
+    """
+    Build the consultation DAG as a Celery canvas:
+
+        extract_ordonnance (one per previous prescription, in parallel)
+          -> summarize_ordonnances -> detect_anomalies -> generate_report
+        search_articles -> generate_search_summary
+          => collect_consultation (once both branches are done)
+
+    The two branches run in parallel and every step starts as soon as the step
+    it depends on has finished.
+    """
+    if previous_prescriptions:
+        medication_history: Any = chord(
+            group(
+                extract_ordonnance_step.s(prescription, workflow_id=workflow_id)
+                for prescription in previous_prescriptions
+            ),
+            summarize_ordonnances_step.s(workflow_id=workflow_id),
+        )
+        anomalies = detect_anomalies_step.s(
+            doctor_prescription=doctor_prescription, workflow_id=workflow_id
+        )
+        prescription_branch = chain(medication_history, anomalies)
+    else:
+        prescription_branch = chain(
+            detect_anomalies_step.s(
+                "Not Provided", doctor_prescription, workflow_id=workflow_id
+            )
+        )
+    prescription_branch |= generate_report_step.s(
+        conversation=conversation,
+        patient_information=patient_information,
+        medical_history=medical_history,
+        workflow_id=workflow_id,
+    )
+
+    research_branch = chain(
+        search_articles_step.s(search_query, retmax, workflow_id=workflow_id),
+        generate_search_summary_step.s(
+            patient_condition=conversation, workflow_id=workflow_id
+        ),
+    )
+
+    return chord(
+        group(prescription_branch, research_branch),
+        collect_consultation_step.s(workflow_id=workflow_id).set(task_id=workflow_id),
+    )
+
+
+def process_consultation(
+    conversation: str,
+    patient_information: Dict[str, Any],
+    medical_history: str,
+    doctor_prescription: str,
+    previous_prescriptions: List[str],
+    search_query: str,
+    retmax: int = 5,
+    workflow_id: Optional[str] = None,
+) -> AsyncResult:
+    """
+    Start the consultation pipeline.
+
+    Returns:
+        AsyncResult: A single handle whose ID is the workflow ID; it completes
+        with the merged results and the per-step timings.
+    """
+    workflow_id = workflow_id or str(uuid.uuid4())
+    _record(workflow_id, "submitted", {"started": time.time()})
+    build_consultation_workflow(
+        workflow_id,
+        conversation,
+        patient_information,
+        medical_history,
+        doctor_prescription,
+        previous_prescriptions,
+        search_query,
+        retmax,
+    ).apply_async()
+    return celery.AsyncResult(workflow_id)
@@ -0,0 +1,53 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+import pytest
+
+from workspace.src import db_utils
+
+# What `bulk_write` receives once `UpdateOne` is replaced by `update_pair`
+UpdatePair = Tuple[Dict[str, Any], Dict[str, Any]]
+
+
+def update_pair(
+    filter: Dict[str, Any], update: Dict[str, Any], upsert: bool = False
+) -> UpdatePair:
+    """Stands in for pymongo's `UpdateOne`, keeping its filter and update."""
+    return filter, update
+
+
+class FakeCounters:
+    """The Counters collection, as `next_sequence` and `advance_report_ids` use it."""
+
+    def __init__(self) -> None:
+        self.values: Dict[str, int] = {}
+        self.bulk_writes: List[List[UpdatePair]] = []
+
+    def find_one_and_update(
+        self, query: Dict[str, str], update: Any, upsert: bool = False, **kwargs: Any
+    ) -> Optional[Dict[str, Any]]:
+        name = query["_id"]
+        if isinstance(update, dict):
+            if name not in self.values:
+                return None
+            self.values[name] += update["$inc"]["value"]
+        else:
+            added = update[0]["$set"]["value"]["$add"]
+            initial = added[0]["$ifNull"][1]
+            self.values[name] = self.values.get(name, initial) + added[1]
+        return {"_id": name, "value": self.values[name]}
+
+    def find(self, query: Dict[str, Any], projection: Any) -> List[Dict[str, Any]]:
+        return [{"_id": name} for name in query["_id"]["$in"] if name in self.values]
+
+    def bulk_write(self, requests: List[UpdatePair], ordered: bool) -> None:
+        assert not ordered
+        self.bulk_writes.append(requests)
+        for query, update in requests:
+            name, value = query["_id"], update["$max"]["value"]
+            self.values[name] = max(self.values.get(name, value), value)
+
+
+@pytest.fixture
+def counters(monkeypatch: pytest.MonkeyPatch) -> FakeCounters:
+    monkeypatch.setattr(db_utils, "UpdateOne", update_pair)
+    return FakeCounters()
@@ -0,0 +1,55 @@
+import json
+from types import SimpleNamespace
+from typing import Any, List
+
+import pytest
+from celery.result import GroupResult
+
+from workspace.src import batches
+
+
+class FakeBackend:
+    def __init__(self, meta: Any, results: Any) -> None:
+        self.mget_calls = 0
+        self.client = SimpleNamespace(get=lambda key: json.dumps(meta), mget=self.mget)
+        self.results = results
+
+    def get_key_for_task(self, task_id: str) -> str:
+        return f"celery-task-meta-{task_id}"
+
+    def mget(self, keys: List[str]) -> List[Any]:
+        self.mget_calls += 1
+        return [self.results.get(key.removeprefix("celery-task-meta-")) for key in keys]
+
+    def decode_result(self, payload: Any) -> Any:
+        return payload
+
+
+def test_progress_counts_items_across_chunks(monkeypatch: pytest.MonkeyPatch) -> None:
+    meta = {"task": "t", "total": 5, "chunk_size": 2}
+    backend = FakeBackend(
+        meta,
+        {
+            "c0": {"status": "SUCCESS", "result": ["a", "b"]},
+            "c1": {"status": "FAILURE", "result": ValueError("boom")},
+        },
+    )
+    monkeypatch.setattr(batches, "celery", SimpleNamespace(backend=backend))
+    children = [SimpleNamespace(id=f"c{i}") for i in range(3)]
+    monkeypatch.setattr(
+        GroupResult,
+        "restore",
+        lambda batch_id, app: SimpleNamespace(results=children),
+    )
+
+    progress = batches.batch_progress("batch", offset=1, limit=3)
+
+    assert progress is not None
+    assert (progress["done"], progress["failed"], progress["pending"]) == (2, 2, 1)
+    assert progress["results"] == [
+        {"index": 1, "status": "completed", "result": "b"},
+        {"index": 2, "status": "failed", "error": "boom"},
+        {"index": 3, "status": "failed", "error": "boom"},
+    ]
+    assert progress["next_offset"] == 4
+    assert backend.mget_calls == 1
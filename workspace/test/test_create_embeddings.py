@@ -0,0 +1,131 @@
+from typing import Any, Dict, List, Optional
+
+import pytest
+from workspace.src import create_embeddings
+from workspace.test.conftest import UpdatePair, update_pair
+
+
+class FakeCursor:
+    def __init__(self, docs: List[Dict[str, Any]]) -> None:
+        self.docs = docs
+
+    def sort(self, field: str, direction: int) -> List[Dict[str, Any]]:
+        return sorted(self.docs, key=lambda doc: doc[field], reverse=direction < 0)
+
+
+class FakeConsultations:
+    def __init__(self, docs: List[Dict[str, Any]]) -> None:
+        self.docs = {doc["_id"]: doc for doc in docs}
+        self.queries: List[Dict[str, Any]] = []
+        self.bulk_writes: List[int] = []
+
+    def find(self, query: Dict[str, Any], projection: Any, **kwargs: Any) -> Any:
+        self.queries.append(query)
+        after = query.get("_id", {}).get("$gt", -1)
+        return FakeCursor(
+            [
+                dict(doc)
+                for doc in self.docs.values()
+                if "embedding" not in doc and doc["_id"] > after
+            ]
+        )
+
+    def bulk_write(self, requests: List[UpdatePair], ordered: bool) -> None:
+        assert not ordered
+        self.bulk_writes.append(len(requests))
+        for query, update in requests:
+            self.docs[query["_id"]].update(update["$set"])
+
+
+class FakeCheckpoints:
+    def __init__(self) -> None:
+        self.docs: Dict[str, Dict[str, Any]] = {}
+
+    def find_one(self, query: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        return self.docs.get(query["_id"])
+
+    def update_one(self, query: Dict[str, str], update: Any, upsert: bool) -> None:
+        self.docs.setdefault(query["_id"], {}).update(update["$set"])
+
+    def delete_one(self, query: Dict[str, str]) -> None:
+        self.docs.pop(query["_id"], None)
+
+
+class FakeIndex:
+    def __init__(self) -> None:
+        self.keys: List[str] = []
+
+    def add(self, keys: List[str], vectors: List[List[float]]) -> None:
+        self.keys.extend(keys)
+
+
+@pytest.fixture
+def db(monkeypatch: pytest.MonkeyPatch) -> Dict[str, Any]:
+    docs = [{"_id": i, "intelligent_summary": f"summary {i}"} for i in range(10)]
+    # Nothing to embed, but still covered by the checkpoint
+    docs[4]["intelligent_summary"] = ""
+    fake: Dict[str, Any] = {
+        "Consultation": FakeConsultations(docs),
+        "Checkpoint": FakeCheckpoints(),
+        "index": FakeIndex(),
+    }
+    monkeypatch.setattr(create_embeddings, "get_database", lambda: fake)
+    monkeypatch.setattr(create_embeddings, "UpdateOne", update_pair)
+    monkeypatch.setattr(create_embeddings, "get_vector_index", lambda _: fake["index"])
+    return fake
+
+
+def test_interrupted_backfill_resumes_after_the_checkpoint(
+    db: Dict[str, Any], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    embedded: List[List[str]] = []
+
+    def embed(texts: List[str]) -> List[List[float]]:
+        if len(embedded) == 2:
+            raise RuntimeError("embedding service down")
+        embedded.append(texts)
+        return [[float(len(text))] for text in texts]
+
+    monkeypatch.setattr(create_embeddings, "generate_embeddings", embed)
+
+    with pytest.raises(RuntimeError):
+        create_embeddings.add_embeddings_to_collection(batch_size=3)
+
+    consultations = db["Consultation"]
+    assert consultations.bulk_writes == [3, 2]
+    checkpoint = db["Checkpoint"].find_one({"_id": "embeddings:Consultation"})
+    assert checkpoint == {"last_id": 5}
+
+    # Forget which documents were written, to see the checkpoint alone skip them
+    for doc in consultations.docs.values():
+        doc.pop("embedding", None)
+    embedded.clear()
+    processed = create_embeddings.add_embeddings_to_collection(batch_size=3)
+
+    assert processed == 4
+    assert consultations.queries[-1]["_id"] == {"$gt": 5}
+    assert embedded == [["summary 6", "summary 7", "summary 8"], ["summary 9"]]
+    assert consultations.bulk_writes == [3, 2, 3, 1]
+    assert db["Checkpoint"].docs == {}
+    assert db["index"].keys == [str(i) for i in (0, 1, 2, 3, 5, 6, 7, 8, 9)]
+
+
+def test_restart_ignores_the_checkpoint(
+    db: Dict[str, Any], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    db["Checkpoint"].update_one(
+        {"_id": "embeddings:Consultation"}, {"$set": {"last_id": 5}}, upsert=True
+    )
+    monkeypatch.setattr(
+        create_embeddings,
+        "generate_embeddings",
+        lambda texts: [[1.0] for _ in texts],
+    )
+
+    processed = create_embeddings.add_embeddings_to_collection(
+        batch_size=4, resume=False
+    )
+
+    assert processed == 9
+    assert "_id" not in db["Consultation"].queries[-1]
+    assert db["Consultation"].bulk_writes == [4, 3, 2]
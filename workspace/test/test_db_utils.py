@@ -0,0 +1,118 @@
+import os
+from typing import Any, Dict, List, Optional
+
+import pytest
+from pymongo.errors import OperationFailure
+
+from workspace.src import db_utils
+from workspace.test.conftest import FakeCounters
+
+
+class FakeClient:
+    def __init__(self) -> None:
+        self.closed = False
+
+    def close(self) -> None:
+        self.closed = True
+
+
+@pytest.fixture
+def created(monkeypatch: pytest.MonkeyPatch) -> List[FakeClient]:
+    clients: List[FakeClient] = []
+
+    def create() -> Any:
+        clients.append(FakeClient())
+        return clients[-1]
+
+    monkeypatch.setattr(db_utils, "create_mongo_client", create)
+    monkeypatch.setattr(db_utils, "_client", None)
+    monkeypatch.setattr(db_utils, "_client_pid", None)
+    return clients
+
+
+def test_client_is_shared_within_a_process(created: List[FakeClient]) -> None:
+    assert db_utils.get_mongo_client() is db_utils.get_mongo_client()
+    assert len(created) == 1
+
+
+def test_client_is_recreated_in_a_forked_process(
+    created: List[FakeClient], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    parent = db_utils.get_mongo_client()
+    monkeypatch.setattr(os, "getpid", lambda: -1)
+
+    child = db_utils.get_mongo_client()
+
+    assert child is not parent
+    assert not created[0].closed
+
+
+def test_close_mongo_client(created: List[FakeClient]) -> None:
+    db_utils.get_mongo_client()
+    db_utils.close_mongo_client()
+
+    assert created[0].closed
+    db_utils.get_mongo_client()
+    assert len(created) == 2
+
+
+class FakeConsultations:
+    def __init__(self, last: Optional[int]) -> None:
+        self.last = last
+        self.lookups = 0
+
+    def find_one(self, query: Dict[str, str], *args: Any, **kwargs: Any) -> Any:
+        self.lookups += 1
+        return None if self.last is None else {"reportID": self.last}
+
+
+def test_report_ids_continue_from_existing_consultations(
+    counters: FakeCounters,
+) -> None:
+    consultations = FakeConsultations(last=7)
+    db: Any = {"Counters": counters, "Consultation": consultations}
+
+    ids = [db_utils.next_report_id(db, "123") for _ in range(3)]
+
+    assert ids == [8, 9, 10]
+    assert consultations.lookups == 1
+    assert db_utils.next_report_id(db, "456") == 8
+
+
+def test_sequences_start_at_one(counters: FakeCounters) -> None:
+    db: Any = {"Counters": counters}
+
+    assert db_utils.next_sequence(db, "x") == 1
+    assert db_utils.next_sequence(db, "x") == 2
+
+
+class FakeIndexedTable:
+    """A collection whose unique index build fails if it holds duplicates."""
+
+    name = "Consultation"
+
+    def __init__(self, duplicates: List[Dict[str, Any]]) -> None:
+        self.duplicates = duplicates
+        self.indexes: List[List[str]] = []
+
+    def create_index(self, fields: List[str], unique: bool = False) -> None:
+        if self.duplicates:
+            raise OperationFailure("E11000 duplicate key error", code=11000)
+        self.indexes.append(fields)
+
+    def aggregate(self, pipeline: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return self.duplicates[: pipeline[-1]["$limit"]]
+
+
+def test_unique_index_over_duplicates_is_reported_not_raised(
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    duplicate = {"_id": {"social_security_number": "1", "reportID": 3}, "count": 2}
+    db: Any = {"Consultation": FakeIndexedTable([duplicate])}
+
+    assert db_utils.ensure_consultation_indexes(db) is False
+    assert "'reportID': 3" in capsys.readouterr().out
+
+    db = {"Consultation": FakeIndexedTable([])}
+    assert db_utils.ensure_consultation_indexes(db) is True
+    assert db["Consultation"].indexes == [["social_security_number", "reportID"]]
@@ -0,0 +1,54 @@
+import threading
+from typing import Any, List
+
+import numpy as np
+
+from workspace.src.embedding_service import EmbeddingService
+
+
+class FakeModel:
+    def __init__(self) -> None:
+        self.calls: List[List[str]] = []
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> Any:
+        self.calls.append(list(texts))
+        return np.array([[float(len(text)), 1.0] for text in texts])
+
+
+def test_embed_many_encodes_misses_once_and_caches() -> None:
+    model = FakeModel()
+    service = EmbeddingService(model=model)
+
+    assert service.embed_many(["a", "bb", "a"]) == [[1.0, 1.0], [2.0, 1.0], [1.0, 1.0]]
+    assert service.embed_many(["bb", "ccc"]) == [[2.0, 1.0], [3.0, 1.0]]
+
+    assert model.calls == [["a", "bb"], ["ccc"]]
+    assert service.stats()["cache_hits"] == 1
+
+
+def test_concurrent_embed_calls_share_a_batch() -> None:
+    model = FakeModel()
+    service = EmbeddingService(model=model, max_wait_ms=200)
+    results: dict[str, List[float]] = {}
+
+    def embed(text: str) -> None:
+        results[text] = service.embed(text)
+
+    threads = [threading.Thread(target=embed, args=(t,)) for t in ["x", "yy", "zzz"]]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {"x": [1.0, 1.0], "yy": [2.0, 1.0], "zzz": [3.0, 1.0]}
+    assert len(model.calls) == 1
+
+
+def test_cache_evicts_least_recently_used() -> None:
+    service = EmbeddingService(model=FakeModel(), cache_size=2)
+    service.embed_many(["a", "b"])
+    service.embed_many(["a", "c"])
+
+    assert service.stats()["cache_entries"] == 2
+    service.embed_many(["b"])
+    assert service.stats()["texts_encoded"] == 4
@@ -0,0 +1,75 @@
+import io
+from typing import Any
+
+import pytest
+
+from workspace.src import gather_medical_knowledge_tool as pubmed
+
+EFETCH_XML = b"""<?xml version="1.0" ?>
+<PubmedArticleSet>
+  <PubmedArticle>
+    <MedlineCitation><PMID>111</PMID>
+      <Article><Abstract>
+        <AbstractText Label="BACKGROUND">Chest <i>pain</i> is common.</AbstractText>
+        <AbstractText Label="RESULTS">Angina was atypical.</AbstractText>
+      </Abstract></Article>
+    </MedlineCitation>
+  </PubmedArticle>
+  <PubmedArticle>
+    <MedlineCitation><PMID>222</PMID><Article /></MedlineCitation>
+  </PubmedArticle>
+</PubmedArticleSet>
+"""
+
+
+class FakeResponse:
+    def __init__(self, status_code: int) -> None:
+        self.status_code = status_code
+        self.raw = io.BytesIO(EFETCH_XML)
+        self.closed = False
+
+    def __enter__(self) -> "FakeResponse":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.closed = True
+
+
+class FakeSession:
+    def __init__(self, status_code: int = 200) -> None:
+        self.status_code = status_code
+        self.posts: list[dict[str, Any]] = []
+        self.responses: list[FakeResponse] = []
+
+    def post(self, url: str, data: dict[str, Any], **kwargs: Any) -> Any:
+        self.posts.append(data)
+        self.responses.append(FakeResponse(self.status_code))
+        return self.responses[-1]
+
+
+def test_abstracts_for_many_pmids_come_from_one_efetch(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    session = FakeSession()
+    monkeypatch.setattr(pubmed, "get_pubmed_session", lambda: session)
+
+    abstracts = pubmed.fetch_article_abstracts(["111", "222"])
+
+    assert abstracts == {
+        "111": "Chest pain is common. Angina was atypical.",
+        "222": "No abstract available.",
+    }
+    assert [post["id"] for post in session.posts] == ["111,222"]
+    assert session.responses[0].closed
+
+
+def test_failed_efetch_releases_its_connection(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    session = FakeSession(status_code=429)
+    monkeypatch.setattr(pubmed, "get_pubmed_session", lambda: session)
+
+    with pytest.raises(Exception, match="429"):
+        pubmed.fetch_article_abstracts(["111"])
+
+    assert session.responses[0].closed
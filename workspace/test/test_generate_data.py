@@ -0,0 +1,214 @@
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+import pytest
+
+from workspace.src import generate_data
+
+
+class FakeCollection:
+    def __init__(self, docs: List[Dict[str, Any]]) -> None:
+        self.docs = docs
+        self.pipelines: List[List[Dict[str, Any]]] = []
+
+    def aggregate(self, pipeline: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # Only the pipeline of `fetch_related_consultations`
+        self.pipelines.append(pipeline)
+        match = pipeline[0]["$match"]
+        related = sorted(
+            (
+                doc
+                for doc in self.docs
+                if doc["social_security_number"] == match["social_security_number"]
+                and doc["reportID"] > match["reportID"]["$gt"]
+            ),
+            key=lambda doc: doc["reportID"],
+        )
+        if not related:
+            return []
+        return [
+            {
+                "_id": None,
+                "summaries": [doc["intelligent_summary"] for doc in related],
+                "last_reportID": related[-1]["reportID"],
+            }
+        ]
+
+    def find_one(
+        self, query: Dict[str, Any], projection: Optional[Dict[str, int]] = None
+    ) -> Optional[Dict[str, Any]]:
+        for doc in self.docs:
+            if all(doc.get(key) == value for key, value in query.items()):
+                return doc
+        return None
+
+    def update_one(
+        self, query: Dict[str, Any], update: Dict[str, Any], upsert: bool = False
+    ) -> Any:
+        doc = self.find_one(query)
+        if doc is not None:
+            doc.update(update["$set"])
+        elif upsert:
+            self.docs.append({**query, **update["$set"]})
+        return SimpleNamespace(matched_count=int(doc is not None))
+
+
+@pytest.fixture
+def db() -> Dict[str, FakeCollection]:
+    return {
+        "Consultation": FakeCollection(
+            [
+                {
+                    "social_security_number": "1",
+                    "reportID": 2,
+                    "intelligent_summary": "b",
+                },
+                {
+                    "social_security_number": "1",
+                    "reportID": 1,
+                    "intelligent_summary": "a",
+                },
+                {
+                    "social_security_number": "2",
+                    "reportID": 7,
+                    "intelligent_summary": "c",
+                },
+            ]
+        ),
+        "Patient": FakeCollection([{"social_security_number": "1"}]),
+    }
+
+
+@pytest.fixture
+def llm(monkeypatch: pytest.MonkeyPatch) -> List[str]:
+    calls: List[str] = []
+
+    def send_task(name: str, args: List[Any]) -> None:
+        calls.append(f"queue {name.rsplit('.', 1)[-1]} {args}")
+
+    def aggregate(summaries: List[str]) -> str:
+        calls.append(f"build {summaries}")
+        return " ".join(summaries)
+
+    def fold(medical_history: str, summaries: List[str]) -> str:
+        calls.append(f"fold {summaries}")
+        return " ".join([medical_history, *summaries])
+
+    monkeypatch.setattr(generate_data, "aggregate_medical_history", aggregate)
+    monkeypatch.setattr(generate_data, "fold_medical_history", fold)
+    monkeypatch.setattr(generate_data, "celery", SimpleNamespace(send_task=send_task))
+    return calls
+
+
+def test_related_consultations_in_one_query(db: Any) -> None:
+    assert generate_data.fetch_related_consultations(db, "1") == (["a", "b"], 2)
+    assert generate_data.fetch_related_consultations(db, "1", 1) == (["b"], 2)
+    assert generate_data.fetch_related_consultations(db, "1", 2) == ([], 2)
+    assert generate_data.fetch_related_consultations(db, "3") == ([], 0)
+    assert len(db["Consultation"].pipelines) == 4
+
+
+def add_consultation(db: Any, report_id: int, summary: str) -> None:
+    db["Consultation"].docs.append(
+        {
+            "social_security_number": "1",
+            "reportID": report_id,
+            "intelligent_summary": summary,
+        }
+    )
+
+
+def test_medical_history_folds_only_new_consultations(db: Any, llm: List[str]) -> None:
+    assert generate_data.get_medical_history(db, "1") == ("a b", 2)
+    assert generate_data.get_medical_history(db, "1") == ("a b", 2)
+    add_consultation(db, 3, "c")
+    assert generate_data.get_medical_history(db, "1") == ("a b c", 3)
+
+    assert llm == ["build ['a', 'b']", "fold ['c']"]
+    assert db["Patient"].docs[0]["medical_history_folds"] == 1
+
+
+def test_medical_history_rebuild_is_queued_periodically(
+    db: Any, llm: List[str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(generate_data, "MEDICAL_HISTORY_REBUILD_EVERY", 2)
+    generate_data.get_medical_history(db, "1")
+    for report_id, summary in ((3, "c"), (4, "d"), (5, "e")):
+        add_consultation(db, report_id, summary)
+        generate_data.get_medical_history(db, "1")
+
+    assert llm == [
+        "build ['a', 'b']",
+        "fold ['c']",
+        "fold ['d']",
+        "queue rebuild_medical_history_task ['1']",
+        "fold ['e']",
+    ]
+
+    assert generate_data.rebuild_medical_history(db, "1") is True
+    assert llm[-1] == "build ['a', 'b', 'c', 'd', 'e']"
+    assert db["Patient"].docs[0]["medical_history_folds"] == 0
+
+
+def test_a_rebuild_overtaken_by_a_visit_is_dropped(
+    db: Any, llm: List[str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    generate_data.get_medical_history(db, "1")
+
+    def aggregate_during_a_visit(summaries: List[str]) -> str:
+        add_consultation(db, 3, "c")
+        generate_data.get_medical_history(db, "1")
+        return "rebuilt"
+
+    monkeypatch.setattr(
+        generate_data, "aggregate_medical_history", aggregate_during_a_visit
+    )
+
+    assert generate_data.rebuild_medical_history(db, "1") is False
+    assert db["Patient"].docs[0]["medical_history"] == "a b c"
+
+
+def test_patients_without_consultations_have_no_history(
+    db: Any, llm: List[str]
+) -> None:
+    assert generate_data.get_medical_history(db, "3") == ("", 0)
+    assert llm == []
+
+
+def test_patients_without_a_patient_document_keep_their_synthesis(
+    db: Any, llm: List[str]
+) -> None:
+    assert generate_data.get_medical_history(db, "2") == ("c", 7)
+    assert generate_data.get_medical_history(db, "2") == ("c", 7)
+
+    assert llm == ["build ['c']"]
+    assert db["Patient"].docs[-1]["medical_history_reportID"] == 7
+
+
+def test_summaries_are_chunked_in_order_within_the_budget() -> None:
+    summaries = ["a" * 35, "b" * 35, "c" * 70, "d" * 700, "e" * 35]
+
+    chunks = generate_data.chunk_summaries(summaries, budget=30)
+
+    assert chunks == [["a" * 35, "b" * 35], ["c" * 70], ["d" * 700], ["e" * 35]]
+    assert generate_data.chunk_summaries([], budget=30) == []
+
+
+def test_a_long_history_is_rebuilt_chunk_by_chunk_oldest_first(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    prompts: List[str] = []
+
+    def respond(client: Any, system_prompt: str, user_prompt: str) -> str:
+        prompts.append(user_prompt)
+        return f"record {len(prompts)}"
+
+    monkeypatch.setattr(generate_data, "generate_response", respond)
+    monkeypatch.setattr(generate_data, "MEDICAL_HISTORY_CHUNK_BUDGET", 30)
+    summaries = [f"visit {i} " + "x" * 40 for i in range(5)]
+
+    assert generate_data.aggregate_medical_history(summaries) == "record 3"
+    # Every summary reaches a prompt, the oldest in the first one
+    assert "visit 0" in prompts[0] and "visit 1" in prompts[0]
+    assert "visit 2" in prompts[1] and "record 1" in prompts[1]
+    assert "visit 4" in prompts[2] and "record 2" in prompts[2]
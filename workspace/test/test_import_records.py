@@ -0,0 +1,145 @@
+import io
+import json
+from typing import Any, Dict, List, Tuple
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+from workspace.src import import_records
+from workspace.test.conftest import FakeCounters
+
+
+class FakeTable:
+    """insert_many with a unique key, as the importer's indexes enforce."""
+
+    def __init__(self, *unique: str) -> None:
+        self.unique = unique
+        self.docs: List[Dict[str, Any]] = []
+        self.batches: List[int] = []
+
+    def create_index(self, fields: List[str], unique: bool = False) -> None:
+        pass
+
+    def key(self, doc: Dict[str, Any]) -> Tuple[Any, ...]:
+        return tuple(doc.get(field) for field in self.unique)
+
+    def insert_many(self, docs: List[Dict[str, Any]], ordered: bool) -> Any:
+        assert not ordered
+        self.batches.append(len(docs))
+        errors = []
+        for i, doc in enumerate(docs):
+            if any(self.key(doc) == self.key(other) for other in self.docs):
+                errors.append({"index": i, "code": 11000, "errmsg": "E11000"})
+            else:
+                doc["_id"] = len(self.docs)
+                self.docs.append(doc)
+        if errors:
+            raise BulkWriteError(
+                {"writeErrors": errors, "nInserted": len(docs) - len(errors)}
+            )
+        return type("Result", (), {"inserted_ids": [doc["_id"] for doc in docs]})
+
+    def find_one(self, query: Dict[str, Any], *args: Any, **kwargs: Any) -> Any:
+        ids = [
+            doc["reportID"]
+            for doc in self.docs
+            if doc["social_security_number"] == query["social_security_number"]
+        ]
+        return {"reportID": max(ids)} if ids else None
+
+    def aggregate(self, pipeline: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # Only the largest reportID per patient of `advance_report_ids`
+        ssns = pipeline[0]["$match"]["social_security_number"]["$in"]
+        last: Dict[str, int] = {}
+        for doc in self.docs:
+            ssn = doc["social_security_number"]
+            if ssn in ssns:
+                last[ssn] = max(last.get(ssn, 0), doc["reportID"])
+        return [{"_id": ssn, "reportID": report_id} for ssn, report_id in last.items()]
+
+
+@pytest.fixture
+def db(counters: FakeCounters) -> Any:
+    return {
+        "Patient": FakeTable("social_security_number"),
+        "Consultation": FakeTable("social_security_number", "reportID"),
+        "Counters": counters,
+    }
+
+
+def consultation(ssn: str, **fields: Any) -> Dict[str, Any]:
+    return {
+        "social_security_number": ssn,
+        "date": "2025-01-01",
+        "symptoms": ["toux"],
+        "pathology": "bronchite",
+        "treatment": ["repos"],
+        "keywords": ["toux"],
+        "intelligent_summary": "Toux.",
+        **fields,
+    }
+
+
+def test_patients_from_csv_with_invalid_and_duplicate_rows(db: Any) -> None:
+    file = io.StringIO(
+        "social_security_number,full_name,age,sex,occupation,chronical_diseases,allergies\n"
+        "1,A,35,M,Teacher,Diabetes;Asthma,\n"
+        '2,B,40,F,Nurse,[],"[""Dust""]"\n'
+        "1,A again,35,M,Teacher,,\n"
+        "3,C,,F,Nurse,,\n"
+    )
+    rejects = io.StringIO()
+
+    stats = import_records.import_records(
+        db, "patients", file, "csv", batch_size=2, rejects=rejects
+    )
+
+    assert (stats["rows"], stats["inserted"], stats["rejected"]) == (4, 2, 2)
+    assert db["Patient"].batches == [2, 1]
+    assert db["Patient"].docs[0]["chronical_diseases"] == ["Diabetes", "Asthma"]
+    assert db["Patient"].docs[1]["allergies"] == ["Dust"]
+    reasons = [json.loads(line) for line in rejects.getvalue().splitlines()]
+    assert [(r["line"], r["reason"] == "duplicate") for r in reasons] == [
+        (5, False),
+        (4, True),
+    ]
+
+
+def test_consultations_get_report_ids_after_given_ones(db: Any) -> None:
+    rows = [
+        consultation("1", reportID=5),
+        consultation("1"),
+        consultation("2"),
+        consultation("1"),
+    ]
+    file = io.StringIO("\n".join(json.dumps(row) for row in rows) + "\n\n{bad\n")
+
+    stats = import_records.import_records(db, "consultations", file)
+
+    assert (stats["inserted"], stats["rejected"]) == (4, 1)
+    ids = [
+        (d["social_security_number"], d["reportID"]) for d in db["Consultation"].docs
+    ]
+    assert sorted(ids) == [("1", 5), ("1", 6), ("1", 7), ("2", 1)]
+    assert stats["rows_per_second"] > 0
+
+
+def test_given_report_ids_advance_counters_in_one_bulk_write(db: Any) -> None:
+    db["Consultation"].docs.append(consultation("3", reportID=9))
+    rows = [consultation(ssn, reportID=2) for ssn in ("1", "2", "3")] + [
+        consultation("1", reportID=4),
+        consultation("4", date="15/02/2025"),
+    ]
+    file = io.StringIO("".join(json.dumps(row) + "\n" for row in rows))
+
+    stats = import_records.import_records(db, "consultations", file)
+
+    assert (stats["inserted"], stats["rejected"]) == (4, 1)
+    assert [len(requests) for requests in db["Counters"].bulk_writes] == [3]
+    # A new counter starts after the reportIDs already stored
+    assert db["Counters"].values == {
+        "reportID:1": 4,
+        "reportID:2": 2,
+        "reportID:3": 9,
+    }
+    assert db["Consultation"].docs[1]["date"] == "2025-01-01"
@@ -0,0 +1,90 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+from workspace.src.live_insights import LiveInsightEngine
+from workspace.src.llm_cache import set_llm_cache
+from workspace.src.stt_simulation_module import stream_speech_buffer
+
+
+class FakeCompletions:
+    def __init__(self) -> None:
+        self.prompts: List[str] = []
+
+    async def parse(self, **kwargs: Any) -> Any:
+        self.prompts.append(kwargs["messages"][1]["content"])
+        content = json.dumps(
+            {
+                # The model keeps restating the same point in other words
+                "pertinent_medical_points": ["Chest pain since last night"],
+                "follow_up_questions": [f"Question {len(self.prompts)}?"],
+                "search_propositions": [f"search {len(self.prompts)}"],
+            }
+        )
+        message = SimpleNamespace(content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def fake_embed(texts: List[str]) -> List[List[float]]:
+    # Every point embeds to the same direction, every search to its own
+    return [
+        [1.0, 0.0, 0.0] if "pain" in text else [0.0, 1.0, float(len(text))]
+        for text in texts
+    ]
+
+
+def test_updates_send_a_bounded_window_and_drop_duplicate_points() -> None:
+    set_llm_cache(None)
+    completions = FakeCompletions()
+    client: Any = SimpleNamespace(
+        beta=SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    )
+    engine = LiveInsightEngine(
+        client, min_new_chars=100, context_chars=50, embed=fake_embed
+    )
+    transcript = " ".join(f"Patient: sentence number {i}." for i in range(100))
+
+    async def main() -> List[Dict[str, Any]]:
+        chunks = stream_speech_buffer(
+            [{"text": transcript}], buffer_size=64, delay=0, mode="word"
+        )
+        return [update async for update in engine.run(chunks)]
+
+    updates = asyncio.run(main())
+
+    assert len(updates) == engine.updates > 10
+    assert engine.state()["pertinent_medical_points"] == ["Chest pain since last night"]
+    assert updates[-1]["new_pertinent_medical_points"] == []
+    assert updates[-1]["follow_up_questions"] == [f"Question {engine.updates}?"]
+    # The prompt does not grow with the transcript
+    sizes = [len(prompt) for prompt in completions.prompts[1:-1]]
+    assert max(sizes) - min(sizes) < 200
+    assert max(sizes) < len(transcript)
+
+
+def test_word_chunks_reach_the_prompt_with_their_spacing() -> None:
+    set_llm_cache(None)
+    completions = FakeCompletions()
+    client: Any = SimpleNamespace(
+        beta=SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    )
+    engine = LiveInsightEngine(
+        client, min_new_chars=40, context_chars=200, embed=fake_embed
+    )
+    speeches = [
+        {"text": "Doctor: where does it hurt?"},
+        {"text": "Patient: my chest hurts since last night."},
+    ]
+
+    async def main() -> List[Dict[str, Any]]:
+        chunks = stream_speech_buffer(speeches, buffer_size=3, delay=0, mode="word")
+        return [update async for update in engine.run(chunks)]
+
+    asyncio.run(main())
+
+    assert len(completions.prompts) == 2
+    assert "Doctor: where does it hurt?\nPatient: my \n" in completions.prompts[0]
+    # The first window becomes the context of the next, spacing intact
+    assert "Doctor: where does it hurt?\nPatient: my \n" in completions.prompts[1]
+    assert "chest hurts since last night.\n" in completions.prompts[1]
@@ -0,0 +1,90 @@
+from types import SimpleNamespace
+from typing import Any, Iterator, List, Optional
+
+import pytest
+from openai import OpenAIError
+
+from workspace.src.llm_cache import InMemoryLLMCache, LLMCache, set_llm_cache
+from workspace.src.pydantic_models import FollowUpQuestions
+from workspace.src.utils import generate_response, generate_structured_response
+
+
+class FakeCompletions:
+    def __init__(self, contents: List[Optional[str]]) -> None:
+        self.contents = contents
+        self.calls = 0
+
+    def create(self, **kwargs: Any) -> Any:
+        return self.parse(**kwargs)
+
+    def parse(self, **kwargs: Any) -> Any:
+        content = self.contents[self.calls]
+        self.calls += 1
+        if content == "raise":
+            raise OpenAIError("boom")
+        message = SimpleNamespace(content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def fake_client(contents: List[Optional[str]]) -> Any:
+    completions = FakeCompletions(contents)
+    chat = SimpleNamespace(completions=completions)
+    return SimpleNamespace(chat=chat, beta=SimpleNamespace(chat=chat))
+
+
+@pytest.fixture
+def cache() -> Iterator[InMemoryLLMCache]:
+    cache = InMemoryLLMCache(ttl=60, max_entries=8)
+    set_llm_cache(cache)
+    yield cache
+    set_llm_cache(None)
+
+
+def test_repeated_prompt_is_served_from_cache(cache: InMemoryLLMCache) -> None:
+    client = fake_client(["first", "second"])
+
+    assert generate_response(client, "system", "user") == "first"
+    assert generate_response(client, "system", "user") == "first"
+    assert generate_response(client, "system", "user", use_cache=False) == "second"
+    assert cache.stats()["hits"] == 1
+
+
+def test_errors_are_not_cached(cache: InMemoryLLMCache) -> None:
+    client = fake_client(["raise", '{"follow_up_questions": ["Q?"]}'])
+
+    first = generate_structured_response(client, "s", "u", FollowUpQuestions)
+    second = generate_structured_response(client, "s", "u", FollowUpQuestions)
+
+    assert "error" in first
+    assert second == {"follow_up_questions": ["Q?"]}
+
+
+def test_entries_expire_after_ttl(cache: InMemoryLLMCache) -> None:
+    cache.ttl = -1
+    client = fake_client(["first", "second"])
+
+    generate_response(client, "system", "user")
+
+    assert generate_response(client, "system", "user") == "second"
+
+
+def test_callers_mutating_an_answer_do_not_change_the_cache(
+    cache: InMemoryLLMCache,
+) -> None:
+    client = fake_client(['{"follow_up_questions": ["Q?"]}'])
+
+    first = generate_structured_response(client, "s", "u", FollowUpQuestions)
+    first["follow_up_questions"].append("Mutated?")
+
+    second = generate_structured_response(client, "s", "u", FollowUpQuestions)
+    assert second == {"follow_up_questions": ["Q?"]}
+
+
+def test_cache_backends_must_implement_get_and_set() -> None:
+    class Incomplete(LLMCache):
+        def _get(self, key: str) -> Optional[Any]:
+            return None
+
+    cache_class: Any = Incomplete
+    with pytest.raises(TypeError):
+        cache_class()
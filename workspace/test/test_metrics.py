@@ -0,0 +1,142 @@
+from contextlib import contextmanager
+from datetime import timedelta
+from types import SimpleNamespace
+from typing import Any, Iterator
+
+import pytest
+import requests
+from prometheus_client import REGISTRY, CollectorRegistry, generate_latest
+
+from workspace.src import metrics, utils
+from workspace.src.llm_cache import set_llm_cache
+
+
+def sample(name: str, **labels: str) -> float:
+    value = REGISTRY.get_sample_value(name, labels)
+    return value or 0.0
+
+
+def test_llm_calls_record_latency_outcome_and_tokens() -> None:
+    before = sample(
+        "llm_request_seconds_count", operation="chat", model="m", outcome="error"
+    )
+    with pytest.raises(RuntimeError):
+        with metrics.track_llm_call("chat", "m"):
+            raise RuntimeError("provider down")
+    usage = SimpleNamespace(prompt_tokens=12, completion_tokens=5)
+    metrics.record_llm_usage("m", SimpleNamespace(usage=usage))
+    metrics.record_llm_usage("m", SimpleNamespace())
+
+    assert (
+        sample(
+            "llm_request_seconds_count", operation="chat", model="m", outcome="error"
+        )
+        == before + 1
+    )
+    assert sample("llm_tokens_total", model="m", kind="prompt") >= 12
+    assert sample("llm_tokens_total", model="m", kind="completion") >= 5
+
+
+def test_instrumented_session_times_responses() -> None:
+    session = metrics.instrument_session(requests.Session(), "pubmed")
+    response = requests.Response()
+    response.status_code = 200
+    response.elapsed = timedelta(milliseconds=30)
+
+    for hook in session.hooks["response"]:
+        hook(response)
+
+    assert sample("external_api_seconds_sum", service="pubmed", status="200") >= 0.03
+
+
+def test_queue_depth_is_read_at_scrape_time() -> None:
+    lengths = {"llm": 3, "api": 0, "celery": 1}
+
+    @contextmanager
+    def connection_for_read() -> Iterator[Any]:
+        client = SimpleNamespace(llen=lengths.__getitem__)
+        yield SimpleNamespace(default_channel=SimpleNamespace(client=client))
+
+    celery = SimpleNamespace(
+        conf=SimpleNamespace(
+            task_routes={"a": {"queue": "llm"}, "b": {"queue": "api"}},
+            task_default_queue="celery",
+        ),
+        connection_for_read=connection_for_read,
+    )
+    registry = CollectorRegistry()
+    registry.register(metrics.QueueDepthCollector(celery))
+
+    output = generate_latest(registry).decode()
+
+    assert 'celery_queue_depth{queue="llm"} 3.0' in output
+    assert 'celery_queue_depth{queue="celery"} 1.0' in output
+
+
+def test_streamed_responses_record_the_usage_they_report() -> None:
+    set_llm_cache(None)
+    requested = {}
+
+    def create(**kwargs: Any) -> Any:
+        requested.update(kwargs)
+        delta = SimpleNamespace(content="Bonjour")
+        usage = SimpleNamespace(prompt_tokens=7, completion_tokens=3)
+        return [
+            SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None),
+            # The usage comes in a last chunk without choices
+            SimpleNamespace(choices=[], usage=usage),
+        ]
+
+    client: Any = SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=create))
+    )
+    before = sample("llm_tokens_total", model=utils.MODEL_NAME, kind="prompt")
+
+    text = utils.generate_response_stream(client, "system", "user", lambda d: None)
+
+    assert text == "Bonjour"
+    assert "stream_options" not in requested
+    assert sample("llm_tokens_total", model=utils.MODEL_NAME, kind="prompt") == (
+        before + 7
+    )
+
+
+def test_streamed_responses_ask_for_their_usage_when_configured(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    set_llm_cache(None)
+    monkeypatch.setattr(
+        utils, "_STREAM_OPTIONS", {"stream_options": {"include_usage": True}}
+    )
+    requested = {}
+
+    def create(**kwargs: Any) -> Any:
+        requested.update(kwargs)
+        return []
+
+    client: Any = SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=create))
+    )
+
+    utils.generate_response_stream(client, "system", "user", lambda d: None)
+
+    assert requested["stream_options"] == {"include_usage": True}
+
+
+def test_requests_answered_before_the_timer_are_not_observed() -> None:
+    from workspace.src import api
+
+    @api.app.before_request
+    def refuse() -> Any:
+        return "refused", 403
+
+    # Run first, so start_timer never does
+    api.app.before_request_funcs[None].insert(
+        0, api.app.before_request_funcs[None].pop()
+    )
+    try:
+        response = api.app.test_client().get("/metrics")
+    finally:
+        api.app.before_request_funcs[None].remove(refuse)
+
+    assert response.status_code == 403
@@ -0,0 +1,86 @@
+import pytest
+
+from workspace.src.prompt_builder import build_prompt, estimate_tokens, serialize
+from workspace.src.prompts import (
+    report_generation_template,
+    summarize_search_prompt_template,
+)
+
+
+def test_structured_values_are_serialized_without_python_syntax() -> None:
+    text = serialize(
+        [
+            {"pmid": "1", "title": "Angina", "authors": ["A", "B"], "abstract": ""},
+            {"pmid": "2", "title": "Chest pain", "authors": [], "abstract": None},
+        ]
+    )
+
+    assert text == "pmid: 1\ntitle: Angina\nauthors: A, B\n\npmid: 2\ntitle: Chest pain"
+    assert serialize({"age": 45, "allergies": []}) == "age: 45"
+    assert serialize(["a", "b"]) == "- a\n- b"
+
+
+def test_articles_are_fitted_to_the_budget(capsys: pytest.CaptureFixture[str]) -> None:
+    articles = [
+        {"pmid": str(i), "title": f"Article {i}", "abstract": "x" * 4000}
+        for i in range(20)
+    ]
+
+    prompt = build_prompt(
+        summarize_search_prompt_template,
+        budget=3000,
+        truncate=["medical_articles"],
+        patient_condition="Chest pain",
+        medical_articles=articles,
+    )
+
+    assert estimate_tokens(prompt) <= 3000
+    assert "pmid: 0\ntitle: Article 0" in prompt
+    assert "Chest pain" in prompt
+    assert "cut" in capsys.readouterr().out
+
+
+def test_prompt_under_budget_is_left_untouched() -> None:
+    prompt = build_prompt(
+        summarize_search_prompt_template,
+        budget=3000,
+        truncate=["medical_articles"],
+        patient_condition="Chest pain",
+        medical_articles=[{"pmid": "1", "title": "Angina"}],
+    )
+
+    assert "pmid: 1\ntitle: Angina" in prompt
+    assert "[…]" not in prompt
+
+
+def test_a_long_field_leaves_room_for_the_others() -> None:
+    prompt = build_prompt(
+        report_generation_template,
+        budget=8000,
+        truncate=["conversation", "medical_history"],
+        conversation="c" * 100_000,
+        patient_information={"age": 45},
+        medical_history="h" * 20_000,
+        anomaly_detection="None",
+    )
+
+    assert estimate_tokens(prompt) <= 8000
+    assert prompt.count("h") > 5000
+    assert prompt.count("c") > 5000
+
+
+def test_other_fields_over_the_budget_are_logged(
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    prompt = build_prompt(
+        report_generation_template,
+        budget=1000,
+        truncate=["conversation", "medical_history"],
+        conversation="conversation",
+        patient_information={"notes": "n" * 10_000},
+        medical_history="history",
+        anomaly_detection="None",
+    )
+
+    assert "n" * 10_000 in prompt
+    assert "WARNING" in capsys.readouterr().out
@@ -0,0 +1,82 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Any, List
+
+import pytest
+import requests
+from urllib3.util.retry import Retry
+
+from workspace.src import rate_limit
+from workspace.src.rate_limit import RateLimitedAdapter, RateLimiter
+
+
+def test_bucket_allows_a_burst_then_spaces_requests() -> None:
+    limiter = RateLimiter("test", rate=10, burst=2)
+
+    waits = [limiter.reserve() for _ in range(4)]
+
+    assert waits[:2] == [0.0, 0.0]
+    assert waits[2] == pytest.approx(0.1, abs=0.01)
+    assert waits[3] == pytest.approx(0.2, abs=0.01)
+
+
+def test_async_callers_share_the_rate() -> None:
+    rate_limit.set_rate_limiter("test", RateLimiter("test", rate=50, burst=1))
+
+    async def main() -> None:
+        await asyncio.gather(*(rate_limit.acquire_async("test") for _ in range(6)))
+
+    started = time.perf_counter()
+    asyncio.run(main())
+
+    # The first call is free, the other five wait 20 ms apart
+    assert time.perf_counter() - started >= 0.09
+
+
+def test_unconfigured_provider_is_unlimited(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.delenv("RATE_LIMIT_NOWHERE", raising=False)
+
+    assert rate_limit.get_rate_limiter("nowhere") is None
+
+
+class CountingLimiter(RateLimiter):
+    def __init__(self) -> None:
+        super().__init__("counted", rate=1000, burst=1000)
+        self.reserved = 0
+
+    def reserve(self) -> float:
+        self.reserved += 1
+        return 0.0
+
+
+def test_retries_inside_the_adapter_wait_for_the_limit() -> None:
+    statuses: List[int] = [503, 503, 200]
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            self.send_response(statuses.pop(0))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args: Any) -> None:
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    limiter = CountingLimiter()
+    rate_limit.set_rate_limiter("counted", limiter)
+    retry = Retry(total=3, backoff_factor=0, status_forcelist=(503,))
+    session = requests.Session()
+    session.mount("http://", RateLimitedAdapter("counted", max_retries=retry))
+
+    try:
+        response = session.get(f"http://127.0.0.1:{server.server_port}/", timeout=5)
+    finally:
+        server.shutdown()
+        rate_limit.set_rate_limiter("counted", None)
+
+    assert response.status_code == 200
+    # The first request and both retries each took a token
+    assert limiter.reserved == 3
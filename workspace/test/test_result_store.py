@@ -0,0 +1,148 @@
+import datetime
+import fnmatch
+from typing import Any, Dict, Iterator, List, Optional
+
+import pytest
+from kombu.serialization import dumps, loads
+
+from workspace.src import result_accounting, result_store, serialization
+
+
+@pytest.fixture(autouse=True)
+def registered() -> None:
+    serialization.register_msgpack_zstd()
+
+
+def test_small_payloads_are_packed_without_compression() -> None:
+    payload = {"status": "SUCCESS", "result": [1, 2.5, "é"], "children": []}
+
+    data = serialization.dumps(payload)
+
+    assert data[:1] == b"\x00"
+    assert serialization.loads(data) == payload
+
+
+def test_large_payloads_are_compressed() -> None:
+    payload = {"articles": [{"abstract": "Douleur thoracique. " * 50}] * 20}
+
+    data = serialization.dumps(payload)
+
+    assert data[:1] == b"\x01"
+    assert len(data) < len(str(payload)) / 10
+    assert serialization.loads(data) == payload
+
+
+def test_extra_types_and_json_payloads_are_read() -> None:
+    moment = datetime.datetime(2025, 2, 1, 12, 30)
+
+    assert serialization.loads(serialization.dumps({"at": moment})) == {
+        "at": "2025-02-01T12:30:00"
+    }
+    assert serialization.loads(b'{"status": "SUCCESS"}') == {"status": "SUCCESS"}
+
+
+def test_kombu_round_trip_through_the_registered_name() -> None:
+    content_type, encoding, data = dumps({"task": "x"}, serializer="msgpack-zstd")
+
+    assert content_type == serialization.MSGPACK_ZSTD_CONTENT_TYPE
+    assert loads(data, content_type, encoding, accept=[content_type]) == {"task": "x"}
+
+
+def test_result_expiry_prefers_exact_names_over_patterns() -> None:
+    assert (
+        result_store.result_expires_for("workspace.src.tasks.embed_texts_task") == 600
+    )
+    assert result_store.result_expires_for(
+        "workspace.src.workflow.collect_consultation_step"
+    ) == (result_store.RESULT_EXPIRES)
+    assert result_store.result_expires_for("workspace.src.workflow.x_step") == 3600
+    assert result_store.result_expires_for("other") == result_store.RESULT_EXPIRES
+
+
+class FakeRedis:
+    """Strings with a size, sorted sets and expiries, enough for the accounting."""
+
+    def __init__(self) -> None:
+        self.sizes: Dict[bytes, int] = {}
+        self.sets: Dict[bytes, Dict[bytes, float]] = {}
+        self.ttl: Dict[bytes, int] = {}
+
+    def pipeline(self, transaction: bool = True) -> "FakePipeline":
+        return FakePipeline(self)
+
+    def scan_iter(self, match: str, count: int) -> Iterator[bytes]:
+        keys = list(self.sizes) + list(self.sets)
+        return iter(key for key in keys if fnmatch.fnmatchcase(key.decode(), match))
+
+    def zrangebyscore(self, key: bytes, low: float, high: str) -> List[bytes]:
+        return [m for m, s in self.sets.get(key, {}).items() if s >= low]
+
+
+class FakePipeline:
+    def __init__(self, redis: FakeRedis) -> None:
+        self.redis = redis
+        self.results: List[Any] = []
+
+    def expire(self, key: Any, seconds: int) -> None:
+        self.redis.ttl[_bytes(key)] = seconds
+
+    def zadd(self, key: str, mapping: Dict[str, float]) -> None:
+        members = self.redis.sets.setdefault(_bytes(key), {})
+        members.update({_bytes(m): s for m, s in mapping.items()})
+
+    def zremrangebyscore(self, key: str, low: str, high: float) -> None:
+        members = self.redis.sets[_bytes(key)]
+        for member in [m for m, s in members.items() if s <= high]:
+            del members[member]
+
+    def memory_usage(self, key: bytes) -> None:
+        self.results.append(self.redis.sizes.get(key))
+
+    def execute(self) -> List[Any]:
+        return self.results
+
+
+def _bytes(value: Any) -> bytes:
+    return value if isinstance(value, bytes) else str(value).encode()
+
+
+class FakeBackend:
+    task_keyprefix = b"celery-task-meta-"
+    group_keyprefix = b"celery-taskset-meta-"
+
+    def __init__(self) -> None:
+        self.client = FakeRedis()
+
+    def get_key_for_task(self, task_id: str) -> bytes:
+        return self.task_keyprefix + task_id.encode()
+
+    def store(self, task_id: str, size: int, name: Optional[str] = None) -> None:
+        self.client.sizes[self.get_key_for_task(task_id)] = size
+        if name:
+            result_store.record_result(self, task_id, name)
+
+
+def test_memory_is_reported_by_task_name() -> None:
+    backend = FakeBackend()
+    backend.store("a", 100, "workspace.src.tasks.generate_report_task")
+    backend.store("b", 300, "workspace.src.tasks.generate_report_task")
+    backend.store("c", 50, "workspace.src.tasks.embed_texts_task")
+    backend.store("legacy", 20)
+    backend.client.sizes[b"celery-taskset-meta-g"] = 10
+    backend.client.sizes[b"unrelated"] = 1000
+
+    report = result_accounting.result_memory_by_task(backend, batch_size=2)
+
+    assert backend.client.ttl[b"celery-task-meta-c"] == 600
+    assert report["total_bytes"] == 480
+    assert list(report["tasks"]) == [
+        "workspace.src.tasks.generate_report_task",
+        "workspace.src.tasks.embed_texts_task",
+        result_accounting.UNKNOWN_TASK,
+        result_accounting.GROUP_RESULTS,
+    ]
+    assert report["tasks"]["workspace.src.tasks.generate_report_task"] == {
+        "results": 2,
+        "bytes": 400,
+    }
+    assert "total" in result_accounting.format_report(report)
@@ -0,0 +1,60 @@
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import pytest
+
+from workspace.src import retrieve_historical_points
+from workspace.src.retrieve_historical_points import metadata_filter
+from workspace.src.vector_index import VectorIndex
+
+
+def test_metadata_filter() -> None:
+    assert metadata_filter() == {}
+    assert metadata_filter(ssn="1", date_from="2025-01-01", keywords=["toux"]) == {
+        "social_security_number": "1",
+        "date": {"$gte": "2025-01-01"},
+        "keywords": {"$in": ["toux"]},
+    }
+
+
+class FakeTable:
+    def __init__(self, docs: List[Dict[str, Any]]) -> None:
+        self.docs = docs
+        self.queries: List[Dict[str, Any]] = []
+
+    def find(
+        self, query: Dict[str, Any], projection: Optional[Dict[str, int]] = None
+    ) -> List[Dict[str, Any]]:
+        self.queries.append(query)
+        if "_id" in query:
+            return [doc for doc in self.docs if doc["_id"] in query["_id"]["$in"]]
+        ssn = query.get("social_security_number")
+        return [doc for doc in self.docs if ssn in (None, doc["ssn"])]
+
+
+@pytest.fixture
+def table(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> FakeTable:
+    docs: List[Dict[str, Any]] = [
+        {"_id": f"d{i}", "ssn": str(i % 2), "reportID": i, "intelligent_summary": ""}
+        for i in range(6)
+    ]
+    table = FakeTable(docs)
+    index = VectorIndex("test", directory=str(tmp_path))
+    index.add([doc["_id"] for doc in docs], [[1.0, i / 10] for i in range(6)])
+    monkeypatch.setattr(index, "sync", lambda table: 0)
+    module: Any = retrieve_historical_points
+    monkeypatch.setattr(module, "get_database", lambda: None)
+    monkeypatch.setattr(module, "get_table", lambda db, name: table)
+    monkeypatch.setattr(module, "get_vector_index", lambda name: index)
+    monkeypatch.setattr(module, "generate_embedding", lambda text: [0.0, 1.0])
+    return table
+
+
+def test_filters_are_applied_before_scoring(table: FakeTable) -> None:
+    unfiltered = retrieve_historical_points.similarity_search("q", top_k=2)
+    scoped = retrieve_historical_points.similarity_search("q", top_k=2, ssn="0")
+
+    assert [hit["reportID"] for hit in unfiltered] == [5, 4]
+    assert [hit["reportID"] for hit in scoped] == [4, 2]
+    assert {"social_security_number": "0"} in table.queries
+    assert retrieve_historical_points.similarity_search("q", ssn="9") == []
@@ -0,0 +1,62 @@
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+
+from workspace.src import search_wikipedia as wikipedia
+
+RESPONSE: dict[str, Any] = {
+    "query": {
+        "search": [
+            {"pageid": 2, "title": "Angina", "snippet": "chest <b>pain</b>"},
+            {"pageid": 1, "title": "Chest pain", "snippet": "pain in the chest"},
+        ],
+        "pages": {
+            "1": {"pageid": 1, "lastrevid": 10, "extract": "Chest pain is pain."},
+            "2": {"pageid": 2, "lastrevid": 20, "extract": "Angina is pain."},
+        },
+    }
+}
+
+
+class FakeSession:
+    def __init__(self) -> None:
+        self.calls: list[dict[str, Any]] = []
+
+    def get(self, url: str, params: dict[str, Any], **kwargs: Any) -> Any:
+        self.calls.append(params)
+        data: dict[str, Any] = RESPONSE
+        if "pageids" in params:
+            pageid = params["pageids"]
+            data = {
+                "query": {
+                    "pages": {
+                        pageid: {"lastrevid": int(pageid) * 10, "extract": "Full."}
+                    }
+                }
+            }
+        return SimpleNamespace(raise_for_status=lambda: None, json=lambda: data)
+
+
+@pytest.fixture
+def session(monkeypatch: pytest.MonkeyPatch) -> FakeSession:
+    session = FakeSession()
+    monkeypatch.setattr(wikipedia, "get_wikipedia_session", lambda: session)
+    wikipedia._extract_cache.clear()
+    return session
+
+
+def test_search_costs_one_request_and_keeps_ranking(session: FakeSession) -> None:
+    results = wikipedia.search_wikipedia("chest pain", limit=2)
+
+    assert [r["title"] for r in results] == ["Angina", "Chest pain"]
+    assert results[0]["extract"] == "Angina is pain."
+    assert len(session.calls) == 1
+
+
+def test_full_extracts_are_cached_by_revision(session: FakeSession) -> None:
+    wikipedia.search_wikipedia("chest pain", limit=2, full_extracts=True)
+    results = wikipedia.search_wikipedia("chest pain", limit=2, full_extracts=True)
+
+    assert results[0]["extract"] == "Full."
+    assert len(session.calls) == 4
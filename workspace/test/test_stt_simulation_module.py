@@ -0,0 +1,52 @@
+import asyncio
+import time
+from typing import Any, Dict, List
+
+from workspace.src.stt_simulation_module import chunk_speech, stream_speech_buffer
+
+DIALOGUE = "Le médecin: Où avez-vous mal? Le patient: À l'épaule, depuis hier."
+
+
+def test_byte_chunks_keep_multibyte_characters() -> None:
+    chunks = chunk_speech(DIALOGUE, buffer_size=5)
+
+    assert "".join(chunks) == DIALOGUE
+    assert all(len(chunk.encode("utf-8")) <= 5 + 3 for chunk in chunks)
+
+
+def test_word_and_sentence_chunks_are_aligned() -> None:
+    words = chunk_speech(DIALOGUE, buffer_size=16, mode="word")
+    sentences = chunk_speech(DIALOGUE, buffer_size=16, mode="sentence")
+
+    assert "".join(words) == DIALOGUE
+    assert all(len(chunk.encode("utf-8")) <= 16 for chunk in words[:-1])
+    assert all(set(chunk.split()) <= set(DIALOGUE.split()) for chunk in words)
+    assert sentences == [
+        "Le médecin: Où avez-vous mal? ",
+        "Le patient: À l'épaule, depuis hier.",
+    ]
+
+
+def test_consultations_stream_concurrently() -> None:
+    speeches = [{"text": DIALOGUE}]
+
+    async def consume() -> List[Dict[str, Any]]:
+        return [
+            chunk
+            async for chunk in stream_speech_buffer(
+                speeches, buffer_size=16, delay=0.02, max_pending=1
+            )
+        ]
+
+    async def main() -> List[List[Dict[str, Any]]]:
+        return await asyncio.gather(*(consume() for _ in range(20)))
+
+    started = time.perf_counter()
+    results = asyncio.run(main())
+    elapsed = time.perf_counter() - started
+
+    expected = len(chunk_speech(DIALOGUE, buffer_size=16))
+    assert all(len(chunks) == expected for chunks in results)
+    assert "".join(c["content"] for c in results[0]) == DIALOGUE
+    # 20 sequential streams would take 20x as long
+    assert elapsed < expected * 0.02 * 5
@@ -0,0 +1,61 @@
+import json
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+import pytest
+
+from workspace.src import task_events
+
+
+class FakePubSub:
+    def __init__(self, messages: List[Dict[str, Any]]) -> None:
+        self.messages = messages
+        self.channels: List[str] = []
+        self.closed = False
+
+    def subscribe(self, channel: str) -> None:
+        self.channels.append(channel)
+
+    def get_message(self, timeout: float) -> Optional[Dict[str, Any]]:
+        if not self.messages:
+            return None
+        return {"data": json.dumps(self.messages.pop(0))}
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def fake_celery(state: str, messages: List[Dict[str, Any]]) -> Any:
+    pubsub = FakePubSub(messages)
+    backend = SimpleNamespace(
+        get_key_for_task=lambda task_id: f"celery-task-meta-{task_id}",
+        client=SimpleNamespace(pubsub=lambda **kwargs: pubsub),
+        decode_result=json.loads,
+        pubsub=pubsub,
+    )
+    result = SimpleNamespace(state=state, result=None)
+    return SimpleNamespace(backend=backend, AsyncResult=lambda task_id: result)
+
+
+def test_events_follow_published_transitions(monkeypatch: pytest.MonkeyPatch) -> None:
+    celery = fake_celery(
+        "PENDING",
+        [{"status": "STARTED", "result": None}, {"status": "SUCCESS", "result": 42}],
+    )
+    monkeypatch.setattr(task_events, "celery", celery)
+
+    events = list(task_events.task_events("abc", timeout=1))
+
+    assert [event["status"] for event in events] == ["PENDING", "STARTED", "SUCCESS"]
+    assert celery.backend.pubsub.channels == ["celery-task-meta-abc"]
+    assert celery.backend.pubsub.closed
+
+
+def test_wait_returns_immediately_for_finished_tasks(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(task_events, "celery", fake_celery("FAILURE", []))
+
+    meta = task_events.wait_for_task("abc", timeout=1)
+
+    assert task_events.task_status("abc", meta)["status"] == "failed"
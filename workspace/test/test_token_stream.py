@@ -0,0 +1,135 @@
+import json
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+import pytest
+
+from workspace.src import token_stream, utils
+from workspace.src.llm_cache import set_llm_cache
+from workspace.src.pydantic_models import FollowUpQuestions
+
+
+class FakeRedis:
+    """Just enough of redis-py for the token stream: strings and pub/sub."""
+
+    def __init__(self) -> None:
+        self.values: Dict[str, bytes] = {}
+        self.published: List[Dict[str, Any]] = []
+        self.queue: List[Dict[str, Any]] = []
+
+    def pipeline(self) -> "FakePipeline":
+        return FakePipeline(self)
+
+    def pubsub(self, **kwargs: Any) -> "FakePubSub":
+        return FakePubSub(self)
+
+
+class FakePipeline:
+    def __init__(self, redis: FakeRedis) -> None:
+        self.redis = redis
+        self.results: List[Any] = []
+
+    def __enter__(self) -> "FakePipeline":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        pass
+
+    def append(self, key: str, value: bytes) -> None:
+        self.redis.values[key] = self.redis.values.get(key, b"") + value
+
+    def set(self, key: str, value: Any, ex: int) -> None:
+        self.redis.values[key] = str(value).encode()
+
+    def get(self, key: str) -> None:
+        self.results.append(self.redis.values.get(key))
+
+    def expire(self, key: str, seconds: int) -> None:
+        pass
+
+    def publish(self, channel: str, message: str) -> None:
+        self.redis.published.append(json.loads(message))
+
+    def execute(self) -> List[Any]:
+        return self.results
+
+
+class FakePubSub:
+    def __init__(self, redis: FakeRedis) -> None:
+        self.redis = redis
+
+    def subscribe(self, channel: str) -> None:
+        pass
+
+    def get_message(self, timeout: float) -> Optional[Dict[str, Any]]:
+        if not self.redis.queue:
+            return None
+        return {"data": json.dumps(self.redis.queue.pop(0))}
+
+    def close(self) -> None:
+        pass
+
+
+@pytest.fixture
+def redis(monkeypatch: pytest.MonkeyPatch) -> FakeRedis:
+    fake = FakeRedis()
+    celery = SimpleNamespace(backend=SimpleNamespace(client=fake))
+    monkeypatch.setattr(token_stream, "celery", celery)
+    return fake
+
+
+def test_publisher_buffers_deltas_and_signals_done(redis: FakeRedis) -> None:
+    with pytest.raises(RuntimeError):
+        with token_stream.token_publisher("abc") as on_delta:
+            on_delta("Hé")
+            on_delta("llo")
+            raise RuntimeError("generation failed")
+
+    assert redis.values["task-tokens-buffer:abc"].decode() == "Héllo"
+    assert redis.published == [
+        {"offset": 0, "delta": "Hé"},
+        {"offset": 2, "delta": "llo"},
+        {"offset": 5, "done": True},
+    ]
+
+
+def test_late_subscriber_replays_buffer_without_duplicates(redis: FakeRedis) -> None:
+    redis.values["task-tokens-buffer:abc"] = b"Hello"
+    # Deltas published between the subscription and the buffer read
+    redis.queue = [
+        {"offset": 3, "delta": "lo"},
+        {"offset": 5, "delta": " world"},
+        {"offset": 11, "done": True},
+    ]
+
+    events = list(token_stream.token_events("abc", timeout=1))
+
+    assert events == [
+        {"offset": 0, "delta": "Hello"},
+        {"offset": 5, "delta": " world"},
+        {"offset": 11, "done": True},
+    ]
+
+
+def test_structured_stream_forwards_deltas() -> None:
+    set_llm_cache(None)
+    chunks = ['{"follow_up_', 'questions": ["Q?"]}']
+
+    class FakeStream:
+        def __enter__(self) -> List[Any]:
+            return [SimpleNamespace(type="content.delta", delta=c) for c in chunks]
+
+        def __exit__(self, *args: Any) -> None:
+            pass
+
+    completions = SimpleNamespace(stream=lambda **kwargs: FakeStream())
+    client: Any = SimpleNamespace(
+        beta=SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    )
+    received: List[str] = []
+    result = utils.generate_structured_response_stream(
+        client, "system", "user", FollowUpQuestions, received.append
+    )
+
+    assert received == chunks
+    assert result == {"follow_up_questions": ["Q?"]}
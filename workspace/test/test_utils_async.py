@@ -0,0 +1,94 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+from typing import Any, List, Optional, Tuple
+
+import pytest
+
+from workspace.src import utils
+from workspace.src.llm_cache import InMemoryLLMCache, set_llm_cache
+from workspace.src.pydantic_models import FollowUpQuestions
+
+
+class FakeAsyncCompletions:
+    def __init__(self) -> None:
+        self.in_flight = 0
+        self.peak = 0
+
+    async def parse(self, **kwargs: Any) -> Any:
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        message = SimpleNamespace(content='{"follow_up_questions": ["Q?"]}')
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def test_async_calls_are_bounded_by_the_semaphore(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(utils, "LLM_MAX_CONCURRENCY", 3)
+    set_llm_cache(None)
+    completions = FakeAsyncCompletions()
+    client: Any = SimpleNamespace(
+        beta=SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    )
+
+    async def fan_out() -> list[dict[str, Any]]:
+        return await asyncio.gather(
+            *(
+                utils.generate_structured_response_async(
+                    client, "system", f"user {i}", FollowUpQuestions
+                )
+                for i in range(10)
+            )
+        )
+
+    results = asyncio.run(fan_out())
+
+    assert results == [{"follow_up_questions": ["Q?"]}] * 10
+    assert completions.peak == 3
+
+
+class ThreadRecordingCache(InMemoryLLMCache):
+    """Records the thread of every cache access."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.threads: List[int] = []
+
+    def _get(self, key: str) -> Optional[Any]:
+        self.threads.append(threading.get_ident())
+        return super()._get(key)
+
+    def _set(self, key: str, value: Any) -> None:
+        self.threads.append(threading.get_ident())
+        super()._set(key, value)
+
+
+def test_async_calls_keep_cache_access_off_the_event_loop() -> None:
+    cache = ThreadRecordingCache()
+    set_llm_cache(cache)
+    client: Any = SimpleNamespace(
+        beta=SimpleNamespace(chat=SimpleNamespace(completions=FakeAsyncCompletions()))
+    )
+
+    async def twice() -> Tuple[int, List[dict[str, Any]]]:
+        results = [
+            await utils.generate_structured_response_async(
+                client, "system", "user", FollowUpQuestions
+            )
+            for _ in range(2)
+        ]
+        return threading.get_ident(), results
+
+    try:
+        loop_thread, results = asyncio.run(twice())
+    finally:
+        set_llm_cache(None)
+
+    assert results == [{"follow_up_questions": ["Q?"]}] * 2
+    # A miss, the write, then a hit
+    assert len(cache.threads) == 3
+    assert loop_thread not in cache.threads
+    assert cache.stats()["hits"] == 1
@@ -0,0 +1,115 @@
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from workspace.src.vector_index import VectorIndex
+
+
+def test_search_returns_top_k_by_cosine_similarity(tmp_path: Path) -> None:
+    index = VectorIndex("test", directory=str(tmp_path))
+    index.add(["a", "b", "c"], [[1.0, 0.0], [0.0, 2.0], [3.0, 3.0]])
+
+    hits = index.search([0.0, 1.0], top_k=2)
+
+    assert [key for key, _ in hits] == ["b", "c"]
+    assert np.isclose(hits[0][1], 1.0)
+    assert np.isclose(hits[1][1], np.sqrt(0.5))
+
+
+def test_add_skips_known_keys_and_persists(tmp_path: Path) -> None:
+    index = VectorIndex("test", directory=str(tmp_path))
+    assert index.add(["a"], [[1.0, 0.0]]) == 1
+    assert index.add(["a", "b"], [[1.0, 0.0], [0.0, 1.0]]) == 1
+
+    reopened = VectorIndex("test", directory=str(tmp_path))
+
+    assert len(reopened) == 2
+    assert reopened.search([1.0, 0.0], top_k=1)[0][0] == "a"
+
+
+def test_index_grows_past_initial_capacity(tmp_path: Path) -> None:
+    index = VectorIndex("test", directory=str(tmp_path))
+    vectors = np.eye(4, dtype=np.float32).repeat(700, axis=0)
+    index.add([str(i) for i in range(len(vectors))], vectors)
+
+    assert len(index) == 2800
+    assert index.search([0.0, 0.0, 0.0, 1.0], top_k=1)[0][1] == 1.0
+
+
+def test_search_can_be_restricted_to_keys(tmp_path: Path) -> None:
+    index = VectorIndex("test", directory=str(tmp_path))
+    index.add(["a", "b", "c"], [[1.0, 0.0], [0.0, 2.0], [3.0, 3.0]])
+
+    hits = index.search([0.0, 1.0], top_k=2, keys=["a", "c", "missing"])
+
+    assert [key for key, _ in hits] == ["c", "a"]
+    assert index.search([0.0, 1.0], keys=["missing"]) == []
+    assert (
+        VectorIndex("test", directory=str(tmp_path)).search(
+            [1.0, 0.0], top_k=1, keys=["b"]
+        )[0][0]
+        == "b"
+    )
+
+
+class FakeCursor:
+    def __init__(self, docs: List[Dict[str, Any]]) -> None:
+        self.docs = docs
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.docs)
+
+    def sort(self, field: str, direction: int) -> List[Dict[str, Any]]:
+        return sorted(self.docs, key=lambda doc: doc[field], reverse=direction < 0)
+
+
+class FakeTable:
+    def __init__(self, docs: List[Dict[str, Any]]) -> None:
+        self.docs = docs
+        self.queries: List[Dict[str, Any]] = []
+
+    def find_one(
+        self, query: Dict[str, Any], projection: Any, sort: Any
+    ) -> Optional[Dict[str, Any]]:
+        stamped = [doc for doc in self.docs if "embedded_at" in doc]
+        return max(stamped, key=lambda doc: doc["embedded_at"], default=None)
+
+    def find(self, query: Dict[str, Any], projection: Any, **kwargs: Any) -> Any:
+        self.queries.append(query)
+        if "_id" in query:
+            docs = [doc for doc in self.docs if doc["_id"] in query["_id"]["$in"]]
+        elif "embedded_at" in query:
+            after = query["embedded_at"]["$gt"]
+            docs = [doc for doc in self.docs if doc.get("embedded_at", after) > after]
+        else:
+            docs = [doc for doc in self.docs if "embedding" in doc]
+        return FakeCursor(docs)
+
+
+def test_sync_pulls_new_and_recomputed_embeddings_only(tmp_path: Path) -> None:
+    table: Any = FakeTable(
+        [
+            {"_id": "legacy", "embedding": [1.0, 0.0]},
+            {"_id": "a", "embedding": [0.0, 1.0], "embedded_at": datetime(2026, 1, 1)},
+        ]
+    )
+    index = VectorIndex("test", directory=str(tmp_path))
+
+    assert index.sync(table, force=True) == 2
+    assert index.synced_to == datetime(2026, 1, 1)
+
+    table.docs[1].update(embedding=[1.0, 1.0], embedded_at=datetime(2026, 1, 2))
+    table.docs.append(
+        {"_id": "b", "embedding": [0.0, 1.0], "embedded_at": datetime(2026, 1, 3)}
+    )
+    table.queries.clear()
+
+    assert index.sync(table, force=True) == 2
+    assert table.queries == [{"embedded_at": {"$gt": datetime(2026, 1, 1)}}]
+    assert len(index) == 3
+    assert np.isclose(index.search([1.0, 1.0], top_k=1, keys=["a"])[0][1], 1.0)
+    assert VectorIndex("test", directory=str(tmp_path)).synced_to == datetime(
+        2026, 1, 3
+    )
@@ -0,0 +1,159 @@
+from typing import Any, Dict, List
+
+import pytest
+from celery import chord
+
+from workspace.src import workflow
+
+
+@pytest.fixture
+def timings(monkeypatch: pytest.MonkeyPatch) -> Dict[str, Dict[str, Any]]:
+    recorded: Dict[str, Dict[str, Any]] = {}
+
+    def record(workflow_id: str, step: str, timing: Dict[str, Any]) -> None:
+        recorded[step] = timing
+
+    monkeypatch.setattr(workflow, "_record", record)
+    monkeypatch.setattr(workflow, "get_workflow_timings", lambda _: dict(recorded))
+    return recorded
+
+
+@pytest.fixture
+def llm(monkeypatch: pytest.MonkeyPatch) -> List[str]:
+    """Every LLM and PubMed call of the steps, replaced by an echo."""
+    calls: List[str] = []
+
+    def fake(name: str, result: Any) -> Any:
+        def call(*args: Any, **kwargs: Any) -> Any:
+            calls.append(name)
+            return result
+
+        return call
+
+    extracted = fake("extract", "extracted")
+    monkeypatch.setattr(workflow, "extract_ordonnance_data", extracted)
+    summary = fake("summarize", "medication history")
+    monkeypatch.setattr(workflow, "summarize_ordonnances", summary)
+    anomalies = fake("anomalies", {"prescription_anomalies": []})
+    monkeypatch.setattr(workflow, "detect_prescription_anomalies", anomalies)
+    monkeypatch.setattr(workflow, "generate_report", fake("report", {"pathology": "x"}))
+    articles = fake("search", {"query": "q", "articles": [{"title": "t"}]})
+    monkeypatch.setattr(workflow, "search_medical_articles", articles)
+    search_summary = fake("search_summary", {"search_summary": "s"})
+    monkeypatch.setattr(workflow, "generate_search_summary", search_summary)
+    return calls
+
+
+def build(previous_prescriptions: List[str]) -> Any:
+    return workflow.build_consultation_workflow(
+        "wf",
+        conversation="Patient: chest pain.",
+        patient_information={"age": "54"},
+        medical_history="Hypertension.",
+        doctor_prescription="Aspirin 100mg",
+        previous_prescriptions=previous_prescriptions,
+        search_query="chest pain",
+        retmax=3,
+    )
+
+
+def names(signatures: Any) -> List[str]:
+    return [signature.task.rsplit(".", 1)[-1] for signature in signatures]
+
+
+def test_branches_run_in_parallel_and_join_in_the_collect_step() -> None:
+    dag = build(["Rx 1", "Rx 2"])
+
+    assert isinstance(dag, chord)
+    assert dag.body.task == "workspace.src.workflow.collect_consultation_step"
+    assert dag.body.options["task_id"] == "wf"
+    assert dag.body.kwargs == {"workflow_id": "wf"}
+    assert isinstance(dag.tasks, tuple) and len(dag.tasks) == 2
+    (prescription,) = dag.tasks[0].tasks
+    research = dag.tasks[1]
+
+    # One extraction per previous prescription in parallel, then the rest of
+    # the branch in order once they are all done
+    assert isinstance(prescription, chord)
+    assert names(prescription.tasks) == ["extract_ordonnance_step"] * 2
+    assert [s.args for s in prescription.tasks] == [("Rx 1",), ("Rx 2",)]
+    summarize, anomalies, report = prescription.body.tasks
+    assert names([summarize, anomalies, report]) == [
+        "summarize_ordonnances_step",
+        "detect_anomalies_step",
+        "generate_report_step",
+    ]
+    assert anomalies.kwargs == {
+        "doctor_prescription": "Aspirin 100mg",
+        "workflow_id": "wf",
+    }
+    assert report.kwargs == {
+        "conversation": "Patient: chest pain.",
+        "patient_information": {"age": "54"},
+        "medical_history": "Hypertension.",
+        "workflow_id": "wf",
+    }
+
+    search, search_summary = research.tasks
+    assert names(research.tasks) == [
+        "search_articles_step",
+        "generate_search_summary_step",
+    ]
+    assert search.args == ("chest pain", 3)
+    assert search_summary.kwargs == {
+        "patient_condition": "Patient: chest pain.",
+        "workflow_id": "wf",
+    }
+
+
+def test_without_previous_prescriptions_anomalies_run_first() -> None:
+    prescription = build([]).tasks[0]
+
+    anomalies, report = prescription.tasks
+    assert names(prescription.tasks) == [
+        "detect_anomalies_step",
+        "generate_report_step",
+    ]
+    assert anomalies.args == ("Not Provided", "Aspirin 100mg")
+
+
+def test_steps_pass_their_results_along_to_the_collect_step(
+    timings: Dict[str, Dict[str, Any]], llm: List[str]
+) -> None:
+    # Each step called with what the previous one returns, as the canvas does
+    medication_history = workflow.summarize_ordonnances_step(
+        [workflow.extract_ordonnance_step("Rx 1", workflow_id="wf")],
+        workflow_id="wf",
+    )
+    state = workflow.detect_anomalies_step(
+        medication_history, "Aspirin 100mg", workflow_id="wf"
+    )
+    prescription = workflow.generate_report_step(
+        state, "Patient: chest pain.", {"age": "54"}, "Hypertension.", "wf"
+    )
+    research = workflow.generate_search_summary_step(
+        workflow.search_articles_step("chest pain", 3, workflow_id="wf"),
+        "Patient: chest pain.",
+        workflow_id="wf",
+    )
+
+    result = workflow.collect_consultation_step([prescription, research], "wf")
+
+    assert llm == [
+        "extract",
+        "summarize",
+        "anomalies",
+        "report",
+        "search",
+        "search_summary",
+    ]
+    assert result == {
+        "workflow_id": "wf",
+        "medication_history": "medication history",
+        "anomalies": {"prescription_anomalies": []},
+        "report": {"pathology": "x"},
+        "articles": [{"title": "t"}],
+        "search_summary": {"search_summary": "s"},
+        "timings": timings,
+    }
+    assert "generate_report" in timings